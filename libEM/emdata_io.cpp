@@ -371,6 +371,83 @@ void EMData::append_image(const string & filename,
 }
 
 
+void EMData::write_images(const string & filename, vector < EMData * >imgs,
+						  int img_index_start, EMUtil::ImageType imgtype)
+{
+	ENTERFUNC;
+
+	if (imgs.size() == 0) return;
+
+	if (imgtype == EMUtil::IMAGE_UNKNOWN) {
+		const char *ext = strrchr(filename.c_str(), '.');
+		if (ext) {
+			ext++;
+			imgtype = EMUtil::get_image_ext_type(ext);
+		}
+	}
+
+	// LST files and single image formats need the special handling in write_image
+	bool single = (imgtype == EMUtil::IMAGE_LST || imgtype == EMUtil::IMAGE_LSTFAST);
+	ImageIO *imageio = 0;
+	if (!single) {
+		imageio = EMUtil::get_imageio(filename, ImageIO::READ_WRITE, imgtype);
+		if (!imageio) {
+			throw ImageFormatException("cannot create an image io");
+		}
+		// this is a property of the format, not the file, and is checked before the file is initialized, so new
+		// single image files get the same treatment as existing ones
+		if (imageio->is_single_image_format()) {
+			EMUtil::close_imageio(filename, imageio);
+			imageio = 0;
+			single = true;
+		}
+	}
+	if (single) {
+		for (size_t i = 0; i < imgs.size(); i++) {
+			imgs[i]->write_image(filename, img_index_start < 0 ? -1 : img_index_start + (int)i, imgtype);
+		}
+		EXITFUNC;
+		return;
+	}
+
+	// the file is opened once, and each image written with its header
+	if (img_index_start < 0) {
+		img_index_start = imageio->get_nimg();
+	}
+
+	for (size_t i = 0; i < imgs.size(); i++) {
+		EMData *img = imgs[i];
+		if (img->is_complex() && img->is_shuffled())
+			img->fft_shuffle();
+
+		img->attr_dict["nx"] = img->nx;
+		img->attr_dict["ny"] = img->ny;
+		img->attr_dict["nz"] = img->nz;
+		img->attr_dict["changecount"] = img->changecount;
+		img->attr_dict["datatype"] = (int)EMUtil::EM_FLOAT;
+		img->update_stat();
+
+		int idx = img_index_start + (int)i;
+		int err = imageio->write_header(img->attr_dict, idx, 0, EMUtil::EM_FLOAT, true);
+		if (!err) {
+			err = imageio->write_data(img->get_data(), idx, 0, EMUtil::EM_FLOAT, true);
+		}
+		if (err) {
+			imageio->flush();
+			EMUtil::close_imageio(filename, imageio);
+			throw ImageWriteException(filename, "imageio write failed");
+		}
+	}
+
+	if (!(imgtype == EMUtil::IMAGE_PNG)) {
+		imageio->flush();
+	}
+
+	EMUtil::close_imageio(filename, imageio);
+	imageio = 0;
+	EXITFUNC;
+}
+
 void EMData::write_lst(const string & filename, const string & reffile,
 					   int refn, const string & comment)
 {
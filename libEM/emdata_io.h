@@ -122,6 +122,24 @@ void append_image(const string & filename,
 				  EMUtil::ImageType imgtype = EMUtil::IMAGE_UNKNOWN,
 				  bool header_only = false);
 
+/** Write a set of images to a file, opening the file only once.
+ * This is much faster than calling write_image for each image when
+ * writing a large number of small images, such as particles.
+ * @param filename The image file name.
+ * @param imgs The images to write.
+ * @param img_index_start Index of the first image, images are written
+ *        sequentially from here. -1 appends to the end of the file.
+ * @param imgtype Write to the given image format type. if not
+ *        specified, use the 'filename' extension to decide.
+ *
+ * @exception ImageFormatException
+ * @exception ImageWriteException
+ */
+static void write_images(const string & filename,
+						 vector < EMData * >imgs,
+						 int img_index_start = 0,
+						 EMUtil::ImageType imgtype = EMUtil::IMAGE_UNKNOWN);
+
 /** Append data to a LST image file.
  * @param filename The LST image file name.
  * @param reffile Reference file name.
@@ -1386,6 +1386,23 @@ bool FourierReconstructor::pixel_at(const float& xx, const float& yy, const floa
 	}
 }
 
+EMData *FourierReconstructor::get_partial_volume()
+{
+	if ( 0 == image ) throw NullPointerException("The complex reconstruction volume was null!");
+#ifdef EMAN2_USING_CUDA
+	if(EMData::usecuda == 1 && image->getcudarwdata()) image->copy_from_device();
+#endif
+	return image->copy();
+}
+
+EMData *FourierReconstructor::get_partial_weights()
+{
+	if ( 0 == tmp_data ) throw NullPointerException("The normalization volume was null!");
+#ifdef EMAN2_USING_CUDA
+	if(EMData::usecuda == 1 && tmp_data->getcudarwdata()) tmp_data->copy_from_device();
+#endif
+	return tmp_data->copy();
+}
 
 EMData *FourierReconstructor::finish(bool doift)
 {
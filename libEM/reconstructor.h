@@ -171,6 +171,20 @@ namespace EMAN
 		 * @return The result 3D model.
 		 */
 		virtual EMData *finish(bool doift=true) { throw; }
+
+		/** Return a copy of the current (unnormalized) reconstruction volume, prior to finish(). Partial volumes from
+		 * several reconstructors sharing the same parameters may be summed, along with get_partial_weights(), and passed
+		 * to setup_seedandweights() of a single reconstructor, which is then finished normally.
+		 * @return a copy of the accumulated volume, which the caller is responsible for deleting
+		 * @exception InvalidCallException if the reconstructor doesn't support partial volumes
+		 */
+		virtual EMData *get_partial_volume() { throw InvalidCallException("get_partial_volume is not supported by this reconstructor"); }
+
+		/** Return a copy of the current normalization (weight) volume, prior to finish(). See get_partial_volume().
+		 * @return a copy of the accumulated weights, which the caller is responsible for deleting
+		 * @exception InvalidCallException if the reconstructor doesn't support partial volumes
+		 */
+		virtual EMData *get_partial_weights() { throw InvalidCallException("get_partial_weights is not supported by this reconstructor"); }
 		
 		/** set the volume and tmp_volume data to zero, for use in Monte Carlo reconstructors
 		*/
@@ -455,6 +469,16 @@ namespace EMAN
 		* @return The real space reconstructed volume
 		*/
 		virtual EMData *finish(bool doift=true);
+
+		/** Return a copy of the unnormalized Fourier volume accumulated so far
+		* @exception NullPointerException if setup() has not been called
+		*/
+		virtual EMData *get_partial_volume();
+
+		/** Return a copy of the Fourier weight volume accumulated so far
+		* @exception NullPointerException if setup() has not been called
+		*/
+		virtual EMData *get_partial_weights();
 		
 		/** clear the volume and tmp_data for use in Monte Carlo reconstructions
 		*/
@@ -1108,6 +1108,134 @@ def num_cpus():
 		print("error, in num_cpus - uknown platform string:",platform_string," - returning 2")
 		return 2
 
+def _executor_call(job):
+	"""Runs one EMExecutor job in a worker. Exceptions are returned as a formatted traceback so they
+can be reraised in the calling thread."""
+	func,idx,args=job
+	try: return (idx,True,func(*args))
+	except:
+		import traceback
+		return (idx,False,traceback.format_exc())
+
+def _executor_error(exc):
+	"""Formats an exception raised by the pool itself rather than by an EMExecutor job"""
+	import traceback
+	return "".join(traceback.format_exception(type(exc),exc,getattr(exc,"__traceback__",None)))
+
+class EMExecutor(object):
+	"""A fixed pool of workers for running one function over many jobs, replacing per-job threads throttled
+by polling threading.active_count(). At most nthreads jobs run at once, and at most 'inflight' jobs (default 2*nthreads)
+are submitted but not yet returned to the caller, so job inputs can come from a generator without being
+materialized all at once.
+
+backend may be "thread" (workers share memory, suitable for C++ processing which releases the GIL)
+or "process" (func and its arguments must be picklable, ie - module level functions).
+
+progress, if set, is called as progress(ndone,ntotal) in the calling thread as each job completes. If logid
+(from E2init) is set, E2progress is updated as well. ntotal is None when the number of jobs is unknown.
+
+idle, if set, is called with no arguments in the calling thread every idletime seconds while waiting for jobs to
+complete, eg - QtWidgets.qApp.processEvents to keep a GUI responsive during long jobs.
+
+	with EMExecutor(options.threads) as ex:
+		for idx,img in ex.imap(do_one,((i,fsp) for i in range(n)),ordered=False): ...
+"""
+	def __init__(self,nthreads=1,backend="thread",inflight=0,progress=None,logid=None,idle=None,idletime=0.2):
+		self.nthreads=max(1,int(nthreads))
+		self.inflight=max(self.nthreads,int(inflight)) if inflight>0 else 2*self.nthreads
+		self.progress=progress
+		self.logid=logid
+		self.idle=idle
+		self.idletime=idletime
+		self.backend=backend
+		self.closed=False
+		if backend=="thread":
+			from multiprocessing.pool import ThreadPool
+			self.pool=ThreadPool(self.nthreads)
+		elif backend=="process":
+			from multiprocessing import Pool
+			self.pool=Pool(self.nthreads)
+		else: raise ValueError("EMExecutor: unknown backend '{}'".format(backend))
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self,exc_type,exc_value,tb):
+		if exc_type is None: self.close()
+		else: self.terminate()
+		return False
+
+	def imap(self,func,jobs,ordered=True,total=None):
+		"""Generator calling func(*job) for each job in the iterable jobs (a job which isn't a tuple is passed as
+the single argument). Results are yielded in job order if ordered is set, otherwise as they complete. If a
+job raises an exception, it is reraised here with the worker traceback."""
+		import queue
+
+		if total is None:
+			try: total=len(jobs)
+			except TypeError: pass
+
+		results=queue.Queue()
+		jobs=iter(jobs)
+		exhausted=False
+		nsub=0			# jobs submitted
+		ndone=0			# results received from the workers
+		nyield=0		# results passed back to the caller
+		pending={}		# completed out of order, waiting for an earlier job (ordered only)
+		while True:
+			while not exhausted and nsub-nyield<self.inflight:
+				try: args=next(jobs)
+				except StopIteration:
+					exhausted=True
+					break
+				if not isinstance(args,tuple): args=(args,)
+				# error_callback covers failures outside the job itself (eg - unpicklable arguments or a dead worker),
+				# which would otherwise never produce a result. It doesn't exist on python 2
+				if sys.version_info[0]>=3 :
+					self.pool.apply_async(_executor_call,((func,nsub,args),),callback=results.put,error_callback=lambda exc,idx=nsub:results.put((idx,False,_executor_error(exc))))
+				else: self.pool.apply_async(_executor_call,((func,nsub,args),),callback=results.put)
+				nsub+=1
+
+			if exhausted and ndone==nsub: break
+
+			# a timeout keeps the wait interruptible on python 2
+			try: idx,ok,ret=results.get(True,1.0 if self.idle==None else self.idletime)
+			except queue.Empty:
+				if self.idle!=None: self.idle()
+				continue
+			ndone+=1
+			if not ok: raise Exception("EMExecutor job {} failed:\n{}".format(idx,ret))
+
+			if self.progress!=None: self.progress(ndone,total)
+			if self.logid!=None and total: E2progress(self.logid,float(ndone)/total)
+
+			if ordered:
+				pending[idx]=ret
+				while nyield in pending:
+					nyield+=1
+					yield pending.pop(nyield-1)
+			else:
+				nyield+=1
+				yield ret
+
+	def map(self,func,jobs,ordered=True,total=None):
+		"""Like imap, but returns a list of all of the results"""
+		return list(self.imap(func,jobs,ordered,total))
+
+	def close(self):
+		"""Waits for any running jobs, then shuts down the workers"""
+		if self.closed: return
+		self.closed=True
+		self.pool.close()
+		self.pool.join()
+
+	def terminate(self):
+		"""Shuts down the workers immediately, abandoning any running jobs"""
+		if self.closed: return
+		self.closed=True
+		self.pool.terminate()
+		self.pool.join()
+
 def gimme_image_dimensions2D( imagefilename ):
 	"""returns the dimensions of the first image in a file (2-D)"""
 
@@ -1944,12 +2072,22 @@ The file begins with
 # Line length (including \n)
 number<\t>filename<\t>comment
 ...
+
+For bulk access, read_many() and read_all() parse many records at once from a memory map of the file, returning
+NumPy structured arrays (see recdtype). Referenced filenames are interned, so each record stores an integer 'file'
+which indexes the filenames list.
 """
+	recdtype=[("n","i8"),("file","i4"),("comment","O")]		# NumPy dtype of records returned by read_many()
+
 	def __init__(self,path,ifexists=False):
 		"""Initialize the object using the .lst file in 'path'. If 'ifexists' is set, an exception will be raised
 if the lst file does not exist."""
 
 		self.path=path
+		self.mm=None			# read-only memory map used by the bulk readers
+		self.filenames=[]		# interned referenced filenames, indexed by the 'file' field of read_many() records
+		self.fileids={}			# maps a filename (as stored in the file) to its index in filenames
+		self.lock=threading.Lock()	# protects filenames/fileids, since bulk reads may happen in a prefetch thread
 
 		try: self.ptr=open(path,"rb+")		# file exists
 		except:
@@ -2023,6 +2161,7 @@ if the lst file does not exist."""
 		"""Once you call this, you should not try to access this object any more"""
 		if self.ptr!=None :
 			self.normalize()
+			self.mm=None
 			self.ptr=None
 
 	def write(self,n,nextfile,extfile,comment=None):
@@ -2058,6 +2197,63 @@ performed with read_image either here or in the EMData class. Returns a tuple (n
 
 		return ln
 
+	def mmap(self):
+		"""Returns a read-only memory map of the file, remapping it if the file has changed size since it was last mapped"""
+		import mmap
+
+		self.ptr.flush()
+		size=os.fstat(self.ptr.fileno()).st_size
+		if self.mm==None or len(self.mm)!=size :
+			self.mm=mmap.mmap(self.ptr.fileno(),size,access=mmap.ACCESS_READ)
+		return self.mm
+
+	def parse_records(self,lines):
+		"""Parses a sequence of raw record lines into a NumPy structured array of recdtype, interning filenames"""
+		import numpy as np
+
+		ret=np.zeros(len(lines),dtype=LSXFile.recdtype)
+		ns=ret["n"]
+		files=ret["file"]
+		cmts=ret["comment"]
+		for j,ln in enumerate(lines):
+			ln=ln.strip().split(b"\t")
+			ns[j]=int(ln[0])
+			try: files[j]=self.fileids[ln[1]]
+			except KeyError:
+				fsp=ln[1] if isinstance(ln[1],str) else ln[1].decode("utf-8")
+				self.lock.acquire()
+				if ln[1] not in self.fileids :
+					self.filenames.append(fsp)
+					self.fileids[ln[1]]=len(self.filenames)-1
+				files[j]=self.fileids[ln[1]]
+				self.lock.release()
+			if len(ln)>2 : cmts[j]=ln[2] if isinstance(ln[2],str) else ln[2].decode("utf-8")
+			else: cmts[j]=None
+
+		return ret
+
+	def read_many(self,indices):
+		"""Reads the records at the listed indices (in the order given). Much faster than repeated read() calls for
+large numbers of records. Returns a NumPy structured array with fields 'n' (image number in the referenced file),
+'file' (index of the referenced file in self.filenames) and 'comment' (None if no comment)."""
+
+		mm=self.mmap()
+		lines=[]
+		for i in indices:
+			if i<0 or i>=self.n : raise Exception("Attempt to read record {} from #LSX {} with {} records".format(i,self.path,self.n))
+			o=self.seekbase+self.linelen*i
+			lines.append(mm[o:o+self.linelen])
+
+		return self.parse_records(lines)
+
+	def read_all(self):
+		"""Reads every record in the file, returning a structured array as described in read_many()"""
+
+		if self.n==0 : return self.parse_records([])
+		mm=self.mmap()
+		lines=mm[self.seekbase:self.seekbase+self.linelen*self.n].split(b"\n")[:self.n]
+		return self.parse_records(lines)
+
 	def read_image(self,n):
 		"""This reads the image referenced by the nth record in the #LSX file. The same task can be accomplished with EMData.read_image,
 but this method prevents multiple open/close operations on the #LSX file."""
@@ -2069,9 +2265,87 @@ but this method prevents multiple open/close operations on the #LSX file."""
 
 		return ret
 
+	def read_images(self,indices=None):
+		"""This reads the images referenced by a list of records (all records if None), returning a list of images in the
+same order as indices. Rather than opening the referenced file once per image as read_image() would, records are grouped by
+referenced file, and each file is read once with EMData.read_images, in sorted image order."""
+		import numpy as np
+
+		if indices is None : recs=self.read_all()
+		else : recs=self.read_many(indices)
+		if len(recs)==0 : return []
+
+		ret=[None]*len(recs)
+		order=np.lexsort((recs["n"],recs["file"]))		# sorted by file, then image number within the file
+		files=recs["file"][order]
+		starts=np.flatnonzero(np.diff(files))+1
+		for grp in np.split(order,starts):
+			fsp=self.filenames[recs["file"][grp[0]]]
+			ns=recs["n"][grp]
+			uns=sorted(set([int(i) for i in ns]))
+			imgs=dict(zip(uns,EMData.read_images(fsp,uns)))
+			used=set()
+			for j,n in zip(grp,ns):
+				n=int(n)
+				if n in used : ret[j]=imgs[n].copy()		# the same image requested more than once
+				else :
+					ret[j]=imgs[n]
+					used.add(n)
+
+		for j,im in enumerate(ret):
+			cmt=recs["comment"][j]
+			if cmt!=None and len(cmt)>0 : im["lst_comment"]=cmt
+
+		return ret
+
+	def iter_images(self,indices=None,chunk=256,prefetch=True):
+		"""Generator yielding the images referenced by a list of records (all records if None) in order. Images are read
+with read_images() in chunks of the specified size. If prefetch is set, the next chunk is read in a background thread
+while the current chunk is being processed."""
+
+		if indices is None : indices=range(self.n)
+		indices=list(indices)
+		chunks=[indices[i:i+chunk] for i in range(0,len(indices),chunk)]
+		if len(chunks)==0 : return
+
+		result={}
+		def readchunk(k):
+			try: result[k]=self.read_images(chunks[k])
+			except Exception as e: result[k]=e
+
+		readchunk(0)
+		for k in range(len(chunks)):
+			thr=None
+			if prefetch and k+1<len(chunks):
+				thr=threading.Thread(target=readchunk,args=(k+1,))
+				thr.start()
+
+			imgs=result.pop(k)
+			if isinstance(imgs,Exception) : raise imgs
+			for im in imgs: yield im
+
+			if thr!=None : thr.join()
+			elif k+1<len(chunks) : readchunk(k+1)
+
 	def __len__(self): return self.n
 
 	def normalize(self):
+		"""This will insure that the line-length parameter is valid. If it is not, it will rewrite the file with a
+valid line-length. Since every line should have the same length, the number of records is computed from the file
+size, and only the first and last lines are checked. If those checks fail, the entire file is read (see verify())."""
+
+		self.ptr.flush()
+		size=os.fstat(self.ptr.fileno()).st_size-self.seekbase
+		self.n=size//self.linelen
+		if size%self.linelen!=0 : self.verify()
+		elif self.n>0:
+			for i in (0,self.n-1):
+				self.ptr.seek(self.seekbase+self.linelen*i)
+				if len(self.ptr.readline())!=self.linelen :
+					self.verify()
+					break
+
+	def verify(self):
 		"""This will read the entire file and insure that the line-length parameter is valid. If it is not,
 it will rewrite the file with a valid line-length. """
 
@@ -2082,6 +2356,8 @@ it will rewrite the file with a valid line-length. """
 			if len(ln)==0 :break
 			if len(ln)!=self.linelen :
 				self.rewrite()
+				self.ptr.seek(0,os.SEEK_END)		# after a rewrite, all lines are the correct length
+				self.n=(self.ptr.tell()-self.seekbase)//self.linelen
 				break
 			self.n+=1
 
@@ -2119,6 +2395,7 @@ line length. Used when a line must be added in the middle of the file."""
 
 		# close both files
 		tmpfile=None
+		self.mm=None
 		self.ptr=None
 		self.seekbase=newseekbase
 
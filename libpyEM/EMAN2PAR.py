@@ -53,10 +53,11 @@ import subprocess
 import _thread,threading
 import getpass
 import select
+import queue
 
 from EMAN2 import test_image,EMData,abs_path,local_datetime,EMUtil,Util,get_platform
 from EMAN2db import e2filemodtime
-from EMAN2jsondb import JSTask,JSTaskQueue,js_open_dict
+from EMAN2jsondb import JSTask,JSTaskQueue,SQLiteTaskQueue,js_open_dict
 from e2classaverage import ClassAvTask
 from e2classifytree import TreeClassifyTask
 from e2refine_split import ClassSplitTask
@@ -117,6 +118,7 @@ class EMTaskCustomer(object):
 		"""Specify the type and target host of the parallelism server to use.
 	dc[:hostname[:port]] - default hostname localhost, default port 9990
 	thread:nthreads[:scratch_dir]
+	pool:nprocesses - like thread, but with persistent worker processes, better for large numbers of small tasks
 	mpi:ncpu[:scratch_dir_on_nodes]
 	"""
 		origtarget=target
@@ -136,6 +138,10 @@ class EMTaskCustomer(object):
 			try: self.scratchdir=target.split(":")[2]
 			except: self.scratchdir="/tmp"
 			self.handler=EMLocalTaskHandler(self.maxthreads,self.scratchdir)
+		elif self.servtype=="pool":
+			self.groupn=0
+			self.maxthreads=int(target.split(":")[1])
+			self.handler=EMPoolTaskHandler(self.maxthreads)
 		elif self.servtype=="mpi":
 			self.maxthreads=int(target.split(":")[1])
 			try: self.scratchdir=origtarget.split(":")[2]
@@ -147,10 +153,10 @@ class EMTaskCustomer(object):
 				else: self.cache=False
 			except: self.cache=False
 			self.handler=EMMpiTaskHandler(self.maxthreads,self.scratchdir)
-		else : raise Exception("Only 'dc', 'thread' and 'mpi' servertypes currently supported")
+		else : raise Exception("Only 'dc', 'thread', 'pool' and 'mpi' servertypes currently supported")
 
 	def __del__(self):
-		if self.servtype=="thread" :
+		if self.servtype in ("thread","pool") :
 			print("Cleaning up thread server. Please wait.")
 			self.handler.stop()
 		elif self.servtype=="mpi" :
@@ -187,7 +193,7 @@ class EMTaskCustomer(object):
 		"""Returns an estimate of the number of available CPUs based on the number
 		of different nodes we have talked to. Doesn't handle multi-core machines as
 		separate entities yet. If wait is set, it will not return until ncpu > 1"""
-		if self.servtype =="thread" : return self.maxthreads
+		if self.servtype in ("thread","pool") : return self.maxthreads
 		if self.servtype =="mpi" : return self.maxthreads-1
 
 		if self.servtype=="dc" :
@@ -211,7 +217,7 @@ class EMTaskCustomer(object):
 	def new_group(self):
 		"""request a new group id from the server for use in grouping subtasks"""
 
-		if self.servtype in ("thread","mpi"):
+		if self.servtype in ("thread","pool","mpi"):
 			self.groupn+=1
 			return self.groupn
 
@@ -223,7 +229,7 @@ class EMTaskCustomer(object):
 
 	def rerun_task(self,tid):
 		"""Trigger an already submitted task to be re-executed"""
-		if self.servtype in ("thread","mpi") :
+		if self.servtype in ("thread","pool","mpi") :
 			self.handler.stop()
 			raise Exception("MPI/Threaded parallelism doesn't support respawning tasks")
 
@@ -248,8 +254,8 @@ class EMTaskCustomer(object):
 			try: task.user=getpass.getuser()
 			except: task.user="anyone"
 
-		if self.servtype in ("thread","mpi"):
-			return [self.handler.add_task(t) for t in tasks]
+		if self.servtype in ("thread","pool","mpi"):
+			return self.handler.add_tasks(tasks)
 
 
 		if self.servtype=="dc" :
@@ -283,7 +289,7 @@ class EMTaskCustomer(object):
 		try: task.user=getpass.getuser()
 		except: task.user="anyone"
 
-		if self.servtype in ("thread","mpi"):
+		if self.servtype in ("thread","pool","mpi"):
 			return self.handler.add_task(task)
 
 		if self.servtype=="dc" :
@@ -312,7 +318,7 @@ class EMTaskCustomer(object):
 	def check_task(self,taskid_list):
 		"""Check on the status of a list of tasks. Returns a list of ints, -1 to 100. -1 for a task
 		that hasn't been started. 0-99 for tasks that have begun, but not completed. 100 for completed tasks."""
-		if self.servtype in ("thread","mpi") :
+		if self.servtype in ("thread","pool","mpi") :
 			return self.handler.check_task(taskid_list)
 
 		if self.servtype=="dc":
@@ -329,10 +335,38 @@ class EMTaskCustomer(object):
 		print(self.servtype)
 		raise Exception("Unknown server type")
 
+	def iter_results(self,taskid_list,maxdelay=5.0):
+		"""Generator which yields (taskid,task,results) for each task in taskid_list as it completes, in order of
+		completion. This permits results to be written incrementally while other tasks are still running. Each result
+		is retrieved with get_results() before it is yielded, so it is no longer available from the server afterwards.
+		The server is checked frequently while tasks are completing, backing off to once every maxdelay seconds when
+		they aren't. With 'pool' parallelism we are notified of completion directly, so there is no polling at all."""
+
+		pending=list(taskid_list)
+		delay=0.1
+		while len(pending)>0:
+			if self.servtype=="pool" :
+				done=self.handler.wait_results(pending,maxdelay)
+			else:
+				done=[tid for tid,st in zip(pending,self.check_task(pending)) if st==100]
+
+			if len(done)==0 :
+				if self.servtype!="pool" :
+					time.sleep(delay)
+					delay=min(delay*2.0,maxdelay)
+				continue
+			delay=0.1
+
+			done=set(done)
+			pending=[tid for tid in pending if tid not in done]
+			for tid in sorted(done):
+				task,results=self.get_results(tid)
+				yield (tid,task,results)
+
 	def get_results(self,taskid,retry=True):
 		"""Get the results for a completed task. Returns a tuple (task object,dictionary}."""
 
-		if self.servtype in ("thread","mpi") :
+		if self.servtype in ("thread","pool","mpi") :
 			return self.handler.get_results(taskid)
 
 		if self.servtype=="dc":
@@ -377,7 +411,10 @@ class EMTaskHandler(object):
 	queue=None
 
 	def __init__(self,path=None):
-		if EMTaskHandler.queue==None : EMTaskHandler.queue=JSTaskQueue(path)
+		if EMTaskHandler.queue==None :
+			# The SQLite queue scales much better with the number of tasks, but may not be available everywhere
+			try: EMTaskHandler.queue=SQLiteTaskQueue(path)
+			except: EMTaskHandler.queue=JSTaskQueue(path)
 		self.queue=EMTaskHandler.queue
 #		self.queue=EMTaskQueue(path)
 
@@ -532,6 +569,19 @@ class EMLocalTaskHandler(object):
 		EMLocalTaskHandler.lock.release()
 		return ret
 
+	def add_tasks(self,tasks):
+		"""Adds a list of tasks, returning a list of taskids"""
+		for task in tasks:
+			if not isinstance(task,JSTask) : raise Exception("Non-task object passed to EMLocalTaskHandler for execution")
+
+		EMLocalTaskHandler.lock.acquire()
+		ret=list(range(self.maxid,self.maxid+len(tasks)))
+		for tid,task in zip(ret,tasks):
+			dump(task,open("%s/%07d"%(self.scratchdir,tid),"wb"),-1)
+		self.maxid+=len(tasks)		# only now can the run() thread see the new tasks
+		EMLocalTaskHandler.lock.release()
+		return ret
+
 	def check_task(self,id_list):
 		"""Checks a list of tasks for completion. Note that progress is not currently
 		handled, so results are always -1, 0 or 100 """
@@ -601,6 +651,169 @@ class EMLocalTaskHandler(object):
 				EMLocalTaskHandler.lock.release()
 
 
+#######################
+#  Here we define the classes for local parallelism with a pool of persistent worker processes
+
+def pool_worker(taskq,resultq):
+	"""Main loop of an EMPoolTaskHandler worker process. Receives (taskid,module,pickled task) from taskq until it
+	receives None, and reports (command,taskid,data) back on resultq. Since the worker lives for the whole run, EMAN2
+	and the task modules are only imported once."""
+
+	while 1:
+		msg=taskq.get()
+		if msg==None : break
+		tid,modname,data=msg
+		resultq.put(("STRT",tid,None))
+
+		# As in e2parallel.py runlocaltask, the modules defining the tasks are imported before the task is unpickled.
+		# A forked worker would inherit them from the customer, but a spawned one (the default on Mac/Windows) doesn't
+		try:
+			if modname not in sys.modules : __import__(modname)
+			task=loads(data)
+		except:
+			resultq.put(("FAIL",tid,traceback.format_exc()))
+			continue
+
+		lastprog=[0]
+		def progress(val):
+			# we only send progress updates when the integer percentage changes, to keep the result queue quiet
+			if int(val)!=lastprog[0] :
+				lastprog[0]=int(val)
+				resultq.put(("PROG",tid,min(99,int(val))))
+			return True
+
+		try: ret=task.execute(progress)
+		except:
+			resultq.put(("FAIL",tid,traceback.format_exc()))
+			continue
+
+		resultq.put(("DONE",tid,ret))
+
+class EMPoolTaskHandler(object):
+	"""Local parallelism using a pool of persistent worker processes ('pool:N'). Unlike EMLocalTaskHandler, which
+	launches a new e2parallel.py process for each task and exchanges tasks and results through files in a scratch directory,
+	the N worker processes are started once, and tasks and results are passed through pipes. Idle workers pull the next
+	task from a single shared queue, so load balances automatically even when task run-times vary, and a thread in the
+	customer collects results as soon as they are available rather than polling."""
+
+	def __init__(self,nthreads=2):
+		import multiprocessing
+
+		self.maxthreads=nthreads
+		self.maxid=0
+		self.doexit=0
+		self.tasks={}			# tasks which have been submitted but whose results have not been retrieved, keyed by taskid
+		self.status={}			# -1 (queued), 0-99 (running) or 100 (complete), keyed by taskid
+		self.results={}			# results of completed tasks awaiting retrieval
+		self.cond=threading.Condition()		# protects the above, and is notified whenever a task completes
+
+		self.taskq=multiprocessing.Queue()
+		self.resultq=multiprocessing.Queue()
+		self.workers=[multiprocessing.Process(target=pool_worker,args=(self.taskq,self.resultq)) for i in range(nthreads)]
+		for w in self.workers:
+			w.daemon=True
+			w.start()
+
+		self.thr=threading.Thread(target=self.run)
+		self.thr.daemon=True
+		self.thr.start()
+
+	def stop(self):
+		"""Called externally (by the Customer) to nicely shut down the task handler"""
+		self.doexit=1
+		for w in self.workers: self.taskq.put(None)
+		for w in self.workers:
+			w.join(10)
+			if w.is_alive() : w.terminate()
+		self.resultq.put(("EXIT",None,None))
+		self.thr.join()
+
+	def add_task(self,task):
+		if not isinstance(task,JSTask) : raise Exception("Non-task object passed to EMPoolTaskHandler for execution")
+
+		self.cond.acquire()
+		ret=self.maxid
+		self.maxid+=1
+		self.tasks[ret]=task
+		self.status[ret]=-1
+		self.cond.release()
+
+		# the task is pickled here, so the worker can import its module before unpickling it, see pool_worker()
+		self.taskq.put((ret,task.__class__.__module__,dumps(task,-1)))
+		return ret
+
+	def add_tasks(self,tasks):
+		"""Adds a list of tasks, returning a list of taskids"""
+		return [self.add_task(task) for task in tasks]
+
+	def wait_results(self,id_list,timeout=None):
+		"""Waits until at least one of the tasks in id_list has completed (or timeout expires), then returns a list
+		of the completed tasks in id_list whose results have not yet been retrieved."""
+		ids=set(id_list)
+		self.cond.acquire()
+		try:
+			ret=[i for i in self.results if i in ids]
+			if len(ret)==0 :
+				self.cond.wait(timeout)
+				ret=[i for i in self.results if i in ids]
+		finally:
+			self.cond.release()
+		return ret
+
+	def check_task(self,id_list):
+		"""Checks a list of tasks for completion. Returns -1 for queued tasks, 0-99 for running tasks and 100 for
+		completed (or already retrieved) tasks"""
+		self.cond.acquire()
+		ret=[self.status.get(i,100) for i in id_list]
+		self.cond.release()
+		return ret
+
+	def get_results(self,taskid):
+		"""This returns a (task,dictionary) tuple for a task"""
+		self.cond.acquire()
+		try:
+			if self.status.get(taskid,-1)!=100 or taskid not in self.results : raise Exception("Task %d not complete !!!"%taskid)
+			ret=(self.tasks.pop(taskid),self.results.pop(taskid))
+			del self.status[taskid]
+		finally:
+			self.cond.release()
+
+		return ret
+
+	def run(self):
+		"""Collects status messages and results from the workers as they arrive"""
+		while 1:
+			try: com,tid,data=self.resultq.get(True,5)
+			except queue.Empty:
+				if self.doexit : break
+				# a worker which exits without reporting back means the task crashed the process
+				if not all([w.is_alive() for w in self.workers]) :
+					print("Error: a parallel worker process exited unexpectedly")
+					_thread.interrupt_main()
+					sys.stderr.flush()
+					sys.stdout.flush()
+					os._exit(1)
+				continue
+
+			if com=="EXIT" : break
+
+			if com=="FAIL" :
+				print("Error running task : ",tid)
+				print(data)
+				_thread.interrupt_main()
+				sys.stderr.flush()
+				sys.stdout.flush()
+				os._exit(1)
+
+			self.cond.acquire()
+			if com=="STRT" : self.status[tid]=0
+			elif com=="PROG" : self.status[tid]=data
+			elif com=="DONE" :
+				self.results[tid]=data
+				self.status[tid]=100
+				self.cond.notify_all()
+			self.cond.release()
+
 #######################
 #  Here we define the classes for MPI parallelism
 
@@ -1014,6 +1227,25 @@ class EMMpiTaskHandler(object):
 
 		return ret
 
+	def add_tasks(self,tasks):
+		"""Adds a list of tasks, returning a list of taskids. Since rank 0 simply runs every job up to the highest
+		number it has been told about, we only need to notify it once for the whole batch."""
+		for task in tasks:
+			if not isinstance(task,JSTask) : raise Exception("Non-task object passed to EMMpiTaskHandler for execution")
+		if len(tasks)==0 : return []
+
+		ret=[]
+		for task in tasks:
+			task.taskid=self.maxid
+			dump(task,open("%s/%07d"%(self.queuedir,self.maxid),"wb"),-1)
+			ret.append(self.maxid)
+			self.maxid+=1
+
+		self.sendcom("NEWJ",ret[-1])
+		if DBUG : self.mpiout.write("{} customer NEWJ complete {}\n".format(local_datetime(),ret[-1]))
+
+		return ret
+
 	def check_task(self,id_list):
 		"""Checks a list of tasks for completion."""
 
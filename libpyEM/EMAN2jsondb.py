@@ -50,6 +50,10 @@ import random
 import threading
 import traceback
 import re
+from collections import OrderedDict
+
+try: import sqlite3
+except ImportError: sqlite3=None
 
 from libpyEMData2 import EMData
 from libpyUtils2 import EMUtil
@@ -64,18 +68,23 @@ def js_one_key(url,key):
 
 	return JSDict.one_key(url,key)
 
-def js_open_dict(url):
+def js_open_dict(url,journal=False):
 	"""Opens a JSON file as a dict-like database object. The interface is almost identical to the BDB db_* functions.
 If opened. Writes to JDB dictionaries may be somewhat inefficient due to the lack of a good model (as BDB has) for
 multithreaded access. Default behavior is to write the entire dictionary to disk when any element is changed. File
 locking is attempted to avoid conflicts, but may not work in all situations. read-only access is a meaningless concept
 because file pointers are not held open beyond discrete transations. While it is possible to store images in JSON files
-it is not recommended due to inefficiency, and making files which are difficult to read."""
+it is not recommended due to inefficiency, and making files which are difficult to read.
+
+If journal is set, changes are instead appended to a <name>_journal.txt file next to the .json file, which is only
+periodically folded back into the .json file. This makes each write O(changes) rather than O(size of the dictionary),
+and is strongly recommended for large dictionaries written one key at a time (particle_parms_XX.json, for example).
+Once a journal exists, any process opening the dictionary will automatically use it."""
 
 	if url[-5:]!=".json" :
 		raise Exception("JSON databases must have .json extension")
 
-	return JSDict.open_db(url)
+	return JSDict.open_db(url,journal)
 
 def js_close_dict(url):
 	"""This will free some resources associated with the database. Not associated with closing a file pointer at present."""
@@ -97,6 +106,8 @@ def js_remove_dict(url):
 	js_close_dict(url)
 	try : os.unlink(url)
 	except OSError: pass
+	try : os.unlink(url[:-5]+"_journal.txt")
+	except OSError: pass
 
 	return
 
@@ -318,12 +329,17 @@ class JSTaskQueue(object):
 		JSTaskQueue.lock.release()
 		return None
 
+	def next_id(self,name):
+		"""Increments and returns the named counter ('grpctr' or 'taskctr') stored with the queue. Call with lock held."""
+		try: ret=self.active[name]+1
+		except: ret=1
+		self.active[name]=ret
+		return ret
+
 	def add_group(self):
 		"""returns a new (unique) group id to be used for related tasks"""
 		JSTaskQueue.lock.acquire()
-		try: ret=self.active["grpctr"]+1
-		except: ret=1
-		self.active["grpctr"]=ret
+		ret=self.next_id("grpctr")
 		JSTaskQueue.lock.release()
 		return ret
 
@@ -351,14 +367,12 @@ class JSTaskQueue(object):
 		"""Adds a new task to the active queue, scheduling it for execution. If parentid is
 		specified, a doubly linked list is established. parentid MUST be the id of a task
 		currently in the active queue. parentid and wait_for may be set in the task instead"""
-		if not isinstance(task,EMTask) : raise Exception("Invalid Task")
+		if not isinstance(task,JSTask) : raise Exception("Invalid Task")
 		#self.active["max"]+=1
 		#tid=self.active["max"]
 
 		JSTaskQueue.lock.acquire()
-		try: tid=self.active["taskctr"]+1
-		except: tid=1
-		self.active["taskctr"]=tid
+		tid=self.next_id("taskctr")
 		task.taskid=tid
 		task.queuetime=time.time()
 
@@ -470,6 +484,108 @@ class JSTaskQueue(object):
 		del self.active[taskid]
 		JSTaskQueue.lock.release()
 
+class SQLTaskDict(object):
+	"""Dict-like access to the tasks table of a SQLiteTaskQueue, used as its 'active' member in place of the
+	JSDict of a JSTaskQueue. Keys are integer task ids and values are pickled tasks. The 'started' column is
+	maintained from task.starttime so the pending tasks can be found through an index rather than a scan."""
+
+	def __init__(self,db):
+		self.db=db
+		self.lock=threading.RLock()		# one connection is shared by all server threads
+
+	def query(self,sql,args=()):
+		self.lock.acquire()
+		try: return self.db.execute(sql,args).fetchall()
+		finally: self.lock.release()
+
+	def __len__(self):
+		return self.query("SELECT COUNT(*) FROM tasks")[0][0]
+
+	def keys(self):
+		return [r[0] for r in self.query("SELECT tid FROM tasks ORDER BY tid")]
+
+	def __contains__(self,tid):
+		try: return len(self.query("SELECT 1 FROM tasks WHERE tid=?",(int(tid),)))>0
+		except ValueError: return False
+
+	has_key=__contains__
+
+	def __getitem__(self,tid):
+		try: r=self.query("SELECT task FROM tasks WHERE tid=?",(int(tid),))
+		except ValueError: raise KeyError(tid)
+		if len(r)==0 : raise KeyError(tid)
+		return pickle.loads(bytes(r[0][0]))
+
+	def __setitem__(self,tid,task):
+		started=int(task.starttime!=None)
+		self.query("INSERT OR REPLACE INTO tasks (tid,started,task) VALUES (?,?,?)",(int(tid),started,sqlite3.Binary(pickle.dumps(task,-1))))
+
+	def __delitem__(self,tid):
+		self.query("DELETE FROM tasks WHERE tid=?",(int(tid),))
+
+	def first_pending(self):
+		"""Returns (tid,task) for the lowest numbered task which hasn't been started, or None"""
+		r=self.query("SELECT tid,task FROM tasks WHERE started=0 ORDER BY tid LIMIT 1")
+		if len(r)==0 : return None
+		return (r[0][0],pickle.loads(bytes(r[0][1])))
+
+class SQLiteTaskQueue(JSTaskQueue):
+	"""A JSTaskQueue with the active tasks stored in an SQLite database (tasks_active.sqlite, in WAL mode) rather
+	than a JSON file. Each task update touches only one row rather than rewriting the whole queue, and get_task()
+	finds the next unstarted task through an index, so dispatch is O(log N) in the number of queued tasks rather
+	than O(N). The method surface is identical to JSTaskQueue. The (small) filename/did maps remain JSON files."""
+
+	def __init__(self,path=None):
+		if sqlite3==None : raise Exception("SQLiteTaskQueue requires the sqlite3 module")
+		if path==None or len(path)==0 :
+			path="tmp"
+
+		if not os.path.isdir(path) : os.makedirs(path)
+		self.path=path
+
+		self.db=sqlite3.connect("%s/tasks_active.sqlite"%path,check_same_thread=False,isolation_level=None)
+		self.db.execute("PRAGMA journal_mode=WAL")
+		self.db.execute("PRAGMA synchronous=NORMAL")
+		self.db.execute("CREATE TABLE IF NOT EXISTS tasks (tid INTEGER PRIMARY KEY, started INTEGER, task BLOB)")
+		self.db.execute("CREATE INDEX IF NOT EXISTS tasks_pending ON tasks (started,tid)")
+		self.db.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER)")
+
+		self.active=SQLTaskDict(self.db)							# active tasks keyed by id
+		self.complete=open("%s/tasks_complete.txt"%path,"a")		# complete task log
+		self.nametodid=js_open_dict("%s/tasks_name2did.json"%path)	# map local data filenames to did codes
+		self.didtoname=js_open_dict("%s/tasks_did2name.json"%path)	# map data id to local filename
+		self.precache=js_open_dict("%s/precache_files.json"%path)		# files to precache on clients, has one element "files" with a list of paths
+
+	def to_jsondict(self):
+		dct={"__class__":"SQLiteTaskQueue"}
+		dct["path"]=self.path
+		return dct
+
+	def next_id(self,name):
+		"""Increments and returns the named counter. Call with lock held."""
+		self.active.lock.acquire()
+		try:
+			self.db.execute("INSERT OR IGNORE INTO counters (name,value) VALUES (?,0)",(name,))
+			self.db.execute("UPDATE counters SET value=value+1 WHERE name=?",(name,))
+			return self.db.execute("SELECT value FROM counters WHERE name=?",(name,)).fetchone()[0]
+		finally:
+			self.active.lock.release()
+
+	def get_task(self,clientid=0):
+		"""This will return the next task waiting for execution"""
+		JSTaskQueue.lock.acquire()
+		try:
+			r=self.active.first_pending()
+			if r==None : return None
+
+			tid,task=r
+			task.starttime=time.time()
+			task.clientid=clientid
+			self.active[tid]=task
+			return task
+		finally:
+			JSTaskQueue.lock.release()
+
 class JSTask(object):
 	"""This class represents a task to be completed. Generally it will be subclassed. This is effectively
 	an abstract superclass to define common member variables and methods. Note that the data dictionary,
@@ -541,15 +657,24 @@ class JSDict(object):
 	"""This class provides dict-like access to a JSON file on disk. It goes to some lengths to insure thread/process-safety, even if
 performance must be sacrificed. The only case where it may not work is when a remote filesystem which doesn't obey file-locking is used.
 Note that when opened, the entire JSON file is read into memory. For this reason (and others) it is not a good idea to store (many) images
-in JSON files. JSDict objects are cached in RAM, and will not be removed from the cache unless the close() method is called, or too many
-JSDicts are open at one time."""
+in JSON files. JSDict objects are cached in RAM, and will not be removed from the cache unless the close() method is called. Optionally
+(see set_cache_policy()), the cache is an LRU, bounded by the total size of the JSON files currently held in memory (cachemax). Since
+another thread may be using an evicted dictionary, this should only be enabled by single threaded programs. See also cache_info()."""
 
-	opendicts={}
-	lock=threading.Lock()		# to make this section threadsafe
+	opendicts=OrderedDict()		# least recently used first
+	lock=threading.RLock()		# to make this section threadsafe
+
+	cachemax=0					# approximate limit (in bytes of JSON text) on the dictionaries held in memory, 0 for no limit (see set_cache_policy)
+	staleness=0.05				# seconds during which a dictionary without local changes is assumed to be current, without checking the disk
+	cachestats={"hits":0,"misses":0,"skipped":0,"evictions":0}
+
+	journalmin=1<<20			# journal must be at least this many bytes before it is compacted into the .json file
+	journalratio=1.0			# and also larger than this fraction of the .json file size
 
 	@classmethod
-	def open_db(cls,path=None):
-		"""This should be used to create a JSDict instance. It caches already open dictionaries to avoid redundancy and conflicts."""
+	def open_db(cls,path=None,journal=False):
+		"""This should be used to create a JSDict instance. It caches already open dictionaries to avoid redundancy and conflicts.
+If journal is set, the dictionary will use the append-only journal for writes (see js_open_dict)."""
 
 		cls.lock.acquire()
 
@@ -566,10 +691,13 @@ JSDicts are open at one time."""
 			raise Exception("Cannot find path for {}".format(path))
 
 		if normpath in cls.opendicts :
+			ret=cls.opendicts.pop(normpath)		# move to the most recently used end
+			cls.opendicts[normpath]=ret
+			if journal : ret.journal=True
 			cls.lock.release()
-			return cls.opendicts[normpath]
+			return ret
 
-		try : ret=JSDict(path)
+		try : ret=JSDict(path,journal)
 		except:
 			cls.lock.release()
 			traceback.print_exc()
@@ -617,7 +745,68 @@ JSDicts are open at one time."""
 
 		return ret
 
-	def __init__(self,path=None):
+	@classmethod
+	def set_cache_policy(cls,cachemax=None,staleness=None):
+		"""Adjusts the process-wide dictionary cache. cachemax is the approximate limit, in bytes of JSON text, of
+dictionaries held in memory before the least recently used are closed. It is 0 (no limit) by default because an evicted
+dictionary is emptied in place, so another thread in the middle of reading it could see it empty. Only enable this in
+programs which don't access dictionaries from multiple threads.
+
+staleness is a time in seconds during which repeated reads of a dictionary with no local changes will be served from
+memory without checking the file on disk. The default, 0.05, only merges the checks of rapid repeated accesses (eg -
+a loop of get() calls) into one, and is well below the modification time resolution of many filesystems, which change
+detection already depends on. Larger values are useful for GUI tools which poll many files, but should be avoided where
+multiple processes are actively writing the same dictionaries. 0 checks the disk on every access."""
+
+		if cachemax!=None : cls.cachemax=cachemax
+		if staleness!=None : cls.staleness=staleness
+		cls.enforce_cache_limit()
+
+	@classmethod
+	def cache_info(cls):
+		"""Returns a dictionary of cache hit/miss counters and current memory use. 'hits' counts synchronizations which
+didn't need to reparse the file, of which 'skipped' didn't even need to stat() it. 'misses' counts file reads."""
+
+		cls.lock.acquire()
+		loaded=[d for d in list(cls.opendicts.values()) if d.lasttime!=0]
+		ret=dict(cls.cachestats)
+		ret["open"]=len(cls.opendicts)
+		ret["loaded"]=len(loaded)
+		ret["bytes"]=sum([d.filesize for d in loaded])
+		cls.lock.release()
+		return ret
+
+	@classmethod
+	def enforce_cache_limit(cls,keep=None):
+		"""Closes the least recently used dictionaries until the loaded dictionaries fit within cachemax. Dictionaries
+with pending (deferred) changes and 'keep' are never closed. Closed dictionaries remain in opendicts, and will be
+transparently reread if accessed again."""
+
+		if cls.cachemax<=0 : return
+
+		cls.lock.acquire()
+		try:
+			total=sum([d.filesize for d in list(cls.opendicts.values()) if d.lasttime!=0])
+			for d in list(cls.opendicts.values()):
+				if total<=cls.cachemax : break
+				if d is keep or d.lasttime==0 or d.busy or len(d.changes)>0 or len(d.delkeys)>0 : continue
+				total-=d.filesize
+				d.lasttime=0			# unlike close(), this doesn't compact journals, there is no need to rewrite the file
+				d.data={}
+				cls.cachestats["evictions"]+=1
+		finally:
+			cls.lock.release()
+
+	def touch(self):
+		"""Marks this dictionary as most recently used"""
+		JSDict.lock.acquire()
+		try:
+			JSDict.opendicts.pop(self.normpath,None)
+			JSDict.opendicts[self.normpath]=self
+		finally:
+			JSDict.lock.release()
+
+	def __init__(self,path=None,journal=False):
 		"""This is a dict-like representation of a JSON file on disk. Warning, the entire file contents are parsed and held
 in memory for efficient access. File change monitoring and file locking is used to insure self-consistency across processes.
 Due to JSON module, there may be some data types which aren't permitted as values. While this module may be used like a traditional
@@ -625,7 +814,8 @@ dictionary for the most part, for efficiency, you may consider using the setval(
 synchronization with the disk file.
 
 There is no name/path separation as existed with BDB objects. 'path' is a full path to the .json file. A normalized version
-of the path is stored as self.normpath"""
+of the path is stored as self.normpath. If journal is set (or a journal file already exists), changes are appended to
+a separate journal file rather than rewriting the whole .json file on every update."""
 
 		from EMAN2 import e2getcwd
 
@@ -638,10 +828,16 @@ of the path is stored as self.normpath"""
 		self.changes={}					# a set of changes to merge when next committing to disk
 		self.delkeys=set()				# a set of keys to delete on next update
 		self.lasttime=0					# last time the database was accessed
+		self.checktime=0				# last time we checked the file on disk for changes
+
+		self.journal=journal			# if set, changes are appended to journalpath rather than rewriting the file
+		self.journalpath=self.normpath[:-5]+"_journal.txt"
+		self.journalpos=0				# byte offset in the journal up to which we have replayed records
+		self.snapid=None				# identifies the version of the .json snapshot the journal applies to
 
 		self.busy=False					# used for some degree of threadsafety to supplement file locking
 		self.sync()
-		JSDict.opendicts[self.normpath]=self	# add ourselves to the cache
+		self.touch()					# add ourselves to the cache
 
 	def __str__(self): return "<JSDict instance: %s>" % self.path
 
@@ -651,8 +847,9 @@ of the path is stored as self.normpath"""
 	def close(self):
 		"""This will free effectively all of the memory associated with the object. It doesn't actually eliminate
 		the object entirely since there may be multiple copies around. If the dictionary is accessed again, it will
-		be automatically reopened."""
+		be automatically reopened. A journaled dictionary is compacted first, so the .json file is complete."""
 		if len(self.changes)>0 or len(self.delkeys): self.sync()
+		if self.journal : self.compact()
 		self.lasttime=0
 		self.data={}
 #		del JSDict.opendicts[self.normpath]
@@ -661,18 +858,36 @@ of the path is stored as self.normpath"""
 		"""This is where all of the JSON file access occurs. This one routine handles both reading and writing, with file locking"""
 
 		while self.busy: time.sleep(.1)		# this is for some degree of threadsafety beyond file locking
-		self.busy=True
 
-		# We check for the _tmp file first
-		try:
-			mt2=os.stat(self.normpath[:-5]+"_tmp.json").st_mtime
-		except:
-			mt2=None
+		# Within the staleness window, a dictionary without local changes is served from RAM
+		now=time.time()
+		if JSDict.staleness>0 and self.lasttime!=0 and len(self.changes)==0 and len(self.delkeys)==0 and now-self.checktime<JSDict.staleness :
+			JSDict.cachestats["hits"]+=1
+			JSDict.cachestats["skipped"]+=1
+			return
+
+		self.busy=True
+		self.checktime=now
+		misses=JSDict.cachestats["misses"]
+
+		# Another process may have switched this file to journaled mode since we opened it
+		if not self.journal and os.path.exists(self.journalpath) : self.journal=True
+		if self.journal :
+			try: self.sync_journal()
+			finally: self.busy=False
+			self.sync_done(misses)
+			return
 
 		# We check the modification time on the file to see if we need to read an update
 		try:
 			mt=os.stat(self.normpath).st_mtime
 		except:		# file doesn't exist or we can't stat() it
+			# We check for the _tmp file
+			try:
+				mt2=os.stat(self.normpath[:-5]+"_tmp.json").st_mtime
+			except:
+				mt2=None
+
 			try:
 				# if we find this, then we probably caught the files at just the wrong instant when another thread was doing an update
 				if mt2!=None : time.sleep(0.5)
@@ -695,12 +910,13 @@ of the path is stored as self.normpath"""
 					json.dump({},jfile)
 					file_unlock(jfile)
 					jfile=None
-					mt=time.time()
+					mt=os.stat(self.normpath).st_mtime
 
 
 		### Read entire dict from file
 		# If we have unprocessed changes, or if the file has changed since last access
 		if len(self.changes)>0 or mt>self.lasttime :
+			JSDict.cachestats["misses"]+=1
 			jfile=open(self.normpath,"r")		# open the file
 			file_lock(jfile,readonly=True)		# lock it for reading
 
@@ -744,12 +960,170 @@ of the path is stored as self.normpath"""
 			file_unlock(jfile)
 			jfile=None
 			os.unlink(self.normpath[:-5]+"_tmp.json")
+			mt=os.stat(self.normpath).st_mtime		# make sure we include our recent change
 
-		self.lasttime=os.stat(self.normpath).st_mtime	# make sure we include our recent change, if made
+		self.lasttime=mt
 		self.busy=False
+		self.sync_done(misses)
+
+	def sync_done(self,misses):
+		"""Bookkeeping for the shared cache after a sync(). misses is the value of the miss counter before the sync."""
+
+		self.touch()
+		if JSDict.cachestats["misses"]==misses : JSDict.cachestats["hits"]+=1
+		else : JSDict.enforce_cache_limit(self)		# we (re)read the file, so memory use may have grown
+
+	def snapshot_id(self):
+		"""Returns a tuple which changes whenever the .json snapshot is replaced, or None if it doesn't exist"""
+		try: st=os.stat(self.normpath)
+		except OSError: return None
+		return (st.st_ino,st.st_mtime,st.st_size)
+
+	def compact(self):
+		"""Folds the journal of a journaled dictionary into its .json file, so the .json file alone is complete and
+current (eg - for copying or reading with other tools). close() does this automatically."""
+
+		if not self.journal : return
+		while self.busy: time.sleep(.1)
+		self.busy=True
+		try: self.sync_journal(True)
+		finally: self.busy=False
+
+	def sync_journal(self,compact=False):
+		"""Journaled equivalent of sync(), called from sync() with self.busy already set. The .json file holds a snapshot
+of the dictionary, and each change since that snapshot is a single-line record appended to the journal. Readers only
+parse journal records beyond the offset they last read, and the snapshot is rewritten (compacted) only when the journal
+has grown larger than the snapshot itself, so the amortized cost of a write is proportional to the size of the change.
+If compact is set, any existing journal is compacted regardless of size. The journal file lock serializes writers and
+compaction, and compaction removes the journal file."""
+
+		pending=len(self.changes)>0 or len(self.delkeys)>0
+		if compact and not os.path.exists(self.journalpath) : compact=False		# nothing to fold in
+		write=pending or compact
+
+		# no snapshot yet, create an empty one. Any journal left behind is from a deleted file, so it goes too
+		if self.snapshot_id()==None :
+			try: os.makedirs(os.path.dirname(self.normpath))
+			except: pass
+			try:
+				fd=os.open(self.normpath,os.O_WRONLY|os.O_CREAT|os.O_EXCL)
+				os.write(fd,b"{}")
+				os.close(fd)
+				try: os.unlink(self.journalpath)
+				except OSError: pass
+			except OSError:
+				if not os.path.exists(self.normpath) : raise Exception("Error: Unable to open {} for writing".format(self.normpath))
+
+		# fast path, nothing on disk has changed since we last looked
+		if not write and self.lasttime!=0 :
+			try: jsize=os.stat(self.journalpath).st_size
+			except OSError: jsize=0
+			if jsize==self.journalpos and self.snapshot_id()==self.snapid : return
+
+		while 1:
+			try: jfile=open(self.journalpath,"ab+" if write else "rb")
+			except IOError:
+				if write : raise Exception("Error: Unable to open {} for writing".format(self.journalpath))
+				jfile=None				# readable snapshot but no journal (yet, or any more)
+				break
+			file_lock(jfile,readonly=not write)
+			# the journal is removed when it is compacted, which may have happened while we waited for the lock
+			try: st=os.stat(self.journalpath)
+			except OSError: st=None
+			fst=os.fstat(jfile.fileno())
+			if st!=None and (st.st_ino,st.st_dev)==(fst.st_ino,fst.st_dev) : break
+			file_unlock(jfile)
+			jfile.close()
+
+		try:
+			if jfile!=None :
+				jfile.seek(0,2)
+				jsize=jfile.tell()
+			else: jsize=0
+
+			# snapshot was compacted (or we were closed), so we need to start over
+			snap=self.snapshot_id()
+			if self.lasttime==0 or snap!=self.snapid or jsize<self.journalpos :
+				JSDict.cachestats["misses"]+=1
+				jsfile=open(self.normpath,"r")
+				try: self.data=json.load(jsfile,object_hook=json_to_obj)
+				except:
+					jsfile.seek(0)
+					if len(jsfile.read().strip())==0 : self.data={}
+					else:
+						traceback.print_exc()
+						raise Exception("Error reading JSON file : {}".format(self.path))
+				self.filesize=jsfile.tell()
+				jsfile=None
+				self.snapid=snap
+				self.journalpos=0
+
+			# replay only the records we haven't seen yet
+			if jfile!=None and jsize>self.journalpos :
+				if self.journalpos>0 : JSDict.cachestats["misses"]+=1
+				jfile.seek(self.journalpos)
+				for line in jfile:
+					if not line.endswith(b"\n") : break		# incomplete record from an interrupted write
+					self.journalpos+=len(line)
+					try: rec=json.loads(line.decode("utf-8"),object_hook=json_to_obj)
+					except:
+						print("Warning: skipping corrupt record in ",self.journalpath)
+						continue
+					if rec[0]=="d" : self.data.pop(rec[1],None)
+					else : self.data[rec[1]]=rec[2]
+
+			if pending :
+				if jsize>self.journalpos : jfile.truncate(self.journalpos)		# drop any partial record at the end
+				recs=[json.dumps(["s",k,v],default=obj_to_json) for k,v in list(self.changes.items())]
+				recs.extend([json.dumps(["d",k]) for k in self.delkeys])
+				jfile.seek(0,2)
+				jfile.write(("\n".join(recs)+"\n").encode("utf-8"))
+				jfile.flush()
+				self.journalpos=jfile.tell()
+
+				self.data.update(self.changes)
+				self.changes={}
+				for k in self.delkeys:
+					try: del self.data[k]
+					except: pass
+				self.delkeys=set()
+
+			if jfile!=None and self.journalpos>0 :
+				if compact or (pending and self.journalpos>max(JSDict.journalmin,self.filesize*JSDict.journalratio)) : self.compact_journal(jfile)
+		finally:
+			if jfile!=None :
+				file_unlock(jfile)
+				jfile.close()
+
+		self.lasttime=time.time()
+
+	def compact_journal(self,jfile):
+		"""Folds the journal back into the .json snapshot. jfile must be the journal, opened for writing and locked."""
+
+		jss=json.dumps(self.data,indent=0,sort_keys=True,default=obj_to_json)
+		jss=re.sub(listrex,denl,jss)
+
+		# the new snapshot replaces the old one atomically, so readers without the lock always see a complete file
+		tmppath=self.normpath[:-5]+"_jcompact.tmp"
+		out=open(tmppath,"w")
+		out.write(jss)
+		out.close()
+		try: os.rename(tmppath,self.normpath)
+		except OSError:
+			os.unlink(self.normpath)		# Windows won't rename over an existing file
+			os.rename(tmppath,self.normpath)
+
+		# the journal is removed rather than emptied, so processes opening the dictionary later don't switch to
+		# journaled mode unless they are asked to. A new journal is created by the next journaled write
+		try: os.unlink(self.journalpath)
+		except OSError: jfile.truncate(0)		# Windows won't remove an open file
+		self.journalpos=0
+		self.filesize=len(jss)
+		self.snapid=self.snapshot_id()
 
 	def __len__(self):
-		"""Ignores any pending updates for speed"""
+		"""Ignores any pending updates for speed, but rereads a closed (or evicted) dictionary"""
+		if self.lasttime==0 : self.sync()
 		return len(self.data)
 
 
@@ -901,6 +1275,7 @@ JSDict.__delitem__=JSDict.delete
 jsonclasses = {
 	"JSTask":JSTask.from_jsondict,
 	"JSTaskQueue":JSTaskQueue.from_jsondict,
+	"SQLiteTaskQueue":SQLiteTaskQueue.from_jsondict,
 	"EMData":emdata_from_jsondict,
 	"EMAN2Ctf":eman2ctf_from_jsondict,
 	"Transform":transform_from_jsondict
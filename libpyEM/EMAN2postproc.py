@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+from __future__ import print_function
+from __future__ import division
+#
+# Copyright (c) 2000- Baylor College of Medicine
+#
+# This software is issued under a joint BSD/GNU license. You may use the
+# source code in this file under either license. However, note that the
+# complete EMAN2 and SPARX software packages have some GPL dependencies,
+# so you are responsible for compliance with the licenses of these packages
+# if you opt to use BSD licensing. The warranty disclaimer below holds
+# in either instance.
+#
+# This complete copyright notice must be included in any revised version of the
+# source code. Additional authorship citations may be added, but existing
+# author citations must be preserved.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  2111-1307 USA
+#
+#
+
+# In-process versions of the post-processing steps common to the refinement programs (FSC, FSC-based Wiener
+# filtration, automasking), operating on volumes already in memory rather than running e2proc3d.py on files.
+# The output files are identical to those produced by the equivalent e2proc3d.py commands.
+
+from builtins import range
+from EMAN2 import *
+
+def calc_fsc(even,odd,apix=None):
+	"""Computes the FSC between two volumes. Returns (s,fsc), with s in 1/A, excluding the origin and the final point,
+	as written by e2proc3d.py --calcfsc. apix defaults to the apix_x of even."""
+
+	if apix==None : apix=even["apix_x"]
+	fsc=even.calc_fourier_shell_correlation(odd)
+	third=len(fsc)//3
+	s=[x/apix for x in fsc[1:third-1]]
+	return s,fsc[third+1:2*third-1]
+
+def save_fsc(even,odd,fscfile,apix=None):
+	"""Computes the FSC between two volumes (see calc_fsc) and writes it to fscfile in the same format as
+	e2proc3d.py --calcfsc. Returns (s,fsc)."""
+
+	s,fsc=calc_fsc(even,odd,apix)
+	Util.save_data(s[0],s[0],fsc,fscfile)		# the s axis starts at 0, so the first point is also the step
+	return s,fsc
+
+def masked_fsc(even,odd,mask,fscfile,apix=None):
+	"""Multiplies copies of the two volumes by mask and writes the FSC between them to fscfile.
+	Returns the masked (even,odd) volumes."""
+
+	evenm=even*mask
+	oddm=odd*mask
+	save_fsc(evenm,oddm,fscfile,apix)
+	return evenm,oddm
+
+def wiener_byfsc(vol,fscfile,snrmult=2.0,maxfreq=None,inplace=True):
+	"""Applies filter.wiener.byfsc to vol, using the FSC in fscfile (as written by save_fsc). If inplace is
+	False, a filtered copy is returned and vol is unchanged."""
+
+	parms={"fscfile":fscfile,"snrmult":snrmult}
+	if maxfreq!=None : parms["maxfreq"]=maxfreq
+	if inplace :
+		vol.process_inplace("filter.wiener.byfsc",parms)
+		return vol
+	return vol.process("filter.wiener.byfsc",parms)
+
+def automask_radial(vol,expand=0):
+	"""Generates a soft mask for vol with mask.auto3d. The threshold and the maximum radius are determined
+	from the radial profile of the maximum value in each shell, and the mask is expanded by expand voxels
+	beyond the default (~5% of the box + 20 A). vol is not modified."""
+
+	nx=vol["nx"]
+	apix=vol["apix_x"]
+	md=vol.calc_radial_dist(nx//2,0,1,3)	# radial max value per shell in real space
+
+	rmax=int(nx/2.2)	# we demand at least 10% padding
+	vmax=max(md[:rmax])	# max value within permitted radius
+
+	# this finds the first radius where the max value @ r falls below overall max/4
+	# this becomes the new maximum mask radius
+	act=0
+	mv=0,0
+	for i in range(rmax):
+		if md[i]>mv[0] : mv=md[i],i             # find the radius of the  max val in range
+		if not act and md[i]<0.9*vmax : continue
+		act=True
+		if md[i]<0.2*vmax :
+			rmax=i
+			break
+
+	vmax=mv[0]
+
+	# excludes any spurious high values at large radius
+	vol=vol.process("mask.sharp",{"outer_radius":rmax})
+
+	# automask
+	mask=vol.process("mask.auto3d",{"threshold":vmax*.15,"radius":0,"nshells":int(nx*0.05+0.5+20.0/apix)+expand,"nmaxseed":24,"return_mask":1})
+	mask.process_inplace("filter.lowpass.gauss",{"cutoff_freq":1.0/40.0})
+
+	return mask
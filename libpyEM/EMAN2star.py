@@ -32,11 +32,15 @@ from __future__ import division
 #
 #
 
+
 from builtins import range
+from builtins import object
 import os
 import os.path
 import re
 import traceback
+from collections import OrderedDict
+import numpy as np
 
 #from libpyEMData2 import EMData
 #from libpyUtils2 import EMUtil
@@ -60,11 +64,19 @@ import traceback
 #
 # keys have the leading "_" stripped off
 #
-# loop values are represented as a python list. keys from the same loop should have an identical number
-# of elements. loops are identified internally as a list of lists (self.loop) independent of the
-# actual data storage.
+# loop values are represented as a NumPy array per key (int64, float64 or fixed-width string), with individual
+# values returned as Python types (see StarColumn). Keys from the same loop have an identical number of elements. Loops are identified internally as a list of lists of keys
+# (self.loops) independent of the actual data storage. Loop data is parsed in chunks of rows as the file
+# is read, so the file text is never held in memory all at once. For files too large to hold even the
+# columns in memory, StarFile.iter_rows() will stream the rows of a single loop.
+#
+# Files may contain multiple data blocks (eg - data_optics and data_particles in Relion 3.1). All blocks
+# are read into self.blocks. The StarFile dictionary itself represents the selected block (the first, unless
+# dataname is specified).
 ######
 
+matcher=re.compile("""("[^"]+")|('[^']+')|([^\s]+)""")
+
 def goodval(vals): 
 	val=max(vals)
 	try: val=int(val)
@@ -73,130 +85,288 @@ def goodval(vals):
 		except: pass
 	return val
 
+def splitquoted(line):
+	"""Splits a line containing quoted values into a list of value strings, with the quotes removed"""
+	return [m[0][1:-1] if m[0] else m[1][1:-1] if m[1] else m[2] for m in matcher.findall(line)]
+
+class StarColumn(np.ndarray):
+	"""The values of one loop column. This is a NumPy array, except that single elements, whether indexed or iterated
+over, are returned as Python int, float or str values, which (unlike NumPy scalars) can be stored in JSON files or
+passed to the C++ wrappers directly."""
+
+	def __getitem__(self,i):
+		ret=np.ndarray.__getitem__(self,i)
+		if isinstance(ret,np.generic) : return ret.item()
+		return ret
+
+	def __iter__(self):
+		if self.ndim==1 : return iter(self.tolist())
+		return np.ndarray.__iter__(self)
+
+def column_array(vals):
+	"""Converts a sequence of value strings from one loop column into the most specific NumPy array type: int64, float64
+or fixed-width string, as a StarColumn. Elements of string columns only become Python strings when they are accessed."""
+	for dt in (np.int64,np.float64):
+		try: return np.array(vals,dtype=dt).view(StarColumn)
+		except (ValueError,OverflowError): pass
+	return np.array(vals).view(StarColumn)
+
+def merge_columns(chunks):
+	"""Concatenates the per-chunk arrays of one loop column. If the chunks were converted to different types, numeric
+chunks are promoted to float, or everything is converted to strings if any chunk contained strings."""
+	if len(chunks)==0 : return np.array([]).view(StarColumn)
+	if len(chunks)==1 : return chunks[0]
+	kinds=set([c.dtype.kind for c in chunks])
+	if len(kinds)>1 and (kinds&set("SU")) : chunks=[c.astype(str) for c in chunks]
+	return np.concatenate(chunks).view(StarColumn)
+
+def format_string(s):
+	"""Quotes a string value for writing, if necessary"""
+	if isinstance(s,bytes) and not isinstance(s,str) : s=s.decode("utf-8")
+	elif not isinstance(s,str) : s=str(s)
+	if "\n" in s : return "\n;{}\n;\n".format(s)
+	if len(s)==0 or len(s.split())>1 or s[0] in "_#'\"" : return "'{}'".format(s)
+	return s
+
+def column_format(col):
+	"""Returns a %-style format string for the values of one loop column. Floats are written with repr(), the shortest
+string which reads back as exactly the same value."""
+	if col.dtype.kind in "iub" : return "%d"
+	if col.dtype.kind=="f" : return "%r"
+	return "%s"
+
+class StarLines(object):
+	"""Reads the non-blank, non-comment lines of an open STAR file, with a single line of pushback"""
+
+	def __init__(self,fin):
+		self.fin=fin
+		self.pending=None
+
+	def readline(self):
+		"""Returns the next line, or None at the end of the file"""
+		if self.pending!=None :
+			ret=self.pending
+			self.pending=None
+			return ret
+		for l in self.fin:
+			if len(l.strip())!=0 and l[0]!="#" : return l
+		return None
+
+	def pushback(self,line):
+		self.pending=line
+
+	def readtext(self,first):
+		"""Reads a ;-delimited multi-line text value. first is the line containing the opening ;"""
+		val=[first[1:]]
+		while 1:
+			line=self.readline()
+			if line==None : raise Exception("StarFile: Error found parsing multi-line string value")
+			if line[0]==';' : break
+			val.append(line)
+		val[-1]=val[-1].rstrip()		# remove trailing whitespace on the last line
+		return "".join(val)
+
+	def readloopkeys(self):
+		"""Reads the list of keys following a loop_ line"""
+		keys=[]
+		while 1:
+			line=self.readline()
+			if line==None : break
+			line=line.strip()
+			if line[0]!="_" :
+				self.pushback(line)
+				break
+			keys.append(line.split()[0][1:])
+		return keys
+
+	def readlooprows(self,ncol,chunk=100000):
+		"""Generator reading the data rows of a loop, yielding lists of up to 'chunk' rows, each a list of ncol value
+strings. The common case of one row per line of unquoted values is handled with a single split(). Rows split over
+multiple lines, quoted values and ;-delimited text values are also handled."""
+		rows=[]
+		buf=[]
+		while 1:
+			line=self.readline()
+			if line==None : break
+			s=line.strip()
+			if s[0]=="_" or s[:5].lower() in ("loop_","data_") :
+				self.pushback(line)
+				break
+
+			if line[0]==";" : buf.append(self.readtext(line))
+			elif "'" in s or '"' in s : buf.extend(splitquoted(s))
+			else :
+				tok=s.split()
+				if len(buf)==0 and len(tok)==ncol : rows.append(tok)
+				else : buf.extend(tok)
+
+			while len(buf)>=ncol :
+				rows.append(buf[:ncol])
+				buf=buf[ncol:]
+
+			if len(rows)>=chunk :
+				yield rows
+				rows=[]
+
+		if len(buf)>0 : print("StarFile: incomplete loop row ignored: ",buf)
+		if len(rows)>0 : yield rows
+
 class StarFile(dict):
 	
 	def __init__(self,filename,dataname=None):
 		"""dataname can be used to specify a specific data block to read from the file.
-If not set, it will read the first block encountered. Value should be of the form "data_general"."""
+If not set, it will read the first block encountered. Value should be of the form "data_general" (or "general").
+All of the blocks in the file are available in self.blocks, as (dict,loops) tuples keyed by block name."""
 		dict.__init__(self)
 		self.filename=filename
+		if dataname!=None and dataname[:5]=="data_" : dataname=dataname[5:]
 		self.dataname=dataname
 		self.loops=[]
+		self.blocks=OrderedDict()
 		
 		if os.path.isfile(filename) :
 			self.readfile()
-	def _nextline(self):
-		"""Used internally when parsing a star file to emulate readline"""
-		self.lineptr+=1
-		return self.lines[self.lineptr-1]
-	
-	def readfile(self):
-		"""This parses the STAR file, replacing any previous contents in the dictionary"""
+
+	def readfile(self,chunk=100000):
+		"""This parses the STAR file, replacing any previous contents in the dictionary. Loop columns are converted to
+typed NumPy arrays 'chunk' rows at a time as the file is read."""
 		
 		self.loops=[]
 		self.clear()
-		
-		matcher=re.compile("""("[^"]+")|('[^']+')|([^\s]+)""")
-		
-		# read the entire file into a buffer, this dramatically simplifies the logic, even if it eats a chunk of RAM
-		self.lines=[i for i in open(self.filename,"r") if len(i.strip())!=0 and i[0]!="#"]
-		self.lineptr=0
-
-		# seek to the correct block of data
-		if self.dataname!=None:
-			lt=len(self.dataname)
-			for i,l in enumerate(self.lines):
-				if l[:lt]==self.dataname : break
-			else:
-				raise Exception,"Dataname '{}' not found".format(self.dataname)
-			self.lineptr=i+1
-		
+		self.blocks=OrderedDict()
+
+		fin=open(self.filename,"r")
+		lines=StarLines(fin)
+		d=None
 		while 1:
-			try: line=self._nextline().strip()
-			except: break
-		
+			line=lines.readline()
+			if line==None : break
+			line=line.strip()
+
+			if line[:5].lower()=="data_":
+				d,loops={},[]
+				self.blocks[line[5:]]=(d,loops)
+				continue
+
+			if d==None :			# content before any data_ line
+				d,loops={},[]
+				self.blocks[""]=(d,loops)
+
 			if line[0]=="_" :				# A single key/value pair
 				spl=line.split(None,1)		# split on whitespace
 				key=spl[0][1:]
 				
 				if len(spl)==2:				# value on the same line
-					if spl[1][0] in ("'",'"') : self[key]=spl[1:-1]		# we assume the last non-whitespace character is the ending delimeter
-					else:
-						try: val=int(spl[1])
-						except: 
-							try: val=float(spl[1])
-							except: val=spl[1]			# if not an int or a float, must be a simple value string
-					
-						self[key]=val
+					if spl[1][0] in ("'",'"') : d[key]=spl[1].strip()[1:-1]		# we assume the last non-whitespace character is the ending delimeter
+					else: d[key]=goodval([spl[1]])
 				else:						# value starts on next line
-					line2=self._nextline()
+					line2=lines.readline()
+					if line2==None : raise Exception("StarFile: Key-value pair error. Matching value for %s not found."%key)
 					if line2[0] in ("'",'"') :
-						self[key]=line2.strip()[1:-1]
+						d[key]=line2.strip()[1:-1]
 					elif line2[0]==";" :
-						val=[line2[1:]]
-						while 1:
-							try: line2=self._nextline()
-							except: raise Exception("StarFile: Error found parsing multi-line string value for %s"%key)
-							if line2[0]==';' : break
-							val.append(line2)
-						val[-1]=val[-1].rstrip()		# remove trailing whitespace on the last line
-						val="".join(val)
-						self[key]=val
+						d[key]=lines.readtext(line2)
 					else: raise Exception("StarFile: Key-value pair error. Matching value for %s not found."%key)
-			elif line[:5].lower()=="data_":
-				if len(self)>0 :
-#					print("WARNING: second data_ block encountered in ",self.filename,". Cannot deal with this at present. Second block ignored")
-					return
-				self.dataname=line[5:]
 			elif line[:5].lower()=="loop_":
-				loop=[]
-				self.loops.append(loop)				# add it to the list of loops immediately then update it as we go
-				# First we read the parameter names for the loop
-				while 1:
-					line2=self._nextline().strip()
-					if line2[0]=="_":
-						loop.append(line2.split()[0][1:])
-						self[loop[-1]]=[]			# this will hold the data values when we read them
-					else: break
-				self.lineptr-=1
-				
-				# Now we read the actual loop data elements
-				vals=[]
-				while 1:
-					try: line2=self._nextline().strip()
-					except: break
-				
-					if line2[0]=="_" or line2.lower()[:5]=="loop_" : break
-					elif line2[0]==";" :
-						val=line2[0][1:]
-						while 1:
-							line2=self._nextline()
-							if line2[0]==";":
-								break
-							val+=line2
-						vals.append(val)
-					else:
-						vals.extend([goodval(i) for i in matcher.findall(line2)])
-						if len(vals)<len(loop) :			# we may need to read multiple lines to get enough values
-							continue
-						if len(vals)>len(loop) : 
-							print("mismatch")
-							print(line2)
-							print(len(loop),loop)
-							print(len(vals),vals)
-							break
-						for i in range(len(vals)): self[loop[i]].append(vals[i])
-						vals=[]
-				self.lineptr-=1
+				keys=lines.readloopkeys()
+				cols=[[] for k in keys]
+				for rows in lines.readlooprows(len(keys),chunk):
+					for c,vals in zip(cols,zip(*rows)): c.append(column_array(vals))
+				for k,c in zip(keys,cols): d[k]=merge_columns(c)
+				loops.append(keys)
 			else:
 				print("StarFile: Unknown content on line :",line)
-				break
 
-				
-	def writefile(self,filename=None):
-		"""Writes the contents of the current dictionary back to disk using either the existing filename, or an alternative name passed in"""
+		fin.close()
+
+		if len(self.blocks)==0 : return
+		if self.dataname==None : self.dataname=list(self.blocks.keys())[0]
+		elif self.dataname not in self.blocks : raise Exception("Dataname '{}' not found".format(self.dataname))
+
+		# the selected block is stored in this object, so changes to it are reflected when writing
+		d,loops=self.blocks[self.dataname]
+		self.update(d)
+		self.loops=loops
+		self.blocks[self.dataname]=(self,self.loops)
+
+	@staticmethod
+	def iter_rows(filename,dataname=None,loop=0,chunk=10000):
+		"""Generator which streams the rows of a single loop from a STAR file, for files too large to read into memory.
+Yields a dictionary for each row, keyed by the loop column names, with values converted to int or float where possible.
+dataname selects the data block (the first block if None), and loop which loop within that block (0 for the first)."""
+
+		if dataname!=None and dataname[:5]=="data_" : dataname=dataname[5:]
+
+		fin=open(filename,"r")
+		try:
+			lines=StarLines(fin)
+			inblock=dataname==None			# content before the first data_ line counts as the first block
+			seen=False						# whether we have seen any content in the requested block
+			nloop=0
+			while 1:
+				line=lines.readline()
+				if line==None : break
+				s=line.strip()
+
+				if s[:5].lower()=="data_" :
+					if inblock and seen : break
+					inblock=dataname==None or s[5:]==dataname
+					continue
+
+				if line[0]==";" : lines.readtext(line)		# skip over text values
+				elif s[:5].lower()=="loop_" :
+					keys=lines.readloopkeys()
+					target=inblock and nloop==loop
+					if inblock : nloop+=1
+					for rows in lines.readlooprows(len(keys),chunk):
+						if target :
+							for r in rows: yield dict(zip(keys,[goodval([v]) for v in r]))
+					if target : return
+				if inblock : seen=True
+		finally:
+			fin.close()
+
+	def add_loop(self,cols):
+		"""Adds a loop to the current data block. cols is a list of (key,values) pairs, where each values is a sequence
+with the same length. Keys should not include the leading '_'."""
+		keys=[]
+		for k,v in cols:
+			self[k]=np.asarray(v).view(StarColumn)
+			keys.append(k)
+		self.loops.append(keys)
+
+	def writefile(self,filename=None,chunk=100000):
+		"""Writes the contents of the current dictionary back to disk using either the existing filename, or an alternative name passed in.
+Any other data blocks read from the file are written as well. Loops are written 'chunk' rows at a time, with a single
+string formatting operation per row."""
 		
-		print("Sorry, writing not implemented yet")
-					
-			
-			
+		if filename==None : filename=self.filename
+
+		blocks=OrderedDict(self.blocks)
+		if self.dataname==None : self.dataname=""
+		if self.dataname not in blocks : blocks[self.dataname]=(self,self.loops)
+
+		out=open(filename,"w")
+		for name,(d,loops) in list(blocks.items()):
+			out.write("\ndata_{}\n\n".format(name))
+
+			inloop=set([k for l in loops for k in l])
+			for k in d:
+				if k in inloop : continue
+				v=d[k]
+				if isinstance(v,(int,float,np.number)) : out.write("_{} {}\n".format(k,v))
+				else : out.write("_{} {}\n".format(k,format_string(v)))
+
+			for keys in loops:
+				out.write("\nloop_\n")
+				for i,k in enumerate(keys): out.write("_{} #{}\n".format(k,i+1))
+
+				cols=[np.asarray(d[k]) for k in keys]
+				fmt=" ".join([column_format(c) for c in cols])+"\n"
+				n=len(cols[0]) if len(cols)>0 else 0
+				for i in range(0,n,chunk):
+					vals=[[format_string(s) for s in c[i:i+chunk].tolist()] if c.dtype.kind in "SUO" else c[i:i+chunk].tolist() for c in cols]
+					out.write("".join([fmt%r for r in zip(*vals)]))
+				out.write("\n")
+
+		out.close()
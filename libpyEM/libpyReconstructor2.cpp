@@ -209,6 +209,8 @@ BOOST_PYTHON_MODULE(libpyReconstructor2)
         .def("preprocess_slice", (EMAN::EMData* (EMAN::Reconstructor::*)(const EMAN::EMData* const, const EMAN::Transform&))&EMAN::Reconstructor::preprocess_slice, return_value_policy< manage_new_object >())
 //         .def("finish", (EMAN::EMData* (EMAN::Reconstructor::*)(bool))&EMAN::Reconstructor::finish, return_value_policy< manage_new_object >())
         .def("finish", &reconstructor_finish, return_value_policy< manage_new_object >())
+        .def("get_partial_volume", &EMAN::Reconstructor::get_partial_volume, return_value_policy< manage_new_object >())
+        .def("get_partial_weights", &EMAN::Reconstructor::get_partial_weights, return_value_policy< manage_new_object >())
         .def("get_name", pure_virtual(&EMAN::Reconstructor::get_name))
         .def("get_desc", pure_virtual(&EMAN::Reconstructor::get_desc))
 // 		.def("get_emdata", (&EMAN::Reconstructor::get_emdata),  return_internal_reference< 1 >())
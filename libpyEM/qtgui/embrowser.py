@@ -1355,6 +1355,11 @@ class EMDirEntry(object) :
 	col = (lambda x:int(x.index), lambda x:x.name, lambda x:x.filetype, lambda x:x.size, lambda x:x.dim, lambda x:safe_int(x.nimg), lambda x:x.date)
 #	classcount = 0
 
+	# The .browsercache.json dictionaries are shared by all entries, and may be filled in by several scanner threads at once.
+	# Writes are deferred and only flushed to disk in batches by flushCaches()
+	cachelock = threading.RLock()
+	dirtycaches = set()
+
 	def __init__(self, root, name, index, parent = None, hidedot = True, dirregex = None) :
 		"""The path for this item is root/name.
 		Parent (EMDirEntry) must be specified if it exists.
@@ -1388,6 +1393,7 @@ class EMDirEntry(object) :
 
 		if not self.isbdb : self.size = stat[6]		# file size (integer, bytes)
 		else : self.size = "-"
+		self.mtime = stat[8]						# modification time, compared against the cache so unchanged files aren't probed again
 		self.date = local_datetime(stat[8])			# modification date (string: yyyy/mm/dd hh:mm:ss)
 
 		# These can be expensive so we only get them on request, or if they are fast
@@ -1588,7 +1594,7 @@ class EMDirEntry(object) :
 
 		tp = self.truepath()
 
-		if self.updtime >= os.stat(tp).st_mtime : change = 0
+		if self.updtime >= self.mtime : change = 0		# mtime was already stat()ed when the entry was created
 		else : change = 1
 
 		if check_info :
@@ -1598,6 +1604,36 @@ class EMDirEntry(object) :
 
 		return change
 
+	def openCache(self) :
+		"""Returns the shared .browsercache.json dictionary for the directory containing this entry"""
+
+		with EMDirEntry.cachelock :
+			return js_open_dict(self.root+"/.browsercache.json")
+
+	def readCache(self, cache, cachename) :
+		"""Returns the cached metadata tuple for cachename. This is served from memory, without checking the file on disk,
+		so many entries can be looked up quickly. Raises KeyError if there is no cached value."""
+
+		with EMDirEntry.cachelock :
+			return cache.get(cachename, True)
+
+	def writeCache(self, cache, cachename, val) :
+		"""Stores a metadata tuple in the cache. The disk file is not updated until flushCaches() is called."""
+
+		with EMDirEntry.cachelock :
+			cache.setval(cachename, val, True)
+			EMDirEntry.dirtycaches.add(cache)
+
+	@staticmethod
+	def flushCaches() :
+		"""Writes any deferred cache updates to disk, one write per modified .browsercache.json"""
+
+		with EMDirEntry.cachelock :
+			for cache in EMDirEntry.dirtycaches :
+				try : cache.sync()
+				except : pass			# eg - a read-only directory, the cache is just not saved
+			EMDirEntry.dirtycaches.clear()
+
 	def fillDetails(self) :
 		"""Fills in the expensive metadata about this entry. Returns False if no update was necessary.
 		Returns 0 if nothing was done
@@ -1612,8 +1648,8 @@ class EMDirEntry(object) :
 		cachename = self.name+"!main"
 
 		try :
-			cache = js_open_dict(self.root+"/.browsercache.json")
-			self.updtime, self.dim, self.filetype, self.nimg, self.size = cache[cachename]		# try to read the cache for the current file
+			cache = self.openCache()
+			self.updtime, self.dim, self.filetype, self.nimg, self.size = self.readCache(cache, cachename)		# try to read the cache for the current file
 
 			if self.cache_old(False) == 0 : return 2 		# current cache, no further update necessary
 		except :
@@ -1650,7 +1686,7 @@ class EMDirEntry(object) :
 				self.nimg = -1
 				self.dim = "-"
 
-			if cache != None : cache.setval(cachename, (time.time(), self.dim, self.filetype, self.nimg, self.size), True)
+			if cache != None : self.writeCache(cache, cachename, (time.time(), self.dim, self.filetype, self.nimg, self.size))
 
 			return 1
 
@@ -1712,7 +1748,7 @@ class EMDirEntry(object) :
 				self.nimg = "-"
 
 		if cache != None :
-			try : cache.setval(cachename, (time.time(), self.dim, self.filetype, self.nimg, self.size), True)
+			try : self.writeCache(cache, cachename, (time.time(), self.dim, self.filetype, self.nimg, self.size))
 			except : pass
 		return 1
 
@@ -3249,15 +3285,16 @@ class EMBrowserWidget(QtWidgets.QWidget) :
 
 		self.updtimer = QTimer()		# This causes the actual display updates, which can't be done from a python thread
 		self.updtimer.timeout.connect(self.updateDetailsDisplay)
-		self.updthreadexit = False		# when set, this triggers the update thread to exit
-		self.updthread = threading.Thread(target = self.updateDetails)	# The actual thread
+		self.updthreadexit = False		# when set, this triggers the update threads to exit
+		self.updthreads = [threading.Thread(target = self.updateDetails) for i in range(4)]	# The actual threads, mostly waiting on file I/O
 		self.updlist = []				# List of QModelIndex items in need of updating
+		self.updprio = []				# Currently visible items in need of updating, processed before updlist
 		self.redrawlist = []			# List of QModelIndex items in need of redisplay
 		self.needresize = 0			# Used to resize column widths occaisonally
 		self.expanded = set()			# We get multiple expand events for each path element, so we need to keep track of which ones we've updated
 
 		self.setPath(startpath)	# start in the local directory
-		self.updthread.start()
+		for t in self.updthreads : t.start()
 		self.updtimer.start(200)
 
 		self.result = None			# used in modal mode. Holds final selection
@@ -3275,25 +3312,54 @@ class EMBrowserWidget(QtWidgets.QWidget) :
 		QtWidgets.qApp.setOverrideCursor(Qt.ArrowCursor)
 
 	def updateDetails(self) :
-		"""This is spawned as a thread to gradually fill in file details in the background"""
+		"""This is spawned as a pool of threads to gradually fill in file details in the background. Visible items
+		are updated first. New metadata is written to the browser caches in batches rather than once per file."""
 
+		nchanged = 0
 		while 1 :
 			if self.updthreadexit : break
 
-			if len(self.updlist) == 0 :
+			try : de = self.updprio.pop()
+			except IndexError :
+				try : de = self.updlist.pop()
+				except IndexError : de = None
+
+			if de == None :
+				if nchanged > 0 :
+					EMDirEntry.flushCaches()
+					nchanged = 0
 				time.sleep(1.0)				# If there is nothing to update at the moment, we don't need to spin our wheels as much
-			else :
-				de = self.updlist.pop()
+				continue
+
+# 			print de.internalPointer().truepath()
+
+			r = de.internalPointer().fillDetails()
+			if r == 1 :
+				self.redrawlist.append(de)		# if the update changed anything, we trigger a redisplay of this entry
+				nchanged += 1
+				if nchanged >= 500 :
+					EMDirEntry.flushCaches()
+					nchanged = 0
+				time.sleep(0.01)			# prevents updates from happening too fast and slowing the machine down
+			if r == 2 :						# This means we're reading from a cache, and we should probably update as fast as possible
+				self.redrawlist.append(de)
+# 			print "### ", de.internalPointer().path()
 
-# 				print de.internalPointer().truepath()
+		if nchanged > 0 : EMDirEntry.flushCaches()
 
-				r = de.internalPointer().fillDetails()
-				if r == 1 :
-					self.redrawlist.append(de)		# if the update changed anything, we trigger a redisplay of this entry
-					time.sleep(0.01)			# prevents updates from happening too fast and slowing the machine down
-				if r == 2 :						# This means we're reading from a cache, and we should probably update as fast as possible
-					self.redrawlist.append(de)
-# 				print "### ", de.internalPointer().path()
+	def updateVisible(self) :
+		"""Queues the items currently visible in the tree for updating ahead of the rest of the directory"""
+
+		idx = self.wtree.indexAt(QtCore.QPoint(1, 1))
+		height = self.wtree.viewport().height()
+
+		vis = []
+		while idx.isValid() and self.wtree.visualRect(idx).top() < height :
+			if idx.internalPointer().filetype == None : vis.append(idx.sibling(idx.row(), 0))
+			idx = self.wtree.indexBelow(idx)
+
+		vis.reverse()			# the update threads pop from the end
+		self.updprio = vis
 
 	def updateDetailsDisplay(self) :
 		"""Since we can't do GUI updates from a thread, this is a timer event to update the display after the beckground thread
@@ -3304,6 +3370,8 @@ class EMBrowserWidget(QtWidgets.QWidget) :
 			self.wtree.resizeColumnToContents(3)
 			self.wtree.resizeColumnToContents(4)
 
+		self.updateVisible()
+
 		if len(self.redrawlist) == 0 :
 			return
 
@@ -3582,6 +3650,7 @@ class EMBrowserWidget(QtWidgets.QWidget) :
 		if path[:2] == "./" : path = path[2:]
 
 		self.updlist = []
+		self.updprio = []
 		self.redrawlist = []
 
 		filt = str(self.wfilter.currentText()).strip()
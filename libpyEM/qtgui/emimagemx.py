@@ -60,6 +60,10 @@ from .emglobjects import EMOpenGLFlagsAndTools,EMGLProjectionViewMatrices,EMBasi
 from .emapplication import EMGLWidget, get_application, EMApp
 from .emanimationutil import LineAnimation
 import weakref
+import threading
+import hashlib
+import os
+import time
 
 from .emapplication import EMProgressDialog
 
@@ -247,6 +251,9 @@ class EMImageMXWidget(EMGLWidget, EMGLProjectionViewMatrices):
 		self.selected=[]
 		self.hist = []
 		self.rzonce=False			# This is used to make sure we don't automatically resize more than once
+		self.prefetch_timer=QtCore.QTimer()		# redraws as images are read in the background by caches which support it
+		self.prefetch_timer.timeout.connect(self.prefetch_check)
+		self.prefetch_timer.start(250)
 		self.targetorigin=None
 		self.targetspeed=20.0
 		self.mag = 1.1				# magnification factor
@@ -361,9 +368,16 @@ class EMImageMXWidget(EMGLWidget, EMGLProjectionViewMatrices):
 		return self.renderPixmap(0,0,True)
 
 	def closeEvent(self,event):
+		self.prefetch_timer.stop()
 		self.clear_gl_memory()
 		EMGLWidget.closeEvent(self, event)
 
+	def prefetch_check(self):
+		"""Redraws the display if the cache has read new images in the background since the last check"""
+		try: updated=self.data.prefetch_updated()
+		except: return
+		if updated: self.updateGL()
+
 	def set_current_set(self,name):
 		"""Makes the named set the target of any mouse interactions"""
 		if not name in self.sets :
@@ -1115,6 +1129,9 @@ class EMImageMXWidget(EMGLWidget, EMGLProjectionViewMatrices):
 			self.set_label_ratio = 0.1
 			self.coords = {}
 
+			if self.matrix_panel.visiblerows and hasattr(self.data,"prefetch"):
+				self.data.prefetch(int(self.matrix_panel.ystart*self.matrix_panel.visiblecols),min(n,int(self.matrix_panel.visiblerows*self.matrix_panel.visiblecols))-1)
+
 			if self.matrix_panel.visiblerows:
 				for row in range(self.matrix_panel.ystart,self.matrix_panel.visiblerows):
 					for col in range(0,self.matrix_panel.visiblecols):
@@ -2816,6 +2833,151 @@ class ApplyProcessor(object):
 	def __call__(self,data):
 		data.process_inplace(self.processor,self.processor_args)
 
+class EMThumbnailCache(object):
+	'''
+	An on-disk cache of downsampled copies of 2-D images, so a matrix display can show something immediately while
+	the full size image is read. Thumbnails for each source file are stored as a single HDF stack in ~/.eman2/thumbnails,
+	named by a hash of the absolute path, the modification time of the file and the thumbnail size, so a modified file
+	simply gets a new thumbnail stack. Image n of the source file is image n of the thumbnail stack. Each thumbnail is
+	written only once, and stacks which haven't been used recently are removed (see trim()).
+	'''
+	def __init__(self,size=64,path=None,maxsize=1.0e9,maxage=30):
+		'''
+		@param size the approximate size of the longest edge of each thumbnail
+		@param path the directory used to store thumbnails, default ~/.eman2/thumbnails
+		@param maxsize the approximate limit, in bytes, on the total size of the thumbnail directory
+		@param maxage thumbnail stacks which haven't been used in this many days are removed
+		'''
+		if path == None: path = os.path.join(e2gethome(),".eman2","thumbnails")
+		self.path = path
+		self.size = size
+		self.names = {}					# source filename -> thumbnail filename, or None for files which can't be cached
+		self.present = {}				# thumbnail filename -> set of image numbers known to be in the stack
+		self.lock = threading.Lock()	# thumbnail files are written from several threads
+
+		try: os.makedirs(self.path)
+		except: pass
+
+		self.trim(maxsize,maxage)
+
+	def trim(self,maxsize,maxage):
+		'''
+		Removes thumbnail stacks which haven't been used in maxage days, then the least recently used stacks until the
+		total size is below maxsize bytes. A stack's modification time is updated when it is first used in each session.
+		'''
+		files = []
+		try:
+			for f in os.listdir(self.path):
+				if not f.endswith(".hdf"): continue
+				try: st = os.stat(os.path.join(self.path,f))
+				except: continue
+				files.append((st.st_mtime,st.st_size,os.path.join(self.path,f)))
+		except: return
+
+		now = time.time()
+		total = 0
+		for mtime,size,name in sorted(files,reverse=True):
+			total += size
+			if now-mtime > maxage*86400 or total > maxsize:
+				try: os.unlink(name)
+				except: pass
+
+	def thumb_name(self,file_name):
+		'''
+		Returns the name of the thumbnail stack for the given source file, or None if the file can't be cached (bdb: for example)
+		'''
+		try: return self.names[file_name]
+		except: pass
+
+		try:
+			key = "{}:{}:{}".format(os.path.abspath(file_name),os.stat(file_name).st_mtime,self.size)
+			name = os.path.join(self.path,hashlib.md5(key.encode("utf-8")).hexdigest()+".hdf")
+		except: name = None
+
+		# marks the stack as recently used for trim()
+		if name != None:
+			try: os.utime(name,None)
+			except: pass
+
+		self.names[file_name] = name
+		return name
+
+	def has(self,name,idx):
+		'''
+		True if image idx of the thumbnail stack name has already been written. Call with self.lock held.
+		'''
+		present = self.present.setdefault(name,set())
+		if idx in present: return True
+		try:
+			if EMData(name,idx,True).has_attr("thumb_shrink"):
+				present.add(idx)
+				return True
+		except: pass
+		return False
+
+	def shrink_factor(self,nx,ny):
+		'''
+		The integer downsampling for an image of the given size, 1 means no thumbnail is worthwhile
+		'''
+		return max(nx,ny)//self.size
+
+	def get(self,file_name,idx,nx,ny):
+		'''
+		Returns the thumbnail of image idx in file_name, expanded back to nx x ny pixels, or None if there is no thumbnail
+		'''
+		k = self.shrink_factor(nx,ny)
+		name = self.thumb_name(file_name)
+		if k < 2 or name == None or not os.path.exists(name): return None
+
+		with self.lock:
+			try: thumb = EMData(name,idx)
+			except: return None
+			self.present.setdefault(name,set()).add(idx)
+
+		d = to_numpy(thumb)
+		d = numpy.repeat(numpy.repeat(d,k,0),k,1)
+		d = numpy.pad(d,((0,ny-d.shape[0]),(0,nx-d.shape[1])),"edge")
+		ret = from_numpy(numpy.ascontiguousarray(d))
+		hdr = thumb.get_attr_dict()
+		for key in ("nx","ny","nz","apix_x","apix_y","apix_z","thumb_shrink"): hdr.pop(key,None)
+		ret.set_attr_dict(hdr)
+		return ret
+
+	def put(self,file_name,idx,image):
+		'''
+		Stores a thumbnail of image, which must be image idx of file_name as read from disk
+		'''
+		if image["nz"] != 1: return
+		k = self.shrink_factor(image["nx"],image["ny"])
+		name = self.thumb_name(file_name)
+		if k < 2 or name == None: return
+
+		with self.lock:
+			if self.has(name,idx): return
+
+		thumb = image.process("math.meanshrink",{"n":k})
+		thumb["thumb_shrink"] = k
+		with self.lock:
+			try:
+				thumb.write_image(name,idx)
+				self.present[name].add(idx)
+			except: pass
+
+def lwpc_prefetch_worker(cacheref):
+	'''
+	Background thread used by EMLightWeightParticleCache. Holds only a weak reference to the cache, so the thread
+	exits once the cache is no longer in use.
+	'''
+	while True:
+		cache = cacheref()
+		if cache == None: return
+		ran = cache.prefetch_one()
+		event = cache.prefetch_event
+		cache = None
+		if not ran:
+			event.wait(1.0)
+			event.clear()
+
 class EMLightWeightParticleCache(EMMXDataCache):
 	'''
 	A light weight particle cache is exactly that and more. Initialize it with a list of filenames and particle indices
@@ -2830,8 +2992,11 @@ class EMLightWeightParticleCache(EMMXDataCache):
 	and refocuses the cache when asked for an image outside its current index bounds. This makes this cache only suitable for linear access
 	schemes, not random.
 
+	The display tells the cache which images are visible with prefetch(). Images beyond the visible range, in the direction
+	of scrolling, are then read by background threads. If thumbnails are enabled, images which haven't been read yet are
+	returned as expanded copies of their on-disk thumbnail (see EMThumbnailCache), and replaced when the full image arrives.
 	'''
-	def from_file(file_name):
+	def from_file(file_name,thumbnails=None):
 		'''
 		If this was C++ this would be the constructor for this class that took a single file name
 		@param file_name the name of a particle stack file
@@ -2840,14 +3005,16 @@ class EMLightWeightParticleCache(EMMXDataCache):
 		n = EMUtil.get_image_count(file_name)
 		data = [[file_name,i,[]] for i in range(n)]
 
-		return EMLightWeightParticleCache(data,len(data))
+		return EMLightWeightParticleCache(data,len(data),thumbnails=thumbnails)
 
 	from_file = staticmethod(from_file)
 
-	def __init__(self,data,cache_max=2048):
+	def __init__(self,data,cache_max=2048,nthreads=2,thumbnails=None):
 		'''
 		@param data list of lists - lists in in the list are of the form [image_name, idx, [list of functions that take an EMData as the first argument]]
 		@param cache_max the maximum number of stored images - you might have to shorten this if you have very large images
+		@param nthreads the number of background threads reading ahead of the display, 0 disables prefetching
+		@param thumbnails if set, an on-disk thumbnail cache is used. Default is the e2display.mxthumbnails application setting
 		'''
 		EMMXDataCache.__init__(self)
 		self.data = data
@@ -2861,6 +3028,19 @@ class EMLightWeightParticleCache(EMMXDataCache):
 		# set stuff
 		self.visible_sets = []
 		self.sets = {}
+		# prefetching
+		self.lock = threading.RLock()		# protects cache and cache_start, which the background threads also modify
+		self.thumbs = set()					# indices currently represented by a thumbnail rather than the real image
+		self.visible = (0,-1)				# the last range reported by prefetch()
+		self.prefetch_list = []				# indices for the background threads to read, next one at the end
+		self.prefetch_event = threading.Event()
+		self.updated = False				# set when background threads have replaced something in the cache
+		self.nthreads = nthreads
+		self.threads = []
+
+		if thumbnails == None: thumbnails = E2getappval("e2display","mxthumbnails",False)
+		if thumbnails: self.thumbnails = EMThumbnailCache()
+		else: self.thumbnails = None
 
 	def __len__(self):
 		'''
@@ -2914,8 +3094,10 @@ class EMLightWeightParticleCache(EMMXDataCache):
 		i.e. e2eulerxplor
 		'''
 #		return self[idx].get_attr_dict()
-		adj_idx = idx-self.cache_start
-		image = self.cache[adj_idx]
+		with self.lock:
+			adj_idx = idx-self.cache_start
+			if adj_idx < 0 or adj_idx >= self.cache_max or idx in self.thumbs: image = None
+			else: image = self.cache[adj_idx]
 		if image == None:
 			data = self.data[idx]
 			h = get_header(data[0],data[1])
@@ -2941,48 +3123,53 @@ class EMLightWeightParticleCache(EMMXDataCache):
 		# Don't let cache start go negative; it will break.
 		if new_cache_start < 0:
 			new_cache_start = 0
-		if new_cache_start < self.cache_start and (new_cache_start + self.cache_max) > self.cache_start:
-			overlap = new_cache_start + self.cache_max - self.cache_start
-			cache = [None for i in range(0,self.cache_max-overlap)]
-			cache.extend(self.cache[0:overlap])
-			self.cache = cache
-		elif new_cache_start > self.cache_start and  new_cache_start < (self.cache_start + self.cache_max):
-			cache = self.cache[new_cache_start:self.cache_start+self.cache_max]
-			overlap =self.cache_max - ( new_cache_start - self.cache_start)
-			cache = [None for i in range(0,self.cache_max-overlap)]
-			cache.extend(self.cache[0:overlap])
-			self.cache = cache
-		else:
-			self.cache = [None for i in range(self.cache_max)]
-
-		self.cache_start = new_cache_start
-
+		with self.lock:
+			shift = new_cache_start - self.cache_start
+			if shift < 0 and -shift < self.cache_max:
+				cache = [None for i in range(-shift)]
+				cache.extend(self.cache[0:self.cache_max+shift])
+				self.cache = cache
+			elif shift > 0 and shift < self.cache_max:
+				cache = self.cache[shift:]
+				cache.extend([None for i in range(shift)])
+				self.cache = cache
+			elif shift != 0:
+				self.cache = [None for i in range(self.cache_max)]
+
+			self.cache_start = new_cache_start
+			self.thumbs = set([i for i in self.thumbs if i >= new_cache_start and i < new_cache_start+self.cache_max])
 
 	def __getitem__(self,idx):
 		'''
 		operator[] support - the main interface
 		'''
-		if idx < self.cache_start or idx > self.cache_start+self.cache_max:
-			self.refocus_cache(idx)
+		with self.lock:
+			if idx < self.cache_start or idx >= self.cache_start+self.cache_max:
+				self.refocus_cache(idx)
+
+			adj_idx = idx-self.cache_start
+			try: image = self.cache[adj_idx]
+			except: image=None
 
-		adj_idx = idx-self.cache_start
-		try: image = self.cache[adj_idx]
-		except: image=None
 		if image == None:
-			try: a = self.__load_item(idx,adj_idx)
+			if self.thumbnails != None and self.xsize != None and self.ysize != None:
+				a = self.__load_thumbnail(idx)
+				if a != None: return a
+			try: a = self.__load_item(idx)
 			except: a=None
 			return a
 		else: return image
 
-	def __load_item(self,idx,adj_idx):
+	def __read_item(self,idx):
 		'''
-		Work horse function for reading an image and applying any of the supplied functions
+		Work horse function for reading an image and applying any of the supplied functions. Doesn't touch the cache.
 		'''
 		data = self.data[idx]
 
 		try:
 			a = EMData(data[0],data[1])
 			if a==None : raise Exception
+			if self.thumbnails != None: self.thumbnails.put(data[0],data[1],a)
 		except :
 			for i in range(10):
 				try:
@@ -2993,19 +3180,124 @@ class EMLightWeightParticleCache(EMMXDataCache):
 			a.to_zero()
 
 		for func in data[2]: func(a)
-		self.cache[adj_idx] = a
 		return a
 
+	def __store_item(self,idx,a):
+		'''
+		Puts an image into the cache, unless the cache has been refocused elsewhere in the meantime. Returns True if stored.
+		'''
+		with self.lock:
+			adj_idx = idx-self.cache_start
+			if adj_idx < 0 or adj_idx >= self.cache_max: return False
+			self.cache[adj_idx] = a
+			self.thumbs.discard(idx)
+			return True
+
+	def __load_item(self,idx):
+		'''
+		Reads an image into the cache in the calling thread
+		'''
+		a = self.__read_item(idx)
+		self.__store_item(idx,a)
+		return a
+
+	def __load_thumbnail(self,idx):
+		'''
+		Puts an expanded thumbnail into the cache for an image which hasn't been read yet, and queues the real image for the
+		background threads. Returns None if there is no thumbnail.
+		'''
+		data = self.data[idx]
+		a = self.thumbnails.get(data[0],data[1],self.xsize,self.ysize)
+		if a == None: return None
+
+		for func in data[2]: func(a)
+		with self.lock:
+			if self.__store_item(idx,a):
+				self.thumbs.add(idx)
+				self.prefetch_list.append(idx)
+		self.start_prefetch()
+		return a
+
+	def prefetch(self,first,last):
+		'''
+		Called by the display with the range of image indices currently visible. Queues images just beyond the visible
+		range, in the direction the display last scrolled, for reading by the background threads.
+		'''
+		if self.nthreads <= 0 or len(self.data) == 0: return
+		if (first,last) == self.visible: return
+
+		direction = -1 if first < self.visible[0] else 1
+		self.visible = (first,last)
+		nvis = last-first+1
+		ahead = min(nvis*3,(self.cache_max-nvis)//2)		# a few pages ahead, if the cache is large enough to hold them
+		if ahead <= 0: return
+
+		with self.lock:
+			# keep the visible range and the read-ahead in the cache
+			if direction > 0: lo,hi = first,min(last+ahead,len(self.data)-1)
+			else: lo,hi = max(first-ahead,0),last
+			if lo < self.cache_start or hi >= self.cache_start+self.cache_max:
+				if direction > 0: self.refocus_cache(lo+self.cache_max//2)
+				else: self.refocus_cache(hi+1-self.cache_max+self.cache_max//2)
+
+			# farthest first, since the threads pop from the end. Thumbnails are replaced before reading ahead
+			if direction > 0: todo = list(range(hi,last,-1))
+			else: todo = list(range(lo,first))
+			todo.extend([i for i in sorted(self.thumbs,reverse=True) if i >= first and i <= last])
+			self.prefetch_list = todo
+
+		self.start_prefetch()
+
+	def start_prefetch(self):
+		'''
+		Wakes the background threads, starting them the first time this is called
+		'''
+		if self.nthreads <= 0: return
+		if len(self.threads) == 0:
+			for i in range(self.nthreads):
+				t = threading.Thread(target=lwpc_prefetch_worker,args=(weakref.ref(self),))
+				t.daemon = True
+				t.start()
+				self.threads.append(t)
+		self.prefetch_event.set()
+
+	def prefetch_one(self):
+		'''
+		Called by the background threads. Reads the next queued image, if any. Returns False if there was nothing to do.
+		'''
+		with self.lock:
+			while True:
+				try: idx = self.prefetch_list.pop()
+				except IndexError: return False
+				adj_idx = idx-self.cache_start
+				if adj_idx < 0 or adj_idx >= self.cache_max: continue
+				if self.cache[adj_idx] == None or idx in self.thumbs: break
+
+		try: a = self.__read_item(idx)
+		except: return True
+		if self.__store_item(idx,a): self.updated = True
+		return True
+
+	def prefetch_updated(self):
+		'''
+		Returns True, once, if the background threads have added images to the cache since the last call, meaning
+		the display should be redrawn
+		'''
+		ret = self.updated
+		self.updated = False
+		return ret
+
 	def on_idle(self):
 		'''
 		call this to load unloaded images in the cache
-		This needs to be rethought, maybe use a thread?
 		'''
-		for idx,i in enumerate(self.cache):
-			if i == None:
-				# only does one at a time
-				self.__load_item(idx,idx+self.cache_start)
-				return
+		with self.lock:
+			for adj_idx,i in enumerate(self.cache):
+				if i == None: break
+			else: return
+			idx = adj_idx+self.cache_start
+		# only does one at a time
+		if idx < len(self.data): self.__load_item(idx)
 
 	def is_3d(self): return False
 
@@ -156,9 +156,9 @@ class EMModelsEntry(EMDirEntry):
 		cache=None
 		cachename=self.name+"!models"
 		try:
-			cache=js_open_dict(self.root+"/.browsercache.json")
-			self.updtime,self.dims,self.filetype,self.nimg,self.quality=cache[cachename]		# try to read the cache for the current file
-			if self.updtime>=os.stat(self.truepath()).st_mtime : return 2 		# current cache, no further update necessary
+			cache=self.openCache()
+			self.updtime,self.dims,self.filetype,self.nimg,self.quality=self.readCache(cache,cachename)		# try to read the cache for the current file
+			if self.updtime>=self.mtime : return 2 		# current cache, no further update necessary
 		except:
 			pass
 
@@ -184,7 +184,7 @@ class EMModelsEntry(EMDirEntry):
 			except:
 				pass
 
-			if cache!=None : cache.setval(cachename,(time.time(),self.dims,self.filetype,self.nimg,self.quality),True)
+			if cache!=None : self.writeCache(cache,cachename,(time.time(),self.dims,self.filetype,self.nimg,self.quality))
 
 		return 1
 
@@ -253,9 +253,9 @@ class EMSetsEntry(EMDirEntry):
 		cache=None
 		cachename=self.name+"!sets"
 		try:
-			cache=js_open_dict(self.root+"/.browsercache.json")
-			self.updtime,self.dims,self.filetype,self.nimg=cache[cachename]		# try to read the cache for the current file
-			if self.updtime>=os.stat(self.truepath()).st_mtime : return 2 		# current cache, no further update necessary
+			cache=self.openCache()
+			self.updtime,self.dims,self.filetype,self.nimg=self.readCache(cache,cachename)		# try to read the cache for the current file
+			if self.updtime>=self.mtime : return 2 		# current cache, no further update necessary
 		except:
 			pass
 
@@ -276,7 +276,7 @@ class EMSetsEntry(EMDirEntry):
 		if a:
 			self.dims = "%dx%dx%d"%(a.get_xsize(),a.get_ysize(),a.get_zsize())
 
-			if cache!=None : cache.setval(cachename,(time.time(),self.dims,self.filetype,self.nimg),True)
+			if cache!=None : self.writeCache(cache,cachename,(time.time(),self.dims,self.filetype,self.nimg))
 
 
 		return True
@@ -361,8 +361,8 @@ class EMParticlesEntry(EMDirEntry):
 		cache=None
 		cachename=self.name+"!particles"
 		try:
-			cache=js_open_dict(self.root+"/.browsercache.json")
-			self.updtime,self.particledim,self.filetype,self.nimg,self.typ,self.quality=cache[cachename]		# try to read the cache for the current file
+			cache=self.openCache()
+			self.updtime,self.particledim,self.filetype,self.nimg,self.typ,self.quality=self.readCache(cache,cachename)		# try to read the cache for the current file
 			old=self.cache_old()
 			if old==0 : return 2 		# current cache, no further update necessary
 		except:
@@ -399,7 +399,7 @@ class EMParticlesEntry(EMDirEntry):
 			except:
 				pass
 
-		if cache!=None : cache.setval(cachename,(time.time(),self.particledim,self.filetype,self.nimg,self.typ,self.quality),True)
+		if cache!=None : self.writeCache(cache,cachename,(time.time(),self.particledim,self.filetype,self.nimg,self.typ,self.quality))
 
 		return 1
 
@@ -500,8 +500,8 @@ class EMCTFParticlesEntry(EMDirEntry):
 		self.updtime=0
 		cachename=self.name+"!ctf"
 		try:
-			cache=js_open_dict(self.root+"/.browsercache.json")
-			self.updtime,self.particledim,self.filetype,self.nimg,self.typ,self.defocus,self.bfactor,self.sampling,self.snr,self.snrhi,self.quality,self.badparticlecount=cache[cachename]		# try to read the cache for the current file
+			cache=self.openCache()
+			self.updtime,self.particledim,self.filetype,self.nimg,self.typ,self.defocus,self.bfactor,self.sampling,self.snr,self.snrhi,self.quality,self.badparticlecount=self.readCache(cache,cachename)		# try to read the cache for the current file
 			old=self.cache_old()
 			if old==0 : return 2 		# current cache, no further update necessary
 		except:
@@ -563,7 +563,7 @@ class EMCTFParticlesEntry(EMDirEntry):
 				pass
 
 		# Update the cache
-		if cache!=None and old!=0: cache.setval(cachename,(time.time(),self.particledim,self.filetype,self.nimg,self.typ,self.defocus,self.bfactor,self.sampling,self.snr,self.snrhi,self.quality,self.badparticlecount),True)
+		if cache!=None and old!=0: self.writeCache(cache,cachename,(time.time(),self.particledim,self.filetype,self.nimg,self.typ,self.defocus,self.bfactor,self.sampling,self.snr,self.snrhi,self.quality,self.badparticlecount))
 
 		return True
 
@@ -737,8 +737,8 @@ class EMBoxesEntry(EMDirEntry):
 		cache=None
 		cachename=self.name+"!boxes"
 		try:
-			cache=js_open_dict(self.root+"/.browsercache.json")
-			self.updtime,self.boxcount,self.filetype,self.quality=cache[cachename]		# try to read the cache for the current file
+			cache=self.openCache()
+			self.updtime,self.boxcount,self.filetype,self.quality=self.readCache(cache,cachename)		# try to read the cache for the current file
 			old=self.cache_old()
 			if old==0 : return 2 		# current cache, no further update necessary
 		except:
@@ -765,7 +765,7 @@ class EMBoxesEntry(EMDirEntry):
 				self.filetype="-"
 
 		# Set cache
-		if cache!=None : cache.setval(cachename,(time.time(),self.boxcount,self.filetype,self.quality),True)
+		if cache!=None : self.writeCache(cache,cachename,(time.time(),self.boxcount,self.filetype,self.quality))
 
 		return 1
 
@@ -836,8 +836,8 @@ class EMTomoBoxesEntry(EMDirEntry):
 		cache=None
 		cachename=self.name+"!boxes_3d"
 		try:
-			cache=js_open_dict(self.root+"/.browsercache.json")
-			self.updtime,self.boxcount,self.filetype,self.quality=cache[cachename]		# try to read the cache for the current file
+			cache=self.openCache()
+			self.updtime,self.boxcount,self.filetype,self.quality=self.readCache(cache,cachename)		# try to read the cache for the current file
 			old=self.cache_old()
 			if old==0 : return 2 		# current cache, no further update necessary
 		except:
@@ -864,7 +864,7 @@ class EMTomoBoxesEntry(EMDirEntry):
 				self.filetype="-"
 
 		# Set cache
-		if cache!=None : cache.setval(cachename,(time.time(),self.boxcount,self.filetype,self.quality),True)
+		if cache!=None : self.writeCache(cache,cachename,(time.time(),self.boxcount,self.filetype,self.quality))
 
 		return 1
 
@@ -937,8 +937,8 @@ class EMRCTBoxesEntry(EMDirEntry):
 		cache=None
 		cachename=self.name+"!rct"
 		try:
-			cache=js_open_dict(self.root+"/.browsercache.json")
-			self.updtime,self.boxcount,self.filetype,self.quality=cache[cachename]		# try to read the cache for the current file
+			cache=self.openCache()
+			self.updtime,self.boxcount,self.filetype,self.quality=self.readCache(cache,cachename)		# try to read the cache for the current file
 			old=self.cache_old()
 			if old==0 : return 2 		# current cache, no further update necessary
 		except:
@@ -973,7 +973,7 @@ class EMRCTBoxesEntry(EMDirEntry):
 					self.filetype="-"
 
 		# Set cache
-		if cache!=None : cache.setval(cachename,(time.time(),self.boxcount,self.filetype,self.quality),True)
+		if cache!=None : self.writeCache(cache,cachename,(time.time(),self.boxcount,self.filetype,self.quality))
 
 		return 1
 
@@ -1164,8 +1164,8 @@ class EMRawDataEntry(EMDirEntry):
 		cache=None
 		cachename=self.name+"!raw"
 		try:
-			cache=js_open_dict(self.root+"/.browsercache.json")
-			self.updtime,self.filetype,self.dim,self.quality=cache[cachename]		# try to read the cache for the current file
+			cache=self.openCache()
+			self.updtime,self.filetype,self.dim,self.quality=self.readCache(cache,cachename)		# try to read the cache for the current file
 			old=self.cache_old()
 			if old==0 : return 2 		# current cache, no further update necessary
 		except:
@@ -1187,7 +1187,7 @@ class EMRawDataEntry(EMDirEntry):
 			except :
 				self.filetype="-"
 
-		if cache!=None : cache.setval(cachename,(time.time(),self.filetype,self.dim,self.quality),True)
+		if cache!=None : self.writeCache(cache,cachename,(time.time(),self.filetype,self.dim,self.quality))
 
 		return 1
 
@@ -69,7 +69,11 @@ except:
 # ok, this is kind of bad style, but really don't want to have to drag this flag around through many objects
 invert_on_read=False
 
-def load_micrograph(filename):
+def load_micrograph(filename,invert=None,apixval=None):
+	"""Reads a micrograph (averaging the frames of a movie stack), inverting it and setting its A/pix.
+	invert and apixval default to the module level invert_on_read and apix settings."""
+	if invert==None : invert=invert_on_read
+	if apixval==None : apixval=apix
 	if "\t" in filename: filename=filename.split()[1]
 	fsp2="micrographs/"+filename
 	if os.path.exists(fsp2) : filename=fsp2
@@ -87,11 +91,10 @@ def load_micrograph(filename):
 			img.add(im)
 		img.mult(old_div(1.0,n))
 		
-	if invert_on_read : img.mult(-1.0)
-	global apix
-	img["apix_x"]=apix
-	img["apix_y"]=apix
-	img["apix_z"]=apix
+	if invert : img.mult(-1.0)
+	img["apix_x"]=apixval
+	img["apix_y"]=apixval
+	img["apix_z"]=apixval
 	return img
 
 def main():
@@ -122,7 +125,7 @@ def main():
 	parser.add_argument("--ac",type=float,help="Amplitude contrast (percentage, default=10)",default=10, guitype='floatbox', row=5, col=1, rowspan=1, colspan=1, mode='autofit')
 	parser.add_argument("--autopick",type=str,default=None,help="Perform automatic particle picking. Provide mode and parameter string, eg - auto_local:threshold=5.5")
 	parser.add_argument("--gui", action="store_true", default=False, help="Interactive GUI mode", guitype='boolbox', row=4, col=0, rowspan=1, colspan=1, mode="boxing[True]")
-	parser.add_argument("--threads", default=4,type=int,help="Number of threads to run in parallel on a single computer when multi-computer parallelism isn't useful",guitype='intbox', row=14, col=1, rowspan=1, colspan=1,mode="boxing")
+	parser.add_argument("--threads", default=4,type=int,help="Number of threads to run in parallel on a single computer when multi-computer parallelism isn't useful",guitype='intbox', row=14, col=1, rowspan=1, colspan=1,mode="boxing,extraction")
 	parser.add_argument("--ppid", type=int, help="Set the PID of the parent process, used for cross platform PPID",default=-1)
 	parser.add_argument("--device", type=str, help="For Convnet training only. Pick a device to use. chose from cpu, gpu, or gpuX (X=0,1,...) when multiple gpus are available. default is cpu",default="cpu",guitype='strbox', row=14, col=2, rowspan=1, colspan=1,mode="boxing")
 	parser.add_argument("--verbose", "-v", dest="verbose", action="store", metavar="n", type=int, default=0, help="verbose level [0-9], higner number means higher level of verboseness")
@@ -290,19 +293,7 @@ def main():
 			if len(newboxes)==0 : continue
 		
 			# read the existing box list and update
-			db=js_open_dict(info_name(fsp))
-			try: 
-				boxes=db["boxes"]
-				# Filter out all existing boxes for this picking mode
-				bname=newboxes[0][2]
-				boxes=[b for b in boxes if b[2]!=bname]
-			except:
-				boxes=[]
-				
-			boxes.extend(newboxes)
-			
-			db["boxes"]=boxes
-			db.close()
+			store_autoboxes(fsp,newboxes)
 
 	if options.gui :
 		if isinstance(QtGui,nothing) :
@@ -321,7 +312,7 @@ def main():
 		print(".box files written to boxfiles/")
 
 	if options.write_ptcls:
-		write_particles(args,boxsize,options.verbose)
+		write_particles(args,boxsize,options.verbose,options.threads)
 		print("Particles written to particles/*_ptcls.hdf")
 
 	E2end(logid)
@@ -345,74 +336,181 @@ def write_boxfiles(files,boxsize):
 		for b in boxes:
 			out.write("{:0.0f}\t{:0.0f}\t{:0.0f}\t{:0.0f}\n".format(int(b[0]-boxsize2),int(b[1]-boxsize2),int(boxsize),int(boxsize)))
 
-def write_particles(files,boxsize,verbose):
+def write_particles(files,boxsize,verbose,threads=1):
 	"""This function will write a particles/*_ptcls.hdf file for each provided micrograph, based on
 	box locations in the corresponding info/*json file. To use this with .box files, they must be imported
-	to a JSON file first."""
+	to a JSON file first. Micrographs are processed in parallel by 'threads' worker processes. A micrograph
+	is skipped if its boxes, box size and source file are unchanged since its particles were last written."""
 	
 	try: os.mkdir("particles")
 	except: pass
-	boxsize2=old_div(boxsize,2)
 	
-	for nm in files:
-		n,m=nm.split()
-		base=base_name(m)
-		ptcl="particles/{}.hdf".format(base)
-		
-		# get the list of box locations
-		db=js_open_dict(info_name(m))
-		boxes=db.setdefault("boxes",[])
-		if len(boxes)==0 :
-			if verbose :
-				print("No particles in ",m)
-			continue
+	# the module level settings are passed explicitly, since spawned worker processes don't inherit them
+	with EMExecutor(threads,backend="process") as ex:
+		ex.map(write_particles_one,[(nm,boxsize,verbose,invert_on_read,apix) for nm in files],ordered=False)
+
+def write_particles_one(nm,boxsize,verbose,invert,apixval):
+	"""Writes the particles for a single micrograph, see write_particles. invert and apixval are the
+	invert_on_read and apix settings of the calling process, passed on to load_micrograph."""
+	import hashlib,json
+	
+	n,m=nm.split()
+	base=base_name(m)
+	ptcl="particles/{}.hdf".format(base)
+	boxsize2=old_div(boxsize,2)
 	
-		# remove any existing file
-		try: os.unlink(ptcl)
-		except: pass
+	# get the list of box locations
+	db=js_open_dict(info_name(m))
+	boxes=db.setdefault("boxes",[])
+	if len(boxes)==0 :
+		if verbose :
+			print("No particles in ",m)
+		return
+
+	# if nothing has changed since the last time the particles were written, there is nothing to do
+	fsp="micrographs/"+m
+	if not os.path.exists(fsp) : fsp=m
+	stamp={"boxsize":boxsize,"invert":invert,"mtime":os.stat(fsp).st_mtime,
+		"boxes":hashlib.md5(json.dumps(boxes,sort_keys=True).encode("utf-8")).hexdigest()}
+	if db.getdefault("ptcls_written",None)==stamp and os.path.exists(ptcl) and EMUtil.get_image_count(ptcl)==len(boxes) :
+		if verbose : print("{} : unchanged, {} particles already in {}".format(m,len(boxes),ptcl))
+		db.close()
+		return
 	
-		if verbose : print("{} : {} particles written to {}".format(m,len(boxes),ptcl))
-		micrograph=load_micrograph(m)		# read micrograph
-		for i,b in enumerate(boxes):
-			boxim=micrograph.get_clip(Region(b[0]-boxsize2,b[1]-boxsize2,boxsize,boxsize))
-			boxim["ptcl_source_coord"]=(b[0],b[1])
-			boxim["ptcl_source_image"]=m
-			boxim.write_image(ptcl,i)
+	# remove any existing file
+	try: os.unlink(ptcl)
+	except: pass
+
+	if verbose : print("{} : {} particles written to {}".format(m,len(boxes),ptcl))
+	micrograph=load_micrograph(m,invert,apixval)		# read micrograph
+	ptcls=[]
+	for b in boxes:
+		boxim=micrograph.get_clip(Region(b[0]-boxsize2,b[1]-boxsize2,boxsize,boxsize))
+		boxim["ptcl_source_coord"]=(b[0],b[1])
+		boxim["ptcl_source_image"]=m
+		ptcls.append(boxim)
+	EMData.write_images(ptcl,ptcls)
 	
+	db["ptcls_written"]=stamp
+	db.close()
+
 ##########
 # to add a new autoboxer module, create a class here, then add it to the GUIBoxer.aboxmodes list below
 ##########
 
 class boxerByRef(QtCore.QObject):
 	"""Simple reference-based cross-corrlation picker with exhaustive rotational search"""
+	bankcache=None		# (key,bank) for the most recent reference bank, see refbank()
+
 	@staticmethod
 	def setup_gui(gridlay,boxerwindow=None):
 		boxerByRef.threshold=ValSlider(None,(0.1,8),"Threshold",1.5,90)
 		gridlay.addWidget(boxerByRef.threshold,0,0)
 	
 	@staticmethod
-	def do_autobox(micrograph,goodrefs,badrefs,bgrefs,apix,nthreads,params,prog=None):
+	def get_threshold(params):
 		# If parameters are provided via params (as if used from command-line) we use those values,
 		# if that fails, we check the GUI widgets, which were presumably created in this case
-		if len(goodrefs)<1 :
-			print('Box reference images ("Good Refs") required for autopicking')
-			return []
 		try: 
-			threshold=params["threshold"]
+			return params["threshold"]
 		except:
 			try: 
-				threshold=boxerByRef.threshold.getValue()
+				return boxerByRef.threshold.getValue()
 			except:
 				print("Error, no threshold (0.1-2) specified")
-				return
+				return None
+
+	@staticmethod
+	def do_autobox(micrograph,goodrefs,badrefs,bgrefs,apix,nthreads,params,prog=None):
+		if len(goodrefs)<1 :
+			print('Box reference images ("Good Refs") required for autopicking')
+			return []
+		threshold=boxerByRef.get_threshold(params)
+		if threshold==None : return
 			
 		print("threshold = ",threshold)
 		
 		downsample=old_div(10.0,apix)			# we downsample to 10 A/pix
+		gs=boxerByRef.padded_size(micrograph["nx"],micrograph["ny"],downsample)
+		print("downsample by ",downsample,"  Good size:",gs)
+
+		print(len(goodrefs)," references")
+		bank=boxerByRef.refbank(goodrefs,downsample,gs,nthreads)
+		return boxerByRef.pick(micrograph,goodrefs,bank,downsample,gs,threshold,nthreads,prog,True)
+
+	@staticmethod
+	def do_autobox_all(filenames,goodrefs,badrefs,bgrefs,apix,nthreads,params,prog=None):
+		"""Picks every micrograph in filenames, one micrograph per worker process. The reference bank is computed
+		once, before the workers are started, so they all share it. Results go directly into the info/*.json files."""
+		if len(goodrefs)<1 :
+			print('Box reference images ("Good Refs") required for autopicking')
+			return
+		threshold=boxerByRef.get_threshold(params)
+		if threshold==None : return
+		
+		print("threshold = ",threshold)
+
+		# the bank depends on the padded size of each micrograph, so micrographs are picked in groups of the same size
+		# (normally just one group), computing the bank once per group
+		fsps=[fspl.split()[1] for fspl in filenames]
+		downsample=old_div(10.0,apix)
+		groups={}
+		for fsp in fsps:
+			hdr=EMData(fsp,0,True)
+			groups.setdefault(boxerByRef.padded_size(hdr["nx"],hdr["ny"],downsample),[]).append(fsp)
+
+		ndone=0
+		for gs in sorted(groups):
+			boxerByRef.refbank(goodrefs,downsample,gs,nthreads)
+
+			# worker processes inherit the bank. The GUI uses threads instead, which is nearly as good, since the CCFs release the GIL
+			with EMExecutor(nthreads,backend="process" if prog==None else "thread") as ex:
+				for fsp,newboxes in ex.imap(autobox_byref_one,[(fsp,goodrefs,apix,threshold) for fsp in groups[gs]],ordered=False):
+					print("{}) {} boxes -> {}".format(ndone,len(newboxes),fsp))
+					ndone+=1
+					if prog!=None :
+						prog.setValue(ndone)
+						if prog.wasCanceled() :
+							ex.terminate()		# otherwise leaving the with block waits for all of the queued jobs
+							return
+
+					# if we got nothing, we just leave the current results alone
+					if len(newboxes)>0 : store_autoboxes(fsp,newboxes)
+
+	@staticmethod
+	def padded_size(nx,ny,downsample):
+		"""Size of the square, padded, downsampled micrograph the CCFs are computed on (math.fft.resample rounds to the nearest pixel)"""
+		return good_size(max(int(nx/downsample+0.5),int(ny/downsample+0.5)))
+
+	@staticmethod
+	def refbank(goodrefs,downsample,gs,nthreads=1):
+		"""Returns a list of (ortid,FFT) for every reference at every in-plane rotation, downsampled and padded to gs x gs,
+		ready to correlate against a micrograph FFT. The integer portion of ortid is the reference number, the fractional
+		portion is the rotation angle/360. The most recent bank is kept, keyed by the reference images, downsampling and
+		padded size, so picking many micrographs with the same references only computes it once."""
+		import hashlib
+		
+		key=hashlib.md5()
+		for ref in goodrefs: key.update(to_numpy(ref).tobytes())
+		key.update("{:1.6f},{:d}".format(downsample,gs).encode("utf-8"))
+		key=key.hexdigest()
+		if boxerByRef.bankcache!=None and boxerByRef.bankcache[0]==key : return boxerByRef.bankcache[1]
+		
+		# Each job does one reference and returns the FFTs for all in-plane rotations of it
+		bank=[]
+		with EMExecutor(nthreads) as ex:
+			for refs in ex.imap(boxerByRef.reftask,[(ref,downsample,gs,ri) for ri,ref in enumerate(goodrefs)]):
+				bank.extend(refs)
+		
+		boxerByRef.bankcache=(key,bank)
+		return bank
+
+	@staticmethod
+	def pick(micrograph,goodrefs,bank,downsample,gs,threshold,nthreads=1,prog=None,debug=False):
+		"""Finds and refines box locations in a single micrograph using a reference bank from refbank(). If debug is
+		set, the intermediate maps are written to final.hdf"""
 		microdown=micrograph.process("normalize.edgemean").process("math.fft.resample",{"n":downsample})
-		gs=good_size(max(microdown["nx"],microdown["ny"]))
 		microf=microdown.get_clip(Region(0,0,gs,gs)).do_fft()
-		print("downsample by ",downsample,"  Good size:",gs)
 	
 		## Here we precompute a normalization image to deal with local standard deviation variation
 		microlp=microdown.get_clip(Region(0,0,gs,gs)).process("filter.lowpass.gauss",{"cutoff_freq":0.005})		# we really only want the standard deviation of low resolution info
@@ -439,39 +537,19 @@ class boxerByRef(QtCore.QObject):
 		owner=EMData(gs,gs,1)
 		maxav=Averagers.get("minmax",{"max":1,"owner":owner})
 		
-		# Iterate over in-plane rotation for each ref
-		jsd=queue.Queue(0)
-		thrds=[threading.Thread(target=boxerByRef.ccftask,args=(jsd,ref,downsample,gs,microf,ri)) for ri,ref in enumerate(goodrefs)]
-
-		n=-1
-
-		# here we run the threads and save the results, no actual alignment done here
-		print(len(thrds)," threads")
-		thrtolaunch=0
-		while thrtolaunch<len(thrds) or threading.active_count()>1:
-			# If we haven't launched all threads yet, then we wait for an empty slot, and launch another
-			# note that it's ok that we wait here forever, since there can't be new results if an existing
-			# thread hasn't finished.
-			if thrtolaunch<len(thrds) and threading.active_count()!=nthreads:
-#				print "Starting thread {}/{}".format(thrtolaunch,len(thrds))
-				thrds[thrtolaunch].start()
-				thrtolaunch+=1
-			else: 
-				time.sleep(0.05)
+		# Each job correlates the micrograph with all in-plane rotations of one reference
+		nrot=len(bank)//len(goodrefs)
+		with EMExecutor(nthreads) as ex:
+			for ccfs in ex.imap(boxerByRef.ccftask,[(microf,bank[i:i+nrot]) for i in range(0,len(bank),nrot)],ordered=False):
+				# add each ccf image to our maxval image as it comes in
+				for ccf in ccfs: maxav.add_image(ccf)
 				if prog!=None : 
 					prog.setValue(prog.value())
-					if prog.wasCanceled() : break
-		
-			while not jsd.empty():
-				# add each ccf image to our maxval image as it comes in
-				ccf=jsd.get()
-				maxav.add_image(ccf)
-				sys.stdout.flush()
+					if prog.wasCanceled() :
+						ex.terminate()		# otherwise leaving the with block waits for all of the queued jobs
+						break
 		print("")
 
-		for t in thrds:
-			t.join()
-
 			
 		final=maxav.finish()
 		# smooth out a few spurious peaks. Hopefully doesn't mess up ownership assignment significantly
@@ -489,15 +567,16 @@ class boxerByRef(QtCore.QObject):
 		# Zero edges to eliminate boxes within 1/2 box size of edge
 		edge=int(old_div(goodrefs[0]["nx"],(2.0*downsample))+0.5)
 		final.mult(norm)
-		final.write_image("final.hdf",0)
+		if debug : final.write_image("final.hdf",0)
 		final.process_inplace("mask.zeroedge2d",{"x0":edge,"y0":edge})
 		final.process_inplace("mask.onlypeaks",{"npeaks":0,"usemean":0})
 		final.process_inplace("normalize.edgemean")
 #		final.process_inplace("threshold.belowtozero",{"minval":threshold})
 
-		final.write_image("final.hdf",1)
-		owner.write_image("final.hdf",2)
-		norm.write_image("final.hdf",3)
+		if debug :
+			final.write_image("final.hdf",1)
+			owner.write_image("final.hdf",2)
+			norm.write_image("final.hdf",3)
 #		display(final)
 		
 		print("Find peaks")
@@ -537,7 +616,7 @@ class boxerByRef(QtCore.QObject):
 
 
 	@staticmethod
-	def ccftask(jsd,ref,downsample,gs,microf,ri):
+	def reftask(ref,downsample,gs,ri):
 
 		mref=ref.process("mask.soft",{"outer_radius":old_div(ref["nx"],2)-4,"width":3})
 		mref.process_inplace("normalize.unitlen")
@@ -557,6 +636,7 @@ class boxerByRef(QtCore.QObject):
 		#randccf=avgr.finish()
 		#randccf.write_image("5.hdf",-1)
 		
+		refs=[]
 		for ang in range(0,360,10):
 			dsref=mref.process("xform",{"transform":Transform({"type":"2d","alpha":ang})})
 			# don't downsample until after rotation
@@ -565,13 +645,43 @@ class boxerByRef(QtCore.QObject):
 			diff=(gs-dsref["nx"])//2
 			dsref=dsref.get_clip(Region(-diff,-diff,gs,gs))
 			dsref.process_inplace("xform.phaseorigin.tocorner")
-			ccf=microf.calc_ccf(dsref)
-			#ccf.process_inplace("normalize")
-			ccf["ortid"]=ri+ang/360.0			# integer portion is projection number, fractional portion is angle, should be enough precision with the ~100 references we're using
+			refs.append((ri+ang/360.0,dsref.do_fft()))		# integer portion is projection number, fractional portion is angle, should be enough precision with the ~100 references we're using
+		
+		return refs
 
-			jsd.put(ccf)
+	@staticmethod
+	def ccftask(microf,refs):
+		
+		ccfs=[]
+		for ortid,reff in refs:
+			ccf=microf.calc_ccf(reff)
+			#ccf.process_inplace("normalize")
+			ccf["ortid"]=ortid
+			ccfs.append(ccf)
 		
 		sys.stdout.write("*")
+		return ccfs
+
+def autobox_byref_one(fsp,goodrefs,apix,threshold):
+	"""Reference-based picking of a single micrograph in a worker process, see boxerByRef.do_autobox_all. The
+	reference bank is normally inherited from the parent process."""
+	micrograph=load_micrograph(fsp)
+	downsample=old_div(10.0,apix)
+	gs=boxerByRef.padded_size(micrograph["nx"],micrograph["ny"],downsample)
+	bank=boxerByRef.refbank(goodrefs,downsample,gs)
+	return (fsp,boxerByRef.pick(micrograph,goodrefs,bank,downsample,gs,threshold))
+
+def store_autoboxes(fsp,newboxes):
+	"""Replaces the boxes from the picking mode of newboxes in the info/*.json file for micrograph fsp, with
+	a single read and a single write of the file"""
+	db=js_open_dict(info_name(fsp))
+	# Filter out all existing boxes for this picking mode
+	bname=newboxes[0][2]
+	boxes=[b for b in db.getdefault("boxes",[]) if b[2]!=bname]
+	boxes.extend(newboxes)
+	
+	db.setval("boxes",boxes,True)
+	db.close()
 		
 class boxerLocal(QtCore.QObject):
 	"""Reference based search by downsampling and 2-D alignment to references"""
@@ -609,38 +719,18 @@ class boxerLocal(QtCore.QObject):
 		r=goodrefs[0].process("math.fft.resample",{"n":downsample})
 		r.align("rotate_translate",r)
 		
-		jsd=queue.Queue(0)
-		thrds=[threading.Thread(target=boxerLocal.ccftask,args=(jsd,ref,downsample,microdown,ri)) for ri,ref in enumerate(goodrefs)]
-
-		n=-1
-
-		# here we run the threads and save the results, no actual alignment done here
-		print(len(thrds)," threads")
-		thrtolaunch=0
-		while thrtolaunch<len(thrds) or threading.active_count()>1:
-			# If we haven't launched all threads yet, then we wait for an empty slot, and launch another
-			# note that it's ok that we wait here forever, since there can't be new results if an existing
-			# thread hasn't finished.
-			if thrtolaunch<len(thrds) and threading.active_count()!=nthreads:
-#				print "Starting thread {}/{}".format(thrtolaunch,len(thrds))
-				thrds[thrtolaunch].start()
-				thrtolaunch+=1
-			else: 
-				time.sleep(0.05)
-				if prog!=None : 
-					prog.setValue(prog.value())
-					if prog.wasCanceled() : break
-		
-			while not jsd.empty():
+		print(len(goodrefs)," references")
+		with EMExecutor(nthreads) as ex:
+			for ccf in ex.imap(boxerLocal.ccftask,[(ref,downsample,microdown,ri) for ri,ref in enumerate(goodrefs)],ordered=False):
 				# add each ccf image to our maxval image as it comes in
-				ccf=jsd.get()
 				maxav.add_image(ccf)
-				sys.stdout.flush()
+				if prog!=None : 
+					prog.setValue(prog.value())
+					if prog.wasCanceled() :
+						ex.terminate()		# otherwise leaving the with block waits for all of the queued jobs
+						break
 		print("")
 
-		for t in thrds:
-			t.join()
-
 			
 		final=maxav.finish()
 		# smooth out a few spurious peaks. Hopefully doesn't mess up ownership assignment significantly
@@ -704,7 +794,7 @@ class boxerLocal(QtCore.QObject):
 
 
 	@staticmethod
-	def ccftask(jsd,ref,downsample,microdown,ri):
+	def ccftask(ref,downsample,microdown,ri):
 
 		mref=ref.process("mask.soft",{"outer_radius":old_div(ref["nx"],2)-4,"width":3})
 		mref.process_inplace("math.fft.resample",{"n":downsample})
@@ -734,8 +824,8 @@ class boxerLocal(QtCore.QObject):
 				ay=int(ay+y+old_div(nxdown,2))
 				if frc>ptclmap[ax,ay] : ptclmap[ax,ay]=frc
 		
-		jsd.put(ptclmap)
 		sys.stdout.write("*")
+		return ptclmap
 		
 
 
@@ -1102,51 +1192,24 @@ class boxerConvNet(QtCore.QObject):
 			jobs.append((fsp, i, layers, shrinkfac, nx, ny))
 		
 		#### worker function
-		def autobox_worker(que, job):
-			fname, idx, layers, shrinkfac, nx, ny = job
+		def autobox_worker(fname, idx, layers, shrinkfac, nx, ny):
+			print("Starting on img {}...".format(idx))
 			nnout=boxerConvNet.apply_network(fname, layers, shrinkfac, nx, ny, nnet_classify, params)
-			que.put((idx, fname,  nnout))
-			return
+			return (idx, fname,  nnout)
 		
 		#### now start autoboxing...
-		jsd=queue.Queue(0)
-		NTHREADS=max(nthreads+1,2)
-		thrds=[threading.Thread(target=autobox_worker,args=(jsd,job)) for job in jobs]
-		thrtolaunch=0
-		while thrtolaunch<len(thrds) or threading.active_count()>1:
-			#print thrtolaunch, len(thrds)
-			if thrtolaunch<len(thrds) :
-				
-				while (threading.active_count()==NTHREADS ) : time.sleep(.1)
-				print("Starting on img {}...".format(thrtolaunch))
-				thrds[thrtolaunch].start()
-				thrtolaunch+=1
-			else: time.sleep(1)
-		
-			while not jsd.empty():
-				idx, fsp, nnout=jsd.get()
+		with EMExecutor(nthreads) as ex:
+			for ndone,(idx, fsp, nnout) in enumerate(ex.imap(autobox_worker, jobs, ordered=False)):
 				newboxes, nbad = nnout
-				print("{}) {} boxes, excluding {} bad -> {}".format(i,len(newboxes), nbad,fsp))
+				print("{}) {} boxes, excluding {} bad -> {}".format(idx,len(newboxes), nbad,fsp))
+				if prog:
+					prog.setValue(ndone+1)
 		
 				# if we got nothing, we just leave the current results alone
 				if len(newboxes)==0 : continue
 			
 				# read the existing box list and update
-				db=js_open_dict(info_name(fsp))
-				try: 
-					boxes=db["boxes"]
-					# Filter out all existing boxes for this picking mode
-					bname=newboxes[0][2]
-					boxes=[b for b in boxes if b[2]!=bname]
-				except:
-					boxes=[]
-					
-				boxes.extend(newboxes)
-				
-				db["boxes"]=boxes
-				db.close()
-				if prog:
-					prog.setValue(thrtolaunch-threading.active_count())
+				store_autoboxes(fsp,newboxes)
 				
 		return
 
@@ -1947,19 +2010,7 @@ class GUIBoxer(QtWidgets.QWidget):
 			if len(newboxes)==0 : continue
 		
 			# read the existing box list and update
-			db=js_open_dict(info_name(fsp))
-			try: 
-				boxes=db["boxes"]
-				# Filter out all existing boxes for this picking mode
-				bname=newboxes[0][2]
-				boxes=[b for b in boxes if b[2]!=bname]
-			except:
-				boxes=[]
-				
-			boxes.extend(newboxes)
-			
-			db["boxes"]=boxes
-			db.close()
+			store_autoboxes(fsp,newboxes)
 			self.setlist.setCurrentRow(i)
 #			self.__updateBoxes()
 			
@@ -222,19 +222,15 @@ e2classextract.py --orientcls refine_03/cls_result_04 --orientedparticles sets/a
 				outlst[mdl]=LSXFile(fsp)
 
 			#### This is where we actually generate the new sets
-			for p in sorted(ptcl):
-				if isinstance(inset,str) :
-					outlst[mdl].write(-1,p,inset)
-				else :
-					nextf,extf,com=inset.read(p)	# read the original information for this particle from the old set
-					outlst[mdl].write(-1,nextf,extf)
+			if isinstance(inset,str) :
+				for p in sorted(ptcl): outlst[mdl].write(-1,p,inset)
+			else :
+				# read the original information for these particles from the old set
+				for r in inset.read_many(sorted(ptcl)): outlst[mdl].write(-1,r["n"],inset.filenames[r["file"]])
 
 		if options.sort :
 			for k in outlst:
-				ptcls=[]
-				for i in range(outlst[k].n):
-					nextf,extf,com=outlst[k].read(i)
-					ptcls.append((extf,nextf))
+				ptcls=[(outlst[k].filenames[r["file"]],int(r["n"])) for r in outlst[k].read_all()]
 				ptcls.sort()
 				if options.verbose>1: print("Sorting {} ({})".format(k,len(ptcls)))
 
@@ -305,18 +301,14 @@ e2classextract.py --orientcls refine_03/cls_result_04 --orientedparticles sets/a
 				continue
 
 			#### This is where we actually generate the new sets
-			for p in sorted(ptcl):
-				if isinstance(inset,str) :
-					outlst.write(-1,p,inset)
-				else :
-					nextf,extf,com=inset.read(p)	# read the original information for this particle from the old set
-					outlst.write(-1,nextf,extf)
+			if isinstance(inset,str) :
+				for p in sorted(ptcl): outlst.write(-1,p,inset)
+			else :
+				# read the original information for these particles from the old set
+				for r in inset.read_many(sorted(ptcl)): outlst.write(-1,r["n"],inset.filenames[r["file"]])
 
 		if options.sort :
-			ptcls=[]
-			for i in range(outlst.n):
-				nextf,extf,com=outlst.read(i)
-				ptcls.append((extf,nextf))
+			ptcls=[(outlst.filenames[r["file"]],int(r["n"])) for r in outlst.read_all()]
 			ptcls.sort()
 
 			for i,v in enumerate(ptcls):
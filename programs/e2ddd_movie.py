@@ -591,68 +591,42 @@ def process_movie(options,fsp,dark,gain,first,flast,step,idx):
 
 		# prepare image data (outim) by clipping and FFT'ing all tiles (this is threaded as well)
 		immx=[0]*n
-		thds = []
-		for i in range(n):
-			thd = threading.Thread(target=split_fft,args=(options,outim[i],i,options.optbox,options.optstep,ccfs))
-			thds.append(thd)
-		sys.stdout.write("\rPrecompute  /{} FFTs".format(len(thds)))
+		sys.stdout.write("\rPrecompute  /{} FFTs".format(n))
 		t0=time()
 
-		thrtolaunch=0
-		while thrtolaunch<len(thds) or threading.active_count()>1:
-			if thrtolaunch<len(thds) :
-				while (threading.active_count()==options.threads ) : sleep(.01)
-				#if options.verbose :
-				#	sys.stdout.write("\rPrecompute {}/{} FFTs {}".format(thrtolaunch+1,len(thds),threading.active_count()))
-				#	sys.stdout.flush()
-				thds[thrtolaunch].start()
-				thrtolaunch+=1
-			else: sleep(0.5)
-
-			while not ccfs.empty():
-				i,d=ccfs.get()
-				immx[i]=d
-
-		for th in thds: th.join()
+		with EMExecutor(options.threads) as ex:
+			ex.map(split_fft,[(options,outim[i],i,options.optbox,options.optstep,ccfs) for i in range(n)],ordered=False)
+
+		while not ccfs.empty():
+			i,d=ccfs.get()
+			immx[i]=d
 		print()
 
-		# create threads
-		thds=[]
+		# create jobs
+		jobs=[]
 		peak_locs=queue.Queue(0)
 		i=-1
 		for ima in range(n-1):
 			for imb in range(ima+1,n):
 				if options.verbose>3: i+=1		# if i>0 then it will write pre-processed CCF images to disk for debugging
-				thds.append(threading.Thread(target=calc_ccf_wrapper,args=(options,(ima,imb),options.optbox,options.optstep,immx[ima],immx[imb],ccfs,peak_locs,i,fsp)))
+				jobs.append((options,(ima,imb),options.optbox,options.optstep,immx[ima],immx[imb],ccfs,peak_locs,i,fsp))
 
-		print("{:1.1f} s\nCompute {} ccfs".format(time()-t0,len(thds)))
+		print("{:1.1f} s\nCompute {} ccfs".format(time()-t0,len(jobs)))
 		t0=time()
 
-		# here we run the threads and save the results, no actual alignment done here
-		csum2={}
-
-		thrtolaunch=0
-		while thrtolaunch<len(thds) or threading.active_count()>1:
-			# If we haven't launched all threads yet, then we wait for an empty slot, and launch another
-			# note that it's ok that we wait here forever, since there can't be new results if an existing
-			# thread hasn't finished.
-			if thrtolaunch<len(thds) :
-				while (threading.active_count()==options.threads ) : sleep(.01)
-				#if options.verbose : print "Starting thread {}/{}".format(thrtolaunch,len(thds))
-				thds[thrtolaunch].start()
-				thrtolaunch+=1
-			else:
-				sleep(0.5)
-
-			while not ccfs.empty():
-				i,d=ccfs.get()
-				csum2[i]=d
-
+		# here we run the jobs and save the results, no actual alignment done here
+		def progress(ndone,ntot):
 			if options.verbose:
-				sys.stdout.write("\r  {}/{} ({})".format(thrtolaunch,len(thds),threading.active_count()))
+				sys.stdout.write("\r  {}/{}".format(ndone,ntot))
 				sys.stdout.flush()
 
-		for th in thds: th.join()
+		with EMExecutor(options.threads,progress=progress) as ex:
+			ex.map(calc_ccf_wrapper,jobs,ordered=False)
+
+		csum2={}
+		while not ccfs.empty():
+			i,d=ccfs.get()
+			csum2[i]=d
 		print()
 
 		avgr=Averagers.get("minmax",{"max":0})
@@ -53,12 +53,13 @@ def enrich(thr,jsd,imfile,lsx,proj,nenrich,redoinvar,i0,i1,verbose):
 		best=list(qary.argsort()[-nenrich-1:-1])
 		best.reverse()			# first image should be best, working progressively may improve alignment?
 		if verbose>1: print("{}: {}".format(i,best))
-		avg=EMData(imfile,i)
+		imgs=lsx.read_images([i]+best)		# one read per referenced file, rather than one per particle
+		avg=imgs[0]
 		aliref=avg.copy()
 		sim=[]
 		for j,k in enumerate(best):
 #			img=EMData(imfile,k).align("rotate_translate_tree",aliref,{"flip":1})
-			img=EMData(imfile,k)
+			img=imgs[j+1]
 			ali=img.align("rotate_translate_tree",aliref,{"flip":1})
 			ali=img.align("refine",aliref,{"xform.align2d":ali["xform.align2d"]},"frc",{"minres":80,"maxres":20})				
 			sim.append(ali.cmp("frc",aliref,{"minres":80,"maxres":20}))
@@ -47,6 +47,9 @@ import sys
 import math
 import random
 import traceback
+import threading
+import hashlib
+import json
 import numpy as np
 
 def get_usage():
@@ -116,6 +119,9 @@ def main():
 	parser.add_argument("--verbose", "-v", dest="verbose", action="store", metavar="n", type=int, default=0, help="verbose level [0-9], higner number means higher level of verboseness")
 
 	parser.add_argument("--threads", default=4,type=int,help="Number of threads to run in parallel on a single computer. This is the only parallelism supported by e2make3dpar", guitype='intbox', row=24, col=2, rowspan=1, colspan=1, mode="refinement")
+	parser.add_argument("--slicecache", type=str, default=None, help="Directory for an on-disk cache of preprocessed Fourier slices, reused by later iterations and later runs on the same unmodified input. 'auto' uses ~/.eman2/make3dcache. default=none")
+	parser.add_argument("--slicecachesize", type=float, default=10.0, help="Maximum size of --slicecache in GB. Least recently used slices are removed beyond this. default=10")
+	parser.add_argument("--workerrecon", type=str, default="none", help="none, thread or process. If set, each of the --threads workers inserts into its own private reconstructor, and the partial Fourier volumes are summed pairwise before normalization. Requires memory for one padded volume per worker. Ignored with --iterative. default=none")
 	parser.add_argument("--preprocess", metavar="processor_name(param1=value1:param2=value2)", type=str, action="append", help="preprocessor to be applied to the projections prior to 3D insertion. There can be more than one preprocessor and they are applied in the order in which they are specifed. Applied before padding occurs. See e2help.py processors for a complete list of available processors.")
 	parser.add_argument("--setsf",type=str,help="Force the structure factor to match a 'known' curve prior to postprocessing (<filename>, auto or none). default=none",default="none")
 	parser.add_argument("--postprocess", metavar="processor_name(param1=value1:param2=value2)", type=str, action="append", help="postprocessor to be applied to the 3D volume once the reconstruction is completed. There can be more than one postprocessor, and they are applied in the order in which they are specified. See e2help.py processors for a complete list of available processors.")
@@ -138,6 +144,10 @@ def main():
 
 	if options.input_model!=None : options.input_model=int(options.input_model)
 
+	if options.workerrecon not in ("none","thread","process"):
+		print("Error: --workerrecon must be one of none, thread or process")
+		sys.exit(1)
+
 	print("e2make3dpar.py")
 	logger=E2init(sys.argv,options.ppid)
 
@@ -250,9 +260,47 @@ def main():
 	#########################################################
 	# The actual reconstruction
 
+	if options.slicecache!=None :
+		if options.slicecache=="auto" : options.slicecache=os.path.join(e2gethome(),".eman2","make3dcache")
+		cache=SliceCache(options.slicecache,options.slicecachesize)
+	else : cache=None
+
+	if options.workerrecon!="none" and not options.iterative:
+		seed=seedweight=None
+		if options.seedmap!=None :
+			seed=EMData(options.seedmap)
+			seed.clip_inplace(Region(old_div((nx-padvol[0]),2),old_div((ny-padvol[1]),2),old_div((nslice-padvol[2]),2),padvol[0],padvol[1],padvol[2]))
+			seed.do_fft_inplace()
+			if options.seedweightmap==None: seedweight=options.seedweight
+			else: seedweight=EMData(options.seedweightmap,0)
+
+		# the seed goes to only one worker, so it is counted once in the summed volume
+		wa=dict(a)
+		wa.pop("savenorm",None)
+		wa["quiet"]=True
+		nw=max(1,min(options.threads,len(data)))
+		jobs=[(data[i::nw],wa,seed if i==0 else None,seedweight,options.preprocess,options.pad,
+			options.fillangle,options.altedgemask,max(options.verbose-1,0),options.input.endswith(".lst"),cache) for i in range(nw)]
+		if options.verbose>1: print("Inserting with {} private reconstructors ({})".format(nw,options.workerrecon))
+		with EMExecutor(nw,backend=options.workerrecon) as ex:
+			partials=ex.map(reconstruct_partial,jobs,ordered=False)
+
+		# pairwise tree reduction, EMData.add releases the GIL so each level runs in parallel
+		while len(partials)>1:
+			pairs=[(partials[i],partials[i+1]) for i in range(0,len(partials)-1,2)]
+			with EMExecutor(min(len(pairs),options.threads)) as ex:
+				summed=ex.map(sum_partials,pairs)
+			if len(partials)%2 : summed.append(partials[-1])
+			partials=summed
+
+		recon.setup_seedandweights(partials[0][0],partials[0][1])
+		partials=None
+		output=recon.finish(True)
+		niter=0
+
 	for it in range(niter):
 		threads=[threading.Thread(target=reconstruct,args=(data[i::options.threads],recon,options.preprocess,options.pad,
-				options.fillangle,options.altedgemask,max(options.verbose-1,0),options.input.endswith(".lst"))) for i in range(options.threads)]
+				options.fillangle,options.altedgemask,max(options.verbose-1,0),options.input.endswith(".lst"),cache)) for i in range(options.threads)]
 
 		if it==0:
 			if options.seedmap!=None :
@@ -262,7 +310,7 @@ def main():
 				seed.do_fft_inplace()
 				if options.seedweightmap==None:  recon.setup_seed(seed,options.seedweight)
 				else:
-					seedweightmap=EMData(seedweightmap,0)
+					seedweightmap=EMData(options.seedweightmap,0)
 					recon.setup_seedandweights(seed,seedweightmap)
 			else : recon.setup()
 		else:
@@ -297,6 +345,9 @@ def main():
 			
 
 	if options.verbose>0 : print("Finished Reconstruction")
+	if cache!=None :
+		cache.trim()
+		if options.verbose>0 : print("Slice cache: {} hits, {} misses".format(cache.hits,cache.misses))
 
 	try:
 		output.set_attr("ptcl_repr",ptclcount)
@@ -439,8 +490,8 @@ def initialize_data(inputfile,inputmodel,tltfile,pad,no_weights,preprocess):
 		getlst=False
 		if inputfile.endswith(".lst"):
 			lst=LSXFile(inputfile, True)
-			lstinfo=lst.read(0)
-			if lstinfo[2]:
+			lstcomments=lst.read_all()["comment"]
+			if lstcomments[0]:
 				getlst=True
 
 		for i in range(n_input):
@@ -449,8 +500,7 @@ def initialize_data(inputfile,inputmodel,tltfile,pad,no_weights,preprocess):
 			# these rely only on the header
 			
 			if getlst:
-				lstinfo=lst.read(i)
-				dc=eval(lstinfo[2])
+				dc=eval(lstcomments[i])
 				if "score" in dc:
 					score=dc.pop("score")
 				else:
@@ -528,11 +578,160 @@ def get_processed_image(filename,nim,nsl,preprocess,pad,nx=0,ny=0):
 
 	return ret
 
-def reconstruct(data,recon,preprocess,pad,fillangle,altmask,verbose=0, lstinput=False):
+class SliceCache(object):
+	"""An on-disk cache of slices returned by Reconstructor.preprocess_slice(), so repeated reconstructions from the
+	same images needn't reread and reprocess them. Each slice is stored as a raw .npy file, which is memory-mapped
+	when read, with a small .json file holding the header values the reconstructor needs. Entries are named by a hash
+	of the source file, image number, modification time and everything else which affects the processed slice (for .lst
+	input, the file and image the .lst entry refers to, so rewriting the .lst file doesn't invalidate the cache). When
+	the total size exceeds maxgb, the least recently used entries are removed. Safe to share between threads, and
+	between processes, as files are written under a temporary name and renamed into place."""
+
+	keepattr=("class_ssnr","reconstruct_preproc")
+
+	def __init__(self,path,maxgb=10.0):
+		self.path=path
+		self.maxsize=int(maxgb*1.0e9)
+		self.hits=0
+		self.misses=0
+		self.lock=threading.Lock()
+		self.added=0			# bytes written since the last trim()
+		self.mtimes={}			# source file modification times, so we only stat each file once
+		self.lsts={}			# records and referenced filenames of each .lst file, so we only read each once
+
+		try: os.makedirs(self.path)
+		except: pass
+
+	def __getstate__(self):
+		state=self.__dict__.copy()
+		del state["lock"]
+		return state
+
+	def __setstate__(self,state):
+		self.__dict__.update(state)
+		self.lock=threading.Lock()
+
+	def resolve(self,fsp,n):
+		"""Returns the (filename,image number) an image refers to, following .lst files to the actual image"""
+		if not fsp.endswith(".lst") : return fsp,n
+		with self.lock:
+			try: recs,filenames=self.lsts[fsp]
+			except KeyError:
+				lsx=LSXFile(fsp,True)
+				recs=lsx.read_all()
+				filenames=lsx.filenames
+				lsx.close()
+				self.lsts[fsp]=(recs,filenames)
+		return filenames[recs["file"][n]],int(recs["n"][n])
+
+	def key(self,elem,preprocess,pad,xf,altmask):
+		"""Returns the cache key for the image described by elem (from initialize_data()), or None if the source can't
+		be cached. xf is the Transform passed to preprocess_slice(), of which only the 2-D part matters."""
+		try: fsp,n=self.resolve(elem["filename"],elem["filenum"])
+		except: return None
+		try: mtime=self.mtimes[fsp]
+		except KeyError:
+			try: mtime=os.stat(fsp).st_mtime
+			except: mtime=None
+			self.mtimes[fsp]=mtime
+		if mtime==None : return None
+
+		t=Transform(xf)
+		t.set_rotation({"type":"eman"})
+		t2d=t.get_params("2d")
+		xfk="{tx:.3f},{ty:.3f},{mirror},{scale:.4f}".format(**t2d)
+		if altmask : xfk+=",alt={:.3f}".format(elem["xform"].get_rotation("eman")["alt"])
+
+		k="{}:{}:{}:{}:{}:{}:{}".format(os.path.abspath(fsp),n,elem["fileslice"],mtime,preprocess,tuple(pad),xfk)
+		return hashlib.md5(k.encode("utf-8")).hexdigest()
+
+	def get(self,key):
+		"""Returns the cached slice for key, or None"""
+		if key==None : return None
+		base=os.path.join(self.path,key)
+		try:
+			with open(base+".json","r") as fin: hdr=json.load(fin)
+			d=np.load(base+".npy",mmap_mode="r")
+			img=from_numpy(d)
+			del d
+			img.set_attr_dict(hdr)
+			os.utime(base+".npy",None)		# the modification time is the LRU clock
+		except:
+			with self.lock: self.misses+=1
+			return None
+
+		with self.lock: self.hits+=1
+		return img
+
+	def put(self,key,img):
+		"""Stores a slice returned by preprocess_slice()"""
+		if key==None : return
+		base=os.path.join(self.path,key)
+		tmp=".{}.{}".format(os.getpid(),threading.current_thread().ident)
+		hdr=img.get_attr_dict()
+		hdr={k:hdr[k] for k in hdr if k.startswith("is_") or k in self.keepattr}
+		try:
+			with open(base+tmp+".json","w") as out: json.dump(hdr,out)
+			np.save(base+tmp+".npy",to_numpy(img))
+			os.rename(base+tmp+".json",base+".json")
+			os.rename(base+tmp+".npy",base+".npy")
+		except:
+			for ext in (".json",".npy"):
+				try: os.unlink(base+tmp+ext)
+				except: pass
+			return
+
+		with self.lock:
+			self.added+=img["nx"]*img["ny"]*4
+			if self.added<self.maxsize//10 : return
+			self.added=0
+		self.trim()
+
+	def trim(self):
+		"""Removes the least recently used entries until the cache is within its size limit"""
+		ents=[]
+		for f in os.listdir(self.path):
+			if not f.endswith(".npy") or f.count(".")>1 : continue
+			try:
+				st=os.stat(os.path.join(self.path,f))
+				ents.append((st.st_mtime,st.st_size,f[:-4]))
+			except: pass
+
+		tot=sum([e[1] for e in ents])
+		for mtime,size,key in sorted(ents):
+			if tot<=self.maxsize : break
+			for ext in (".npy",".json"):
+				try: os.unlink(os.path.join(self.path,key+ext))
+				except: pass
+			tot-=size
+
+def reconstruct_partial(data,a,seed,seedweight,preprocess,pad,fillangle,altmask,verbose=0,lstinput=False,cache=None):
+	"""Inserts data into a new private Fourier reconstructor with parameters a, and returns the unnormalized
+	(volume,weights) pair without calling finish(). Pairs from several workers may be summed with sum_partials().
+	If seed is provided, seedweight is either a float or a weight volume, as for setup_seed()/setup_seedandweights().
+	Must remain a module-level function for --workerrecon=process."""
+
+	recon=Reconstructors.get("fourier", a)
+	if seed is None : recon.setup()
+	elif isinstance(seedweight,EMData) : recon.setup_seedandweights(seed,seedweight)
+	else : recon.setup_seed(seed,seedweight)
+
+	reconstruct(data,recon,preprocess,pad,fillangle,altmask,verbose,lstinput,cache)
+
+	return (recon.get_partial_volume(),recon.get_partial_weights())
+
+def sum_partials(a,b):
+	"""Adds the (volume,weights) pair b to the pair a in-place, and returns a"""
+	a[0].add(b[0])
+	a[1].add(b[1])
+	return a
+
+def reconstruct(data,recon,preprocess,pad,fillangle,altmask,verbose=0, lstinput=False, cache=None):
 	"""Do an actual reconstruction using an already allocated reconstructor, and a data list as produced
 	by initialize_data(). preprocess is a list of processor strings to be applied to the image data in the
 	event that it hasn't already been read into the data array. start and startweight are optional parameters
-	to seed the reconstruction with some non-zero values."""
+	to seed the reconstruction with some non-zero values. If cache is a SliceCache, preprocessed slices
+	are read from, and stored to, it."""
 
 	output=None		# deletes the results from the previous iteration if any
 
@@ -551,6 +750,12 @@ def reconstruct(data,recon,preprocess,pad,fillangle,altmask,verbose=0, lstinput=
 		astep=old_div(fillangle,(den-1))-.00001
 		if verbose: print("Filling %dx%d, %1.2f deg  %1.3f step"%(den,den,fillangle,astep))
 
+	# the fill pattern is the same for every particle
+	if fillangle>0:
+		fill=[(dalt,daz,exp(old_div(-(dalt**2+daz**2),(old_div(fillangle,4.0))**2)))
+			for dalt in np.arange(old_div(-fillangle,2.0),old_div(fillangle,2.0),astep)
+			for daz in np.arange(old_div(-fillangle,2.0),old_div(fillangle,2.0),astep)]
+
 	ptcl=0
 	for i,elem in enumerate(data):
 		# get the image to insert
@@ -562,22 +767,29 @@ def reconstruct(data,recon,preprocess,pad,fillangle,altmask,verbose=0, lstinput=
 				elem["data"]=img		# cache this for use in later iterations
 		except:
 #			print traceback.print_exc()
-			if elem["fileslice"]>=0 : img=get_processed_image(elem["filename"],elem["filenum"],elem["fileslice"],preprocess,pad,elem["nx"],elem["ny"])
-			else : img=get_processed_image(elem["filename"],elem["filenum"],-1,preprocess,pad)
-			if img["sigma"]==0 : continue
-			if altmask:
-				pxl=img["nx"]*(1.0-cos(elem["xform"].get_rotation("eman")["alt"]*pi/180.0))/2
-#				print(elem["filenum"],elem["xform"].get_rotation("eman")["alt"],1.0/cos(elem["xform"].get_rotation("eman")["alt"]*pi/180.0),pxl)
-				img.process_inplace("mask.zeroedge2d",{"x0":pxl,"x1":pxl})
-				img.write_image("masked.hdf",elem["filenum"])
-				
 			xf=Transform(elem["xform"])
 			if lstinput:
 				xf.set_rotation({"type":"eman"})
 				#### inverse the translation so make3d matches projection 
 				xf=xf.inverse()
-			
-			img=recon.preprocess_slice(img,xf)	# no caching here, with the lowmem option
+
+			if cache!=None :
+				key=cache.key(elem,preprocess,pad,xf,altmask)
+				img=cache.get(key)
+			else : img=None
+
+			if img is None :
+				if elem["fileslice"]>=0 : img=get_processed_image(elem["filename"],elem["filenum"],elem["fileslice"],preprocess,pad,elem["nx"],elem["ny"])
+				else : img=get_processed_image(elem["filename"],elem["filenum"],-1,preprocess,pad)
+				if img["sigma"]==0 : continue
+				if altmask:
+					pxl=img["nx"]*(1.0-cos(elem["xform"].get_rotation("eman")["alt"]*pi/180.0))/2
+#					print(elem["filenum"],elem["xform"].get_rotation("eman")["alt"],1.0/cos(elem["xform"].get_rotation("eman")["alt"]*pi/180.0),pxl)
+					img.process_inplace("mask.zeroedge2d",{"x0":pxl,"x1":pxl})
+					img.write_image("masked.hdf",elem["filenum"])
+
+				img=recon.preprocess_slice(img,xf)	# no caching in RAM here, with the lowmem option
+				if cache!=None : cache.put(key,img)
 #		img["n"]=i
 #		if i==7 : display(img)
 
@@ -594,12 +806,10 @@ def reconstruct(data,recon,preprocess,pad,fillangle,altmask,verbose=0, lstinput=
 		else:
 			xf=elem["xform"].get_rotation("eman")
 			alt,az=xf["alt"],xf["az"]
-			for dalt in np.arange(old_div(-fillangle,2.0),old_div(fillangle,2.0),astep):
-				for daz in np.arange(old_div(-fillangle,2.0),old_div(fillangle,2.0),astep):
-					weightmod=exp(old_div(-(dalt**2+daz**2),(old_div(fillangle,4.0))**2))
-					newxf=Transform({"type":"eman","alt":alt+dalt,"az":az+daz})
-#					print i,elem["filenum"],newxf
-					recon.insert_slice(img,newxf,elem["weight"]*weightmod)
+			for dalt,daz,weightmod in fill:
+				newxf=Transform({"type":"eman","alt":alt+dalt,"az":az+daz})
+#				print i,elem["filenum"],newxf
+				recon.insert_slice(img,newxf,elem["weight"]*weightmod)
 
 
 	return
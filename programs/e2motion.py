@@ -559,78 +559,58 @@ class EMMotion(QtWidgets.QMainWindow):
 		#self.initPath(self.path)
 		print("does nothing")
 	
-	def threadAlign(self,curlist,ref,refnomask,outstack):
-		"""This method is designed to run in a thread and perform alignments of a stack of inputs to a single reference"""
+	def alignOne(self,p,ref,refnomask):
+		"""Aligns a single particle to a reference, run in an EMExecutor"""
 	
-		for p in curlist:
-#			p2=p.process("filter.lowpass.gauss",{"cutoff_abs":0.1})
-			p2=EMData(p[2],p[3])
-			a=p2.align("rotate_translate_tree",ref)
-#			a=p2.copy()
-#			a["match_qual"]=a.cmp("frc",ref,{"sweight":0})		# compute similarity to unmasked reference
-			a["match_qual"]=a.cmp("ccc",refnomask)		# compute similarity to unmasked reference
-			outstack.put((a["match_qual"],a["xform.align2d"],p[2],p[3]))
-
-	def threadRAlign(self,curlist,ref,refnomask,outstack):
-		"""This method is designed to run in a thread and perform alignments of a stack of inputs to a single reference."""
+#		p2=p.process("filter.lowpass.gauss",{"cutoff_abs":0.1})
+		p2=EMData(p[2],p[3])
+		a=p2.align("rotate_translate_tree",ref)
+#		a=p2.copy()
+#		a["match_qual"]=a.cmp("frc",ref,{"sweight":0})		# compute similarity to unmasked reference
+		a["match_qual"]=a.cmp("ccc",refnomask)		# compute similarity to unmasked reference
+		return (a["match_qual"],a["xform.align2d"],p[2],p[3])
+
+	def rAlignOne(self,p,ref,refnomask):
+		"""Refines the alignment of a single particle to a reference, run in an EMExecutor"""
 	
-		for i,p in enumerate(curlist):
-#			p2=p.process("filter.lowpass.gauss",{"cutoff_abs":0.1})
-			p2=EMData(p[2],p[3])
-			a=p2.align("refine",ref,{"verbose":0,"xform.align2d":p[1]},"ccc",{})		# doesn't really seem to make an improvement
-#			a["match_qual"]=a.cmp("frc",ref,{"sweight":0})		# compute similarity to unmasked reference
-			a["match_qual"]=a.cmp("ccc",refnomask)		# compute similarity to unmasked reference
-			outstack.put((a["match_qual"],a["xform.align2d"],p[2],p[3]))
-
-	def threadTreeAlign(self,tree,tree2,lock):
-		"""Averages pairs in tree to produce 1/2 as many averages in tree2. Competes with other threads for elements to work on."""
-		
-		while len(tree)>0:
-			# we need to pull a pair from 'tree'. We use a lock to make sure we don't end up with a bunch of singletons at the end
-			lock.acquire()
-			try:
-				a=tree.pop()
-			except:
-				lock.release()
-				break
-			
-			try: b=tree.pop()
-			except:
-				tree2.append(a)
-				lock.release()
-				break
-			lock.release()
-			
-			# now we do the alignment and dump the result into the shared output list
-			c=a.align("rotate_translate_tree",b)
-			c.add(b)
-			c.process_inplace("xform.centerofmass",{"threshold":c["mean"]+c["sigma"]})
-#			c.process_inplace("xform.center")
-			tree2.append(c)
-
-	def threadFilt(self,ptclstack,outstack):
+#		p2=p.process("filter.lowpass.gauss",{"cutoff_abs":0.1})
+		p2=EMData(p[2],p[3])
+		a=p2.align("refine",ref,{"verbose":0,"xform.align2d":p[1]},"ccc",{})		# doesn't really seem to make an improvement
+#		a["match_qual"]=a.cmp("frc",ref,{"sweight":0})		# compute similarity to unmasked reference
+		a["match_qual"]=a.cmp("ccc",refnomask)		# compute similarity to unmasked reference
+		return (a["match_qual"],a["xform.align2d"],p[2],p[3])
+
+	def treeAlignPair(self,a,b):
+		"""Aligns and averages one pair of images from the tree, run in an EMExecutor"""
+		
+		c=a.align("rotate_translate_tree",b)
+		c.add(b)
+		c.process_inplace("xform.centerofmass",{"threshold":c["mean"]+c["sigma"]})
+#		c.process_inplace("xform.center")
+		return c
+
+	def filtOne(self,i):
 		"""Allows particles to be shrunk/filtered in parallel"""
 		
-		for i in ptclstack:
-			j=i.process("math.meanshrink",{"n":2})
-			j.process_inplace("filter.lowpass.gauss",{"cutoff_abs":0.1})
-			outstack.append(j)
+		j=i.process("math.meanshrink",{"n":2})
+		j.process_inplace("filter.lowpass.gauss",{"cutoff_abs":0.1})
+		return j
 
-	def waitThreads(self,thrs,lst,maxl):
+	def runJobs(self,func,jobs):
+		"""Runs func over jobs with the selected number of threads, updating the progress bar and keeping the GUI
+		responsive. Returns the results in job order."""
+		nthr=int(self.wvbcores.getValue())		# number of threads to use for faster alignments
 		
-		# Wait for threads to finish
-		while 1:
-			time.sleep(0.2)
-			self.wpbprogress.setValue(int(old_div(lst.qsize()*100,maxl)))
+		def progress(ndone,ntot):
+			self.wpbprogress.setValue(int(old_div(ndone*100,ntot)))
 			QtWidgets.qApp.processEvents()
-
-			# If any threads are alive, it breaks out of the inner loop, if none are alive, the else block breaks out of the outer loop
-			for t in thrs:
-				if t.isAlive() : break
-			else:
-				break
+		
+		# the event loop also runs every 0.2 s between completed jobs, so the GUI doesn't freeze during long jobs
+		with EMExecutor(nthr,progress=progress,idle=QtWidgets.qApp.processEvents,idletime=0.2) as ex:
+			ret=ex.map(func,jobs)
 				
 		self.wpbprogress.reset()
+		return ret
 
 
 	def bootstrap(self):
@@ -639,33 +619,15 @@ class EMMotion(QtWidgets.QMainWindow):
 		self.wpbprogress.setEnabled(True)
 		self.wpbprogress.reset()
 		QtWidgets.qApp.processEvents()
-		nthr=int(self.wvbcores.getValue())		# number of threads to use for faster alignments
 
 		print("bs1")
-		tree=[]
-		# launch nthr threads to do the alignments
-		thrs=[]
-		for i in range(nthr):
-			thrs.append(threading.Thread(target=self.threadFilt, args=(self.particles,tree)))
-			thrs[-1].start()
-		
-		
-		self.waitThreads(thrs,tree,len(self.particles))
+		tree=self.runJobs(self.filtOne,[(p,) for p in self.particles])
 		
 		print("bs2")
-		lock=threading.Lock()
-		
 		while len(tree)>1:
-			maxt=len(tree)
-			tree2=[]
-			
-			# launch nthr threads to do the alignments
-			thrs=[]
-			for i in range(nthr):
-				thrs.append(threading.Thread(target=self.threadTreeAlign, args=(tree,tree2,lock)))
-				thrs[-1].start()
-				
-			self.waitThreads(thrs,tree2,nthr)
+			# average pairs, an odd image out is carried to the next level
+			tree2=self.runJobs(self.treeAlignPair,[(tree[i],tree[i+1]) for i in range(0,len(tree)-1,2)])
+			if len(tree)%2==1 : tree2.append(tree[-1])
 
 			tree=tree2
 		
@@ -689,14 +651,7 @@ class EMMotion(QtWidgets.QMainWindow):
 		self.particles_ali=[]
 		self.alisig=EMData(self.particles[0]["nx"],self.particles[0]["ny"],1)
 		avgr=Averagers.get("mean",{"sigma":self.alisig})
-		thrs=[]
-		
-		# launch nthr threads to do the alignments
-		for i in range(nthr):
-			thrs.append(threading.Thread(target=self.threadAlign, args=(self.particles[i::nthr],tree[0],tree[0],self.particles_ali)))
-			thrs[-1].start()
-
-		self.waitThreads(thrs,self.particles_ali,len(self.particles))
+		self.particles_ali=self.runJobs(self.alignOne,[(p,tree[0],tree[0]) for p in self.particles])
 		
 		print("bs4")
 		self.particles_ali.sort()
@@ -790,24 +745,14 @@ class EMMotion(QtWidgets.QMainWindow):
 		self.wpbprogress.setEnabled(True)
 		self.wpbprogress.reset()
 		
-		nthr=int(self.wvbcores.getValue())		# number of threads to use for faster alignments
-		
-		jsd=queue.Queue(0)
 		self.particles_ali=[]
-		thrs=[]
-		# launch nthr threads to do the alignments
-		for i in range(nthr):
-			thrs.append(threading.Thread(target=self.threadRAlign, args=(self.particles[i::nthr],self.alimasked,self.aliimg,jsd)))
-			thrs[-1].start()
-			
-		self.waitThreads(thrs,jsd,len(self.particles))
+		ali=self.runJobs(self.rAlignOne,[(p,self.alimasked,self.aliimg) for p in self.particles])
 
 		# for refinement we use the current iteration
 		itr=self.wvbiter.getValue()
 		
 		dct=js_open_dict("{}/particle_parms_{:02d}.json".format(self.path,itr))
-		while not jsd.empty():
-			i=jsd.get()
+		for i in ali:
 			dct[(i[2],i[3])]={"xform.align2d":i[1],"score":i[0]}
 		
 		self.wpbprogress.reset()
@@ -819,25 +764,15 @@ class EMMotion(QtWidgets.QMainWindow):
 		self.wpbprogress.setEnabled(True)
 		self.wpbprogress.reset()
 		
-		nthr=int(self.wvbcores.getValue())		# number of threads to use for faster alignments
-
-		jsd=queue.Queue(0)
 		n2use=self.wvsnum.getValue()
-		thrs=[]
-		# launch nthr threads to do the alignments
-		for i in range(nthr):
-			thrs.append(threading.Thread(target=self.threadAlign, args=(self.particles[i:n2use:nthr],self.alimasked,self.aliimg,jsd)))
-			thrs[-1].start()
-			
-		self.waitThreads(thrs,jsd,len(self.particles))
+		ali=self.runJobs(self.alignOne,[(p,self.alimasked,self.aliimg) for p in self.particles[:n2use]])
 
 		# we find a new iteration to use for the new alignment
 		itr=1
 		while os.path.exists("{}/particle_parms_{:02d}.json".format(self.path,itr)): itr+=1
 		
 		dct=js_open_dict("{}/particle_parms_{:02d}.json".format(self.path,itr))
-		while not jsd.empty():
-			i=jsd.get()
+		for i in ali:
 			dct[(i[2],i[3])]={"xform.align2d":i[1],"score":i[0]}
 			
 		self.wvbiter.setValue(itr)
@@ -52,7 +52,9 @@ def main():
 This too provides a variety of dimensionality reduction methods. This new version
 uses scikit.learn, which provides a greater variety of algorithms, but must load 
 all data into memory. If working with a large file, you may want to consider using
---step to operate on a limited subset of the data.
+--step to operate on a limited subset of the data, or --chunk, which streams the
+data through an incremental PCA (--mode=pca only) so memory use is bounded by the
+chunk size rather than the number of particles.
 
 If specified, [input reprojections] will contain projections of the full input stack
 (ignoring --step) into the basis subspace represented as a single image. This 
@@ -83,6 +85,8 @@ handled this way."""
 	parser.add_argument("--mask",type=int,help="Mask radius, negative values imply ny/2+1+mask, --mask=0 disables, --maskfile overrides",default=0)
 	parser.add_argument("--simmx",type=str,help="Will use transformations from simmx on each particle prior to analysis")
 	parser.add_argument("--normalize",action="store_true",help="Perform a careful normalization of input images before MSA. Otherwise normalization is not modified until after mean subtraction.",default=False)
+	parser.add_argument("--chunk",type=int,default=0,help="If >0, read the data in chunks of this many particles, using incremental PCA and writing reprojections one chunk at a time. Peak memory is ~(2*threads+2)*chunk vectors. Only --mode=pca is supported. default=0 (load everything)")
+	parser.add_argument("--threads",type=int,default=4,help="Number of processes used to read chunks in parallel with --chunk. default=4")
 	parser.add_argument("--step",type=str,default="0,1",help="Specify <init>,<step>[,last]. Processes only a subset of the input data. For example, 0,2 would process only the even numbered particles")
 	parser.add_argument("--ppid", type=int, help="Set the PID of the parent process, used for cross platform PPID",default=-1)
 	parser.add_argument("--verbose", "-v", dest="verbose", action="store", metavar="n", type=int, default=0, help="verbose level [0-9], higner number means higher level of verboseness")
@@ -131,25 +135,44 @@ handled this way."""
 	n=(step[2]-step[0])//step[1]
 	nval=int(mask["square_sum"])
 #	print(args[0],n,nval)
-	if options.verbose or n*nval>500000000: print("Estimated memory usage (mb): ",n*nval*4/2**20)
-	
-	# Read all image data into numpy array
-	if options.simmx : data=simmx_get(args[0],options.simmx,mask,step)
-	else : data=normal_get(args[0],mask,step)
-	
-	if options.normalize:
-		for i in range(len(data)): data[i]/=np.linalg.norm(data[i])
+	if options.chunk>0 :
+		if options.mode!="pca" :
+			print("ERROR: --chunk is only supported with --mode=pca")
+			sys.exit(1)
+		options.chunk=max(options.chunk,2*options.nbasis)		# each incremental fit needs at least nbasis vectors, see read_chunks()
+		if options.verbose : print("Estimated memory usage (mb): ",(2*options.threads+2)*options.chunk*nval*4/2**20)
+	elif options.verbose or n*nval>500000000: print("Estimated memory usage (mb): ",n*nval*4/2**20)
 
-	# first output image is the mean of the input vectors, which has been subtracted from each vector
 	try: os.unlink(args[1])
 	except: pass
-	mean=np.mean(data,0)
-	for i in range(len(data)): data[i]-=mean
-	from_numpy(mean).process("misc.mask.pack",{"mask":mask,"unpack":1}).write_image(args[1],0)
-	
+
 	shift=0
+	if options.chunk>0 :
+		# The mean is accumulated by IncrementalPCA along with the basis, so a single pass over the data suffices
+		msa=skdc.IncrementalPCA(n_components=options.nbasis)
+		for start,chunk in read_chunks(args[0],options.simmx,mask,step,options.chunk,options.threads,logid):
+			if options.verbose>1 : print("Fitting {} - {}".format(start,start+len(chunk)))
+			if options.normalize:
+				for i in range(len(chunk)): chunk[i]/=np.linalg.norm(chunk[i])
+			msa.partial_fit(chunk)
+		mean=msa.mean_.astype(np.float32)
+		chunk=None
+	else:
+		# Read all image data into numpy array
+		if options.simmx : data=simmx_get(args[0],options.simmx,mask,step)
+		else : data=normal_get(args[0],mask,step)
+
+		if options.normalize:
+			for i in range(len(data)): data[i]/=np.linalg.norm(data[i])
+
+		# first output image is the mean of the input vectors, which has been subtracted from each vector
+		mean=np.mean(data,0)
+		for i in range(len(data)): data[i]-=mean
+		from_numpy(mean).process("misc.mask.pack",{"mask":mask,"unpack":1}).write_image(args[1],0)
+	
 	# This is where the actual action takes place!
-	if options.mode=="pca":
+	if options.chunk>0 : pass
+	elif options.mode=="pca":
 		msa=skdc.PCA(n_components=options.nbasis)
 #		print(data.shape)
 		msa.fit(data)
@@ -248,47 +271,85 @@ handled this way."""
 			images=args[0]
 	
 		if options.verbose: print("Reprojecting input data into subspace")
-		chunksize=min(max(2,250000000//nval),step2[2])		# limiting memory usage for this step to ~2G
-		out=EMData(options.nbasis,step2[2])		# we hold the full set of reprojections in memory, though
-		start=0
-		while (start<step2[2]):
-			stept=[start,1,min(step2[2],start+chunksize)]
-			if options.verbose: print(stept)
+		if options.chunk>0 :
+			# create the full size output on disk without allocating it, then fill it in one chunk at a time
+			out=EMData()
+			out.set_size(options.nbasis,step2[2],1,True)
+			out.write_image(args[2],0,IMAGE_UNKNOWN,False)
+			out=None
+			# IncrementalPCA keeps the true mean, so transform() centers the data. The in-core PCA is fit on data
+			# with the mean already subtracted, and projects the uncentered images, so we add the mean back
+			meanproj=np.dot(msa.mean_,msa.components_.T)
+			for start,chunk in read_chunks(images,options.simmx,mask,[0,1,step2[2]],options.chunk,options.threads,logid):
+				if options.verbose>1: print("Reprojecting {} - {}".format(start,start+len(chunk)))
+				proj=msa.transform(chunk)+meanproj
+				if options.normproj:
+					for i in range(len(proj)): proj[i]/=np.linalg.norm(proj[i])
+				from_numpy(proj.astype(np.float32)).write_image(args[2],0,IMAGE_UNKNOWN,False,Region(0,start,options.nbasis,len(proj)))
+		else:
+			chunksize=min(max(2,250000000//nval),step2[2])		# limiting memory usage for this step to ~2G
+			out=EMData(options.nbasis,step2[2])		# we hold the full set of reprojections in memory, though
+			start=0
+			while (start<step2[2]):
+				stept=[start,1,min(step2[2],start+chunksize)]
+				if options.verbose: print(stept)
 			
-			# read a chunk of data
-			if options.simmx : chunk=simmx_get(images,options.simmx,mask,stept)
-			else : chunk=normal_get(images,mask,stept)
-			if shift!=0 : 
-				chunk+=shift					# for methods requiring positivity
-				if chunk.min()<=0 :
-					print("ERROR: Results invalid, negative values. Shifting to prevent crash. Chunk ",stept," has mean=",chunk.mean(),"std=",chunk.std(),"min=",chunk.min())
-					chunk+= -chunk.min()
+				# read a chunk of data
+				if options.simmx : chunk=simmx_get(images,options.simmx,mask,stept)
+				else : chunk=normal_get(images,mask,stept)
+				if shift!=0 : 
+					chunk+=shift					# for methods requiring positivity
+					if chunk.min()<=0 :
+						print("ERROR: Results invalid, negative values. Shifting to prevent crash. Chunk ",stept," has mean=",chunk.mean(),"std=",chunk.std(),"min=",chunk.min())
+						chunk+= -chunk.min()
 			
-			proj=msa.transform(chunk)		# into subspace
-			if options.normproj:
-				for i in range(len(proj)): proj[i]/=np.linalg.norm(proj[i])
-			im=from_numpy(proj.copy())
-			out.insert_clip(im,(0,start,0))
-			start+=chunksize
+				proj=msa.transform(chunk)		# into subspace
+				if options.normproj:
+					for i in range(len(proj)): proj[i]/=np.linalg.norm(proj[i])
+				im=from_numpy(proj.copy())
+				out.insert_clip(im,(0,start,0))
+				start+=chunksize
 			
-		# write results
-		out.write_image(args[2],0)
+			# write results
+			out.write_image(args[2],0)
 
 	E2end(logid)
 	if options.mode not in ("pca","sparsepca","fastica") :
 		print("WARNING: While projection vectors are reliable, use of modes other than PCA or ICA may involve nonlinarities, meaning the 'Eigenimages' may not be interpretable in the usual way.")
 
+def read_chunks(images,simmxpath,mask,step,chunk,threads,logid=None):
+	"""Generator yielding (n,array) for successive chunks of 'chunk' vectors from the particles selected by step,
+	where n is the index within the selected subset of the first vector in the array. Chunks are read in parallel
+	by 'threads' processes, with at most 2*threads chunks in flight. A final chunk shorter than half of 'chunk' is merged
+	into the previous one, so incremental fitting never sees a tiny batch."""
+
+	n=(step[2]-step[0])//step[1]
+	bounds=list(range(0,n,chunk))+[n]
+	if len(bounds)>2 and bounds[-1]-bounds[-2]<chunk//2 : del bounds[-2]
+	jobs=[(bounds[i],[step[0]+bounds[i]*step[1],step[1],step[0]+bounds[i+1]*step[1]]) for i in range(len(bounds)-1)]
+
+	with EMExecutor(threads,backend="process",logid=logid) as ex:
+		for start,data in ex.imap(read_chunk,[(start,images,simmxpath,mask,stept) for start,stept in jobs]):
+			yield start,data
+
+def read_chunk(start,images,simmxpath,mask,step):
+	"""Reads one chunk for read_chunks()"""
+	if simmxpath : return start,simmx_get(images,simmxpath,mask,step)
+	return start,normal_get(images,mask,step)
+
 def simmx_get(images,simmxpath,mask,step):
 	"""returns an array of transformed masked images as arrays for PCA"""
 
-	simmx=[EMData(simmxpath,i) for i in range(5)]
-
 	n=(step[2]-step[0])//step[1]
 
+	# only the rows of the similarity matrix for the requested particles are read
+	hdr=EMData(simmxpath,0,True)
+	simmx=[EMData(simmxpath,i,False,Region(0,step[0],hdr["nx"],max(1,(n-1)*step[1]+1))) for i in range(5)]
+
 	ret=EMData(int(mask["square_sum"]),n)
 	for i in range(n):
 		im=EMData(images,i*step[1]+step[0])
-		xf=get_xform(i,simmx)
+		xf=get_xform(i*step[1],simmx)
 		im.transform(xf)
 		imm=im.process("misc.mask.pack",{"mask":mask})
 		ret.insert_clip(imm,(0,i,0))
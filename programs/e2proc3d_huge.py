@@ -41,24 +41,29 @@ from optparse import OptionParser
 import sys
 from math import *
 import os.path
+import numpy as np
 import pyemtbx.options
 from pyemtbx.options import intvararg_callback
 from pyemtbx.options import floatvararg_callback
 
 def main():
 	progname = os.path.basename(sys.argv[0])
-	usage = progname + """ [options] <inputfile>
+	usage = progname + """ [options] <inputfile> [outputfile]
 	This is a specialized version of e2proc3d.py targeted at performing a limited set of operations on
-very large volumes in-place (such as tomograms) which may not readily fit into system memory. Operations are 
-performed by reading portions of the image, processing, then writing the portion back to disk. Unlike e2proc3d.py
-you may pass only a single operation to the program for each invocation, or behavior will be undefined. It will 
-process a single volume in a single file in-place.
+very large volumes (such as tomograms) which may not readily fit into system memory. Operations are 
+performed by reading Z-slabs of the image, processing them in parallel, then writing each slab back to disk. 
+The volume is processed in-place unless an output file is specified.
 
+--mult, --multfile, --add and --process may be combined, and are applied to each slab in that order. Each slab is
+read with --overlap extra Z planes on either side, which are discarded after processing, so neighborhood
+processors (median, local normalization, real-space filters, ...) see the same data as they would on the whole volume
+as long as --overlap is at least their radius. Fourier filters are only approximate when applied this way.
+--trans and --streaksubtract must be used on their own.
 """
 	parser = OptionParser(usage)
 	
 
-	parser.add_option("--streaksubtract",type="string",help="This will subtract the histogram peak value along a single axis in the volume.",default=None)
+	parser.add_option("--streaksubtract",type="string",help="This will subtract the histogram peak value along a single axis in the volume. Specify the axis, x, y or z.",default=None)
 
 	parser.add_option("--process", metavar="processor_name:param1=value1:param2=value2", type="string",
 								action="append", help="apply a processor named 'processorname' with all its parameters/values. WARNING: this works by operating on fragments of the overall image at a time, and some processors won't work properly this way.")
@@ -72,29 +77,252 @@ process a single volume in a single file in-place.
 	parser.add_option("--add", metavar="f", type="float", 
 								help="Adds a constant 'f' to the densities")
 
-	parser.add_option("--trans", metavar="dx,dy,dz", type="string", default=0, help="Translate map by dx,dy,dz ")
+	parser.add_option("--trans", metavar="dx,dy,dz", type="string", default=None, help="Translate map by integer dx,dy,dz ")
+	parser.add_option("--slab", type="int", default=32, help="Number of Z planes to process at a time (per thread). default=32")
+	parser.add_option("--overlap", type="int", default=8, help="Number of extra Z planes read on either side of each slab for neighborhood processors. default=8")
+	parser.add_option("--threads", type="int", default=4, help="Number of slabs to process in parallel. default=4")
 	parser.add_option("--ppid", type=int, help="Set the PID of the parent process, used for cross platform PPID",default=-1)
 	parser.add_option("--verbose", "-v", dest="verbose", action="store", metavar="n", type="int", default=0, help="verbose level [0-9], higner number means higher level of verboseness")
 		
 	(options, args) = parser.parse_args()
 
-	print("Sorry, this program still under development. Not functional yet.")
-	sys.exit(1)
+	if len(args)<1 or len(args)>2:
+		print("ERROR: Please specify one input file and optionally one output file")
+		sys.exit(1)
+
+	infile=args[0]
+	if len(args)>1: outfile=args[1]
+	else: outfile=infile
 
 	try:
-		hdr=EMData(args[1],0,1)
+		hdr=EMData(infile,0,1)
 	except:
 		print("ERROR: Can't read input file header")
 		sys.exit(1)
 
+	nx,ny,nz=hdr["nx"],hdr["ny"],hdr["nz"]
+	options.slab=max(1,options.slab)
+	options.overlap=max(0,min(options.overlap,options.slab))
 
-	if options.mediansubtract!=None :
-		pass  # Added this to make python happy
-		
+	slabops=options.process!=None or options.mult!=None or options.multfile!=None or options.add!=None
+	if (options.trans!=None)+(options.streaksubtract!=None)+slabops>1:
+		print("ERROR: --trans and --streaksubtract must be used on their own")
+		sys.exit(1)
+
+	if options.trans!=None:
+		try: trans=[int(i) for i in options.trans.split(",")]
+		except:
+			print("ERROR: --trans must be 3 integers dx,dy,dz")
+			sys.exit(1)
+		if len(trans)!=3:
+			print("ERROR: --trans must be 3 integers dx,dy,dz")
+			sys.exit(1)
+
+	if options.streaksubtract!=None and options.streaksubtract.lower() not in ("x","y","z"):
+		print("ERROR: --streaksubtract must be x, y or z")
+		sys.exit(1)
+
+	if options.process!=None: procs=[parsemodopt(p) for p in options.process]
+	else: procs=[]
+
+	if options.multfile!=None:
+		for f in options.multfile:
+			mhdr=EMData(f,0,1)
+			if (mhdr["nx"],mhdr["ny"],mhdr["nz"])!=(nx,ny,nz):
+				print("ERROR: {} is not the same size as {}".format(f,infile))
+				sys.exit(1)
+
+	logid=E2init(sys.argv,options.ppid)
+
+	if outfile!=infile:
+		# create the full size output without allocating the volume, slabs are then written into it
+		if os.path.isfile(outfile): os.remove(outfile)
+		hdr.write_image(outfile,0,IMAGE_UNKNOWN,False)
+
+	if options.verbose:
+		mem=nx*ny*(options.slab+2*options.overlap)*4*(2*options.threads+1)
+		print("Processing {}x{}x{} volume in slabs of {} (+{}) planes using {} threads, ~{:.1f} GB of memory".format(nx,ny,nz,options.slab,options.overlap,options.threads,mem/1024.0**3))
+
+	stat=SlabStat()
+	with EMExecutor(options.threads,logid=logid) as ex:
+		if options.trans!=None:
+			chunks=trans_chunks(nz,options.slab,trans[2],outfile==infile)
+			jobs=((read_zrange(infile,nx,ny,nz,z0-trans[2],z1-trans[2]),trans[0],trans[1],z0,z1) for z0,z1 in chunks)
+			for z0,core in ex.imap(trans_slab,jobs,total=len(chunks)):
+				write_slab(outfile,core,stat,(0,0,z0))
+		elif options.streaksubtract!=None:
+			axis=options.streaksubtract.lower()
+			lo,hi=streak_range(infile,hdr,options)
+			if options.verbose: print("Histogram peaks will be searched between {:.4g} and {:.4g}".format(lo,hi))
+			# lines along z cross every z-slab, so those are processed in slabs along y instead
+			if axis=="z":
+				chunks=[(y0,min(y0+options.slab,ny)) for y0 in range(0,ny,options.slab)]
+				jobs=((EMData(infile,0,False,Region(0,y0,0,nx,y1-y0,nz)),axis,lo,hi,(0,y0,0)) for y0,y1 in chunks)
+			else:
+				chunks=[(z0,min(z0+options.slab,nz)) for z0 in range(0,nz,options.slab)]
+				jobs=((EMData(infile,0,False,Region(0,0,z0,nx,ny,z1-z0)),axis,lo,hi,(0,0,z0)) for z0,z1 in chunks)
+			for origin,slab in ex.imap(streak_slab,jobs,total=len(chunks)):
+				write_slab(outfile,slab,stat,origin)
+		else:
+			jobs=(job+(procs,options) for job in read_slabs(infile,nx,ny,nz,options.slab,options.overlap,options.multfile))
+			for z0,core in ex.imap(process_slab,jobs,total=(nz+options.slab-1)//options.slab):
+				if options.verbose>1: print("{}/{}".format(z0+core["nz"],nz))
+				write_slab(outfile,core,stat,(0,0,z0))
+
+	# the header statistics are not updated by region writes
+	hdr=EMData(outfile,0,1)
+	stat.update(hdr)
+	hdr.write_image(outfile,0,IMAGE_UNKNOWN,True)
+
+	E2end(logid)
+
+class SlabStat(object):
+	"""Accumulates the statistics of a volume written one slab at a time"""
+	def __init__(self):
+		self.n=0
+		self.sum=0.
+		self.sum2=0.
+		self.min=float("inf")
+		self.max=float("-inf")
+
+	def add(self,slab):
+		d=slab.numpy()
+		self.n+=d.size
+		self.sum+=np.sum(d,dtype=np.float64)
+		self.sum2+=np.sum(np.square(d,dtype=np.float64))
+		self.min=min(self.min,float(d.min()))
+		self.max=max(self.max,float(d.max()))
+
+	def update(self,hdr):
+		if self.n==0: return
+		mean=self.sum/self.n
+		hdr["mean"]=mean
+		hdr["sigma"]=sqrt(max(self.sum2/self.n-mean**2,0))
+		hdr["minimum"]=self.min
+		hdr["maximum"]=self.max
+
+def write_slab(outfile,slab,stat,origin):
+	"""Writes one processed slab into outfile at origin (x,y,z)"""
+	stat.add(slab)
+	slab.write_image(outfile,0,IMAGE_UNKNOWN,False,Region(origin[0],origin[1],origin[2],slab["nx"],slab["ny"],slab["nz"]))
+
+def read_slabs(infile,nx,ny,nz,slab,overlap,multfiles=None):
+	"""Generator yielding (slab,z0,z1,ov0,mults) for each Z-slab [z0,z0+slab) of infile. slab includes up to
+overlap planes on either side, ov0 of them below z0. The lower planes are kept from the previous read rather than
+read again, so the slabs already processed may be written back to the same file while this is running.
+mults are the same regions of each of multfiles. Files are only read here, in the calling thread."""
+	tail=None
+	for z0 in range(0,nz,slab):
+		z1=min(z0+slab,nz)
+		ze=min(z1+overlap,nz)
+		cur=EMData(infile,0,False,Region(0,0,z0,nx,ny,ze-z0))
+		if tail is None or len(tail)==0:
+			img=cur
+			ov0=0
+		else:
+			img=from_numpy(np.concatenate((tail,cur.numpy()))).copy()
+			ov0=len(tail)
+		tail=cur.numpy()[max(z1-overlap,z0)-z0:z1-z0].copy()
+
+		mults=[]
+		if multfiles!=None:
+			for f in multfiles:
+				mults.append(EMData(f,0,False,Region(0,0,z0-ov0,nx,ny,img["nz"])))
+
+		yield (img,z0,z1,ov0,mults)
+
+def process_slab(img,z0,z1,ov0,mults,procs,options):
+	"""Applies --multfile, --mult, --add and --process to one slab, then trims the overlap"""
+	for m in mults: img.mult(m)
+	if options.mult!=None: img.mult(options.mult)
+	if options.add!=None: img.add(options.add)
+	for p in procs: img.process_inplace(p[0],p[1])
+	if ov0>0 or img["nz"]>z1-z0:
+		img=img.get_clip(Region(0,0,ov0,img["nx"],img["ny"],z1-z0))
+	return (z0,img)
+
+def trans_chunks(nz,slab,dz,inplace):
+	"""Output Z ranges for --trans. When translating in-place, slabs are ordered so no input plane is overwritten before it is read."""
+	chunks=[(z0,min(z0+slab,nz)) for z0 in range(0,nz,slab)]
+	if inplace and dz>0: chunks.reverse()
+	return chunks
+
+def read_zrange(infile,nx,ny,nz,z0,z1):
+	"""Reads planes [z0,z1) of infile as a numpy array, with zeros for planes outside the volume"""
+	out=np.zeros((z1-z0,ny,nx),dtype=np.float32)
+	za=max(z0,0)
+	zb=min(z1,nz)
+	if zb>za:
+		out[za-z0:zb-z0]=EMData(infile,0,False,Region(0,0,za,nx,ny,zb-za)).numpy()
+	return out
+
+def trans_slab(d,dx,dy,z0,z1):
+	"""Integer x/y translation of one slab, the z translation is done by read_zrange"""
+	ny,nx=d.shape[1:]
+	out=np.zeros_like(d)
+	if abs(dx)<nx and abs(dy)<ny:
+		out[:,max(dy,0):ny+min(dy,0),max(dx,0):nx+min(dx,0)]=d[:,max(-dy,0):ny+min(-dy,0),max(-dx,0):nx+min(-dx,0)]
+	return (z0,from_numpy(out).copy())
+
+def streak_range(infile,hdr,options):
+	"""Streaming histogram pass over the whole volume. Returns the range containing all but the extreme 0.1% of
+values at either end, so a few very high or low contrast objects (such as gold) don't spread the per-line histograms."""
+	nx,ny,nz=hdr["nx"],hdr["ny"],hdr["nz"]
+	try:
+		mn,mx=float(hdr["minimum"]),float(hdr["maximum"])
+		if mx<=mn: raise ValueError
+	except:
+		mn,mx=float("inf"),float("-inf")
+		for z0 in range(0,nz,options.slab):
+			d=EMData(infile,0,False,Region(0,0,z0,nx,ny,min(options.slab,nz-z0))).numpy()
+			mn=min(mn,float(d.min()))
+			mx=max(mx,float(d.max()))
+		if mx<=mn: return mn,mn+1.0
+
+	nbin=4096
+	hist=np.zeros(nbin,dtype=np.int64)
+	for z0 in range(0,nz,options.slab):
+		d=EMData(infile,0,False,Region(0,0,z0,nx,ny,min(options.slab,nz-z0))).numpy()
+		hist+=np.histogram(d,bins=nbin,range=(mn,mx))[0]
+
+	cum=np.cumsum(hist)/float(max(1,hist.sum()))
+	lo=mn+(mx-mn)*np.searchsorted(cum,0.001)/float(nbin)
+	hi=mn+(mx-mn)*(np.searchsorted(cum,0.999)+1)/float(nbin)
+	return lo,hi
+
+def streak_slab(img,axis,lo,hi,origin):
+	"""Subtracts the histogram peak of each line along axis from one slab"""
+	d=img.numpy()
+	ax={"x":2,"y":1,"z":0}[axis]
+	d-=np.expand_dims(findmode(d,ax,lo,hi),ax)
+	img.update()
+	return (origin,img)
+
+def findmode(d,axis,lo,hi,nbin=0):
+	"""This computes something akin to the mode of each line of d along axis. Values are histogrammed between lo and
+hi, and the peak bin is refined by the centroid of it and its two neighbors. Returns an array with axis removed."""
+	d=np.moveaxis(d,axis,-1)
+	shp=d.shape[:-1]
+	n=d.shape[-1]
+	if nbin<=0: nbin=max(16,min(256,n//8))
+	lines=d.reshape(-1,n)
+	nl=len(lines)
+	step=(hi-lo)/float(nbin)
 
-def findmode(img) :
-	"""This computes something akin to the mode"""
+	# one bincount over all lines, each line gets its own block of nbin
+	idx=np.clip(((lines-lo)/step).astype(np.int64),0,nbin-1)
+	idx+=np.arange(nl,dtype=np.int64)[:,None]*nbin
+	hist=np.bincount(idx.ravel(),minlength=nl*nbin).reshape(nl,nbin).astype(np.float64)
+	# values outside [lo,hi] are clipped into the end bins, which shouldn't win
+	hist[:,0]=0
+	hist[:,-1]=0
 
+	pk=np.argmax(hist,axis=1)
+	rows=np.arange(nl)
+	nb=np.stack([hist[rows,np.clip(pk+i,0,nbin-1)]*(0<=pk+i)*(pk+i<nbin) for i in (-1,0,1)],axis=1)
+	off=(nb[:,2]-nb[:,0])/np.maximum(nb.sum(axis=1),1)
+	mode=lo+(pk+0.5+off)*step
+	return mode.reshape(shp).astype(d.dtype)
 
 if __name__ == "__main__":
 	main()
@@ -114,8 +114,8 @@ sort of virtual stack represented by .lst files, use e2proc2d.py or e2proc3d.py
 
 		for f in args:
 			lst=LSXFile(f,True)
-			for i in range(len(lst)):
-				out.write("{}\n".format(lst[i][0]))
+			for n in lst.read_all()["n"]:
+				out.write("{}\n".format(n))
 
 	if options.dereforig:
 		newlst=LSXFile(options.dereforig)
@@ -278,9 +278,8 @@ sort of virtual stack represented by .lst files, use e2proc2d.py or e2proc3d.py
 			lst=LSXFile(f,True)
 			ntot+=len(lst)
 
-			for i in range(len(lst)):
-				im=lst.read(i)
-				lsto.write(-1,im[0],im[1],im[2])
+			for im in lst.read_all():
+				lsto.write(-1,im["n"],lst.filenames[im["file"]],im["comment"])
 
 		if options.verbose : print("{} particles added to {}".format(ntot,options.merge))
 
@@ -296,10 +295,10 @@ sort of virtual stack represented by .lst files, use e2proc2d.py or e2proc3d.py
 			lst=LSXFile(f,True)
 			ntot+=len(lst)
 
-			for i in range(len(lst)):
-				im=lst.read(i)
-				ptcls.append((im[1],im[0],im[2]))
-				pfiles.add(im[1])
+			for im in lst.read_all():
+				fsp=lst.filenames[im["file"]]
+				ptcls.append((fsp,int(im["n"]),im["comment"]))
+				pfiles.add(fsp)
 
 		ptcls.sort()
 
@@ -2140,6 +2140,9 @@ first upgrade the project with e2projectupdate21.py. You can still use the e2dis
 GUI directly to browse the contents of old-style projects.""")
 		sys.exit(1)
 
+	# the GUI polls many info/*.json files, so we allow them to be up to 2 seconds stale rather than checking the disk on every read
+	JSDict.set_cache_policy(staleness=2.0)
+
 	from eman2_gui.emapplication import EMApp
 	app = EMApp()
 	#app = QtWidgets.QApplication(sys.argv)
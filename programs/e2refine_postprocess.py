@@ -37,6 +37,7 @@ from __future__ import division
 from past.utils import old_div
 from builtins import range
 from EMAN2 import *
+from EMAN2postproc import save_fsc,masked_fsc
 from math import *
 import os
 import sys
@@ -131,14 +132,14 @@ def main():
 		os.unlink("{path}tmp2.hdf".format(path=path))
 		os.unlink("{path}tmp0.hdf".format(path=path))
 
+	even=EMData(evenfile,0)
+	odd=EMData(oddfile,0)
+
 	### Unmasked FSC
 	unmaskedfsc = "{path}fsc_unmasked_{itr:02d}.txt".format(path=path,itr=options.iter)
-	cmd="e2proc3d.py {evenfile} {unmaskedfsc} --calcfsc={oddfile}".format(unmaskedfsc=unmaskedfsc,evenfile=evenfile,oddfile=oddfile)
-	run(cmd)
+	save_fsc(even,odd,unmaskedfsc)
 
 	### Filtration & Normalize
-	even=EMData(evenfile,0)
-	odd=EMData(oddfile,0)
 	combined=even+odd
 	try: combined["ptcl_repr"]=even["ptcl_repr"]+odd["ptcl_repr"]
 	except: pass
@@ -304,20 +305,14 @@ def main():
 	#run("e2proc3d.py {cfile} {path}mask_tight.hdf {mask}{maskopt} {amask3d2}".format(path=path,cfile=combfile,mask=amask3dtight,amask3d2=amask3d2,maskopt=maskopt))
 
 	### Masked tight FSC
-	run("e2proc3d.py {evenfile} {path}tmp_even.hdf --multfile {path}mask_tight.hdf".format(evenfile=evenfile,path=path))
-	run("e2proc3d.py {oddfile} {path}tmp_odd.hdf --multfile {path}mask_tight.hdf".format(oddfile=oddfile,path=path))
-
-	# New FSC between the two masked volumes
-	cmd="e2proc3d.py {path}tmp_even.hdf {path}fsc_maskedtight_{itr:02d}.txt --calcfsc {path}tmp_odd.hdf".format(path=path,itr=options.iter)
-	run(cmd)
+	masked_fsc(even,odd,EMData("{path}mask_tight.hdf".format(path=path),0),"{path}fsc_maskedtight_{itr:02d}.txt".format(path=path,itr=options.iter))
 
 	### Masked FSC, and tmp_ files for later filtration
-	run("e2proc3d.py {evenfile} {path}tmp_even.hdf --multfile {path}mask.hdf".format(evenfile=evenfile,path=path))
-	run("e2proc3d.py {oddfile} {path}tmp_odd.hdf --multfile {path}mask.hdf".format(oddfile=oddfile,path=path))
-
 	# New FSC between the two masked volumes, which we will use for the final filter
-	cmd="e2proc3d.py {path}tmp_even.hdf {path}fsc_masked_{itr:02d}.txt --calcfsc {path}tmp_odd.hdf".format(path=path,itr=options.iter)
-	run(cmd)
+	evenm,oddm=masked_fsc(even,odd,EMData("{path}mask.hdf".format(path=path),0),"{path}fsc_masked_{itr:02d}.txt".format(path=path,itr=options.iter))
+	evenm.write_image("{path}tmp_even.hdf".format(path=path),0)
+	oddm.write_image("{path}tmp_odd.hdf".format(path=path),0)
+	evenm=oddm=None
 
 	try:
 		noisecutoff=calc_noise_cutoff("{path}fsc_masked_{itr:02d}.txt".format(path=path,itr=options.iter),options.ncmult)
@@ -17,6 +17,7 @@ from past.utils import old_div
 from builtins import range
 from EMAN2 import *
 from EMAN2db import db_open_dict
+from EMAN2star import StarFile
 import pyemtbx.options
 import os
 import sys
@@ -223,10 +224,10 @@ for db in dblist:
 			break
 print("CTF information being pulled from: " + db)
 if ctf_corr == 1:
-	s = """echo "data_\nloop_\n_rlnImageName\n_rlnMicrographName\n_rlnDefocusU\n_rlnDefocusV\n_rlnDefocusAngle\n_rlnVoltage\n_rlnSphericalAberration\n_rlnAmplitudeContrast" > """ + E2RLN + "/all_images.star"
+	star_keys = ["rlnImageName","rlnMicrographName","rlnDefocusU","rlnDefocusV","rlnDefocusAngle","rlnVoltage","rlnSphericalAberration","rlnAmplitudeContrast"]
 else:
-	s = """echo "data_\nloop_\n_rlnImageName\n_rlnMicrographName\n_rlnVoltage\n_rlnAmplitudeContrast" > """ + E2RLN + "/all_images.star"
-call(s,shell=True)
+	star_keys = ["rlnImageName","rlnMicrographName","rlnVoltage","rlnAmplitudeContrast"]
+star_rows = []		# rows for all_images.star, which is written in one pass at the end
 
 print("Converting EMAN2 Files to Formats Compatible with RELION")
 temp = EMData(set_name,0)
@@ -254,12 +255,10 @@ for k in range(num_ptcl):
 		if ctf_corr == 1:
 			defocus1 = defocus2 = str(temp['ctf'].to_dict()['defocus']*10000)
 			for num in range(k-i):
-				s = "echo \"" + str(num+1).zfill(6) + "@" + E2RLN + "/stacks/" + base_name(old_src) + ".mrcs " + E2RLN + "/stacks/" + base_name(old_src) + ".mrcs " + str(defocus1) + " " + str(defocus2) + " 0 " + str(voltage) + " " + str(cs) + " " + str(amplitude_contrast) + " \">> " + E2RLN + "/all_images.star" 
-				call(s,shell=True)
+				star_rows.append([str(num+1).zfill(6) + "@" + E2RLN + "/stacks/" + base_name(old_src) + ".mrcs", E2RLN + "/stacks/" + base_name(old_src) + ".mrcs", str(defocus1), str(defocus2), "0", str(voltage), str(cs), str(amplitude_contrast)])
 		else:
 			for num in range(k-i):
-				s = "echo \"" + str(num+1).zfill(6) + "@" + E2RLN + "/stacks/" + base_name(old_src) + ".mrcs " + E2RLN + "/stacks/" + base_name(old_src) + ".mrcs " + str(voltage) + " " + str(amplitude_contrast) + " \">> " + E2RLN + "/all_images.star" 
-				call(s,shell=True)
+				star_rows.append([str(num+1).zfill(6) + "@" + E2RLN + "/stacks/" + base_name(old_src) + ".mrcs", E2RLN + "/stacks/" + base_name(old_src) + ".mrcs", str(voltage), str(amplitude_contrast)])
 		s = "rm " + E2RLN + "/" + base_name(old_src) + ".hdf"
 		call(s,shell=True)
 		i = k
@@ -283,12 +282,10 @@ for k in range(num_ptcl):
 		if ctf_corr == 1:
 			defocus1 = defocus2 = str(temp['ctf'].to_dict()['defocus']*10000)
 			for num in range(k-i+1):
-				s = "echo \"" + str(num+1).zfill(6) + "@" + E2RLN + "/stacks/" + base_name(old_src) + ".mrcs " + E2RLN + "/stacks/" + base_name(old_src) + ".mrcs " + str(defocus1) + " " + str(defocus2) + " 0 " + str(voltage) + " " + str(cs) + " " + str(amplitude_contrast) + " \">> " + E2RLN + "/all_images.star"
-				call(s,shell=True)
+				star_rows.append([str(num+1).zfill(6) + "@" + E2RLN + "/stacks/" + base_name(old_src) + ".mrcs", E2RLN + "/stacks/" + base_name(old_src) + ".mrcs", str(defocus1), str(defocus2), "0", str(voltage), str(cs), str(amplitude_contrast)])
 		else:
 			for num in range(k-i+1):
-				s = "echo \"" + str(num+1).zfill(6) + "@" + E2RLN + "/stacks/" + base_name(old_src) + ".mrcs " + E2RLN + "/stacks/" + base_name(old_src) + ".mrcs " + str(voltage) + " " + amplitude_contrast + " \">> " + E2RLN + "/all_images.star"
-				call(s,shell=True)
+				star_rows.append([str(num+1).zfill(6) + "@" + E2RLN + "/stacks/" + base_name(old_src) + ".mrcs", E2RLN + "/stacks/" + base_name(old_src) + ".mrcs", str(voltage), str(amplitude_contrast)])
 		
 		s = "rm " + E2RLN + "/" + base_name(src) + ".hdf"
 		call(s,shell=True)
@@ -296,6 +293,10 @@ for k in range(num_ptcl):
 		old_src = src
 		
 
+star = StarFile(E2RLN + "/all_images.star")
+star.add_loop(list(zip(star_keys,list(zip(*star_rows)))))
+star.writefile()
+
 s = "rm " + E2RLN + "/ptcl_stack.hdf"
 call(s,shell=True)
 print("File Conversion Complete")
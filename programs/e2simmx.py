@@ -44,6 +44,9 @@ from math import *
 import os
 import sys
 import traceback
+import hashlib
+import tempfile
+import getpass
 from EMAN2_utils import cmponetomany
 
 a = EMUtil.ImageType.IMAGE_UNKNOWN
@@ -344,6 +347,90 @@ class EMParallelSimMX(object):
 
 
 
+blockcache={}			# images from recently used cached blocks in this process, cache filename -> list of EMData
+blockcache_order=[]		# least recently used first
+BLOCKCACHE_MAX=4		# number of blocks kept in memory per process
+BLOCKCACHE_AGE=86400	# cached blocks on disk unused for this many seconds are removed
+
+def block_cache_name(fsp,indices,shrink):
+	'''
+	Returns the name of the node-local cache file for images indices of fsp shrunk by shrink, or None if fsp can't be cached
+	(bdb: for example). The name includes the modification time of fsp, so a modified file simply misses the cache.
+	'''
+	try:
+		key="{}:{}:{}:{}".format(os.path.abspath(fsp),os.stat(fsp).st_mtime,shrink,",".join([str(i) for i in indices]))
+	except: return None
+
+	path=os.path.join(tempfile.gettempdir(),"e2simmx-cache-{}".format(getpass.getuser()))
+	try: os.makedirs(path)
+	except: pass
+	return os.path.join(path,hashlib.md5(key.encode("utf-8")).hexdigest()+".hdf")
+
+def read_block(fsp,indices,shrink=None,cache=False):
+	'''
+	Returns a list of images indices from fsp, each shrunk with math.fft.resample if shrink is set. The images are read with a
+	single bulk read, retried for up to 100 s, since network filesystems sometimes fail transiently. If cache is set, the
+	shrunken images are stored in a cache in the node's temporary directory, and the most recently used blocks are also kept
+	in memory, so other tasks on the same node needing the same block neither reread nor reshrink it. The caller may modify
+	the returned images.
+	'''
+	indices=list(indices)
+	name=block_cache_name(fsp,indices,shrink) if cache else None
+
+	if name!=None:
+		if name in blockcache:
+			blockcache_order.remove(name)
+			blockcache_order.append(name)
+			return [im.copy() for im in blockcache[name]]
+
+		try:
+			ret=EMData.read_images(name)
+			if len(ret)!=len(indices) : raise Exception
+			os.utime(name,None)
+		except: ret=None
+
+	if name==None or ret==None:
+		for datareadid in range(20):
+			try: ret=EMData.read_images(fsp,indices)
+			except:
+				print("Failed to read %s from range %s. Wait for 5s and try again."%(fsp,str(indices)))
+				time.sleep(5)
+			else: break
+		else:
+			print("Cannot read image. Give up.")
+			raise Exception("Couldn't read data in init_memory")
+
+		if shrink!=None:
+			for im in ret: im.process_inplace("math.fft.resample",{"n":shrink})
+
+		if name!=None:
+			# written under a temporary name, so other processes never see a partial file
+			tmp="{}.{}.hdf".format(name[:-4],os.getpid())
+			try:
+				for i,im in enumerate(ret): im.write_image(tmp,i)
+				os.rename(tmp,name)
+			except:
+				try: os.unlink(tmp)
+				except: pass
+			block_cache_clean(os.path.dirname(name))
+
+	if name==None : return ret
+
+	blockcache[name]=ret
+	blockcache_order.append(name)
+	while len(blockcache_order)>BLOCKCACHE_MAX : del blockcache[blockcache_order.pop(0)]
+	return [im.copy() for im in ret]
+
+def block_cache_clean(path):
+	'''
+	Removes cached blocks in path which haven't been used recently
+	'''
+	now=time.time()
+	for f in os.listdir(path):
+		try:
+			if now-os.stat(os.path.join(path,f)).st_mtime>BLOCKCACHE_AGE : os.unlink(os.path.join(path,f))
+		except: pass
+
 from EMAN2jsondb import JSTask,jsonclasses
 class EMSimTaskDC(JSTask):
 	'''
@@ -384,58 +471,25 @@ class EMSimTaskDC(JSTask):
 		else : ref_masks_name=None
 
 		if "mask" in self.data :
-			mask=EMData(self.data["mask"][1],self.data["mask"][2])
-			if shrink != None : mask.process_inplace("math.fft.resample",{"n":shrink})
+			mask=read_block(self.data["mask"][1],[self.data["mask"][2]],shrink,True)[0]
 		else : mask=None
 
 #		print self.data["references"][2:]
+		# references (and their masks) are shared by every task in the same column of blocks, so they are cached on the node
+		ref_indices = list(ref_indices)
 		refs = {}
-		for idx in ref_indices:
-			datareaderror=True
-			for datareadid in range(20):
-				try: image = EMData(ref_data_name,idx)
-				except:
-					print("Failed to read %s. Wait for 5s and try again."%(str(idx)))
-					time.sleep(5)
-				else:
-					datareaderror=False
-					break
-			if datareaderror:
-				print("Cannot read image. Give up.")
-				raise Exception("Couldn't read data in init_memory")
-				
-			if shrink != None:
-				image.process_inplace("math.fft.resample",{"n":shrink})
-
-			if ref_masks_name==None :
+		if ref_masks_name==None :
+			for idx,image in zip(ref_indices,read_block(ref_data_name,ref_indices,shrink,True)):
 				refs[idx] = [image,None]
-			else :
-				mask=EMData(ref_masks_name,idx)
-				if shrink != None:
-					mask.process_inplace("math.fft.resample",{"n":shrink})
-				refs[idx] = [image,mask]
+		else :
+			for idx,image,rmask in zip(ref_indices,read_block(ref_data_name,ref_indices,shrink,True),read_block(ref_masks_name,ref_indices,shrink,True)):
+				refs[idx] = [image,rmask]
 
 		ptcl_data_name=self.data["particles"][1]
-		ptcl_indices = image_range(*self.data["particles"][2:])
+		ptcl_indices = list(image_range(*self.data["particles"][2:]))
 
 		ptcls = {}
-		for idx in ptcl_indices:
-			datareaderror=True
-			for datareadid in range(20):
-				try: image = EMData(ptcl_data_name,idx)
-				except:
-					print("Failed to read %s in %s from range %s. Wait for 5s and try again."%(str(idx),ptcl_data_name,str(ptcl_indices)))
-					time.sleep(5)
-				else:
-					datareaderror=False
-					break
-			if datareaderror:
-				print("Cannot read image. Give up.")
-				raise Exception("Couldn't read data in init_memory")
-			
-			
-			if shrink != None:
-				image.process_inplace("math.fft.resample",{"n":options["shrink"]})
+		for idx,image in zip(ptcl_indices,read_block(ptcl_data_name,ptcl_indices,shrink)):
 # removed 8/2/12 stevel. Don't want to apply mask before alignment
 #			if mask!=None : image.mult(mask)
 			ptcls[idx] = image
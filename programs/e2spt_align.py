@@ -96,7 +96,7 @@ This program will take an input stack of subtomograms and a reference volume, an
 		else: options.iter=max(fls)+1
 		
 	if options.parallel==None:
-		options.parallel="thread:{}".format(options.threads)
+		options.parallel="pool:{}".format(options.threads)
 
 	reffile=args[1]
 	NTHREADS=max(options.threads+1,2)		# we have one thread just writing results
@@ -126,7 +126,7 @@ This program will take an input stack of subtomograms and a reference volume, an
 	ref[1]=ref[1].do_fft()
 	ref[1].process_inplace("xform.phaseorigin.tocorner")
 
-	angs=js_open_dict("{}/particle_parms_{:02d}.json".format(options.path,options.iter))
+	angs=js_open_dict("{}/particle_parms_{:02d}.json".format(options.path,options.iter),journal=True)
 	jsd=queue.Queue(0)
 
 	n=-1
@@ -154,25 +154,15 @@ This program will take an input stack of subtomograms and a reference volume, an
 	print("{} total CPUs available".format(num_cpus))
 	print("{} jobs".format(len(tasks)))
 
-	tids=[]
-	for t in tasks:
-		task = SptAlignTask(t[0], t[1], t[2], options)
-		tid=etc.send_task(task)
-		tids.append(tid)
-
-	while 1:
-		st_vals = etc.check_task(tids)
-		#print("{:.1f}/{} finished".format(np.mean(st_vals), 100))
-		#print(tids)
-		if np.min(st_vals) == 100: break
-		time.sleep(5)
-
-	#dics=[0]*nptcl
-	for i in tids:
-		ret=etc.get_results(i)[1]
+	tids=etc.send_tasks([SptAlignTask(t[0], t[1], t[2], options) for t in tasks])
+
+	# results are stored as they arrive, rather than after all of the tasks are complete
+	for tid,task,ret in etc.iter_results(tids):
 		fsp,n,d=ret
 		angs[(fsp,n)]=d
-		
+	
+	# folds the journal into the .json file, which later steps read or copy directly
+	angs.close()
 
 	del etc
 	
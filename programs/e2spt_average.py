@@ -8,6 +8,7 @@ from future import standard_library
 standard_library.install_aliases()
 from builtins import range
 from EMAN2 import *
+from EMAN2postproc import save_fsc,masked_fsc,wiener_byfsc,automask_radial
 import time
 import os
 import threading
@@ -188,66 +189,32 @@ Will read metadata from the specified spt_XX directory, as produced by e2spt_ali
 	combfile="{}/threed_{:02d}.hdf".format(options.path,options.iter)
 	ave.write_image(evenfile,0)
 	avo.write_image(oddfile,0)
-	av.write_image(combfile,0)
-
 
-	cmd="e2proc3d.py {evenfile} {path}/fsc_unmasked_{itr:02d}.txt --calcfsc={oddfile}".format(path=options.path,itr=options.iter,evenfile=evenfile,oddfile=oddfile)
-	launch_childprocess(cmd)
+	# post-processing is done in memory, each output file is written once
+	fscfile="{path}/fsc_unmasked_{itr:02d}.txt".format(path=options.path,itr=options.iter)
+	save_fsc(ave,avo,fscfile)
 	
 	# final volume at this point is Wiener filtered
-	launch_childprocess("e2proc3d.py {combfile} {combfile} --process=filter.wiener.byfsc:fscfile={path}/fsc_unmasked_{itr:02d}.txt:snrmult=2".format(path=options.path,itr=options.iter,combfile=combfile))
+	vol=wiener_byfsc(av,fscfile,2.0,inplace=False)
 
 	#### skip post process in case we want to do this elsewhere...
 	if options.skippostp:
+		vol.write_image(combfile,0)
 		E2end(logid)
 		return
 	
 	# New version of automasking based on a more intelligent interrogation of the volume
-	vol=EMData(combfile)
-	nx=vol["nx"]
-	apix=vol["apix_x"]
-	md=vol.calc_radial_dist(old_div(nx,2),0,1,3)	# radial max value per shell in real space
-
-	rmax=int(old_div(nx,2.2))	# we demand at least 10% padding
-	vmax=max(md[:rmax])	# max value within permitted radius
-
-	# this finds the first radius where the max value @ r falls below overall max/4
-	# this becomes the new maximum mask radius
-	act=0
-	mv=0,0
-	for i in range(rmax):
-		if md[i]>mv[0] : mv=md[i],i             # find the radius of the  max val in range
-		if not act and md[i]<0.9*vmax : continue
-		act=True
-		if md[i]<0.2*vmax :
-			rmax=i
-			break
-
-	rmaxval=mv[1]
-	vmax=mv[0]
-
-	# excludes any spurious high values at large radius
-	vol.process_inplace("mask.sharp",{"outer_radius":rmax})
-
-	# automask
-	mask=vol.process("mask.auto3d",{"threshold":vmax*.15,"radius":0,"nshells":int(nx*0.05+0.5+old_div(20,apix))+options.automaskexpand,"nmaxseed":24,"return_mask":1})
-
-	mask.process_inplace("filter.lowpass.gauss",{"cutoff_freq":old_div(1.0,(40.0))})
+	mask=automask_radial(vol,options.automaskexpand)
 	mask.write_image("{path}/mask.hdf".format(path=options.path),0)
 
 	# compute masked fsc and refilter
-	ave.mult(mask)
-	ave.write_image("{path}/tmp_even.hdf".format(path=options.path),0)
-	avo.mult(mask)
-	avo.write_image("{path}/tmp_odd.hdf".format(path=options.path),0)
+	fscfile="{path}/fsc_masked_{itr:02d}.txt".format(path=options.path,itr=options.iter)
+	masked_fsc(ave,avo,mask,fscfile)
 	av.mult(mask)
-	av.write_image(combfile,0)
-
-	cmd="e2proc3d.py {path}/tmp_even.hdf {path}/fsc_masked_{itr:02d}.txt --calcfsc={path}/tmp_odd.hdf".format(path=options.path,itr=options.iter)
-	launch_childprocess(cmd)
 
 	# final volume is premasked and Wiener filtered based on the masked FSC
-	launch_childprocess("e2proc3d.py {combfile} {combfile} --process=filter.wiener.byfsc:fscfile={path}/fsc_masked_{itr:02d}.txt:snrmult=2".format(path=options.path,itr=options.iter,combfile=combfile))
+	wiener_byfsc(av,fscfile,2.0)
+	av.write_image(combfile,0)
 
 
 	E2end(logid)
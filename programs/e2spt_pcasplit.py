@@ -290,14 +290,15 @@ def main():
 		#e.write_image(classfile,i)
 
 	inlst=LSXFile(inptcls, True)
+	inrecs=inlst.read_many(range(nptcl))
 	outlsts=[]
 	for lbl in sorted(np.unique(lb)):
 		#outlst = LSXFile(inptcls.replace(".lst","_{}.lst".format(lbl)))
 		outlst = LSXFile("{}/ptcls_cls{:02d}.lst".format(options.outpath, lbl))
 		for i in range(nptcl):
 			if lb[i]==lbl:
-				l=inlst.read(i)
-				outlst.write(-1,l[0], l[1],l[2])
+				l=inrecs[i]
+				outlst.write(-1,l["n"], inlst.filenames[l["file"]],l["comment"])
 		outlst.close()
 	inlst.close()
 	
@@ -9,9 +9,6 @@ standard_library.install_aliases()
 from builtins import range
 from EMAN2 import *
 import numpy as np
-import scipy.spatial.distance as scidist
-import queue
-import threading
 
 def main():
 	
@@ -36,6 +33,8 @@ def main():
 	parser.add_argument("--rmgold", action="store_true",help="Remove particles near gold fiducial.", default=False, guitype='boolbox', row=6, col=1,rowspan=1, colspan=1, mode="boxing[True]")
 
 
+	parser.add_argument("--threads", type=int,help="threads", default=12, guitype='intbox', row=8, col=0,rowspan=1, colspan=1, mode="boxing")
+
 	parser.add_argument("--ppid", type=int,help="ppid", default=-2)
 
 	(options, args) = parser.parse_args()
@@ -77,28 +76,17 @@ def main():
 			options.dthr=sz/np.sqrt(2)
 
 		hdr=m.get_attr_dict()
-		ccc=img.copy()*0-65535
-
-		jsd=queue.Queue(0)
-		thrds=[threading.Thread(target=do_match,args=(jsd, m,o, img)) for o in oris]
-		thrtolaunch=0
-		tsleep=threading.active_count()
-
-		ndone=0
-		while thrtolaunch<len(thrds) or threading.active_count()>tsleep:
-			if thrtolaunch<len(thrds) :
-				while (threading.active_count()==13 ) : time.sleep(.1)
-				thrds[thrtolaunch].start()
-				thrtolaunch+=1
-			else: time.sleep(1)
-
-			while not jsd.empty():
-				cf=jsd.get()
-				ccc.process_inplace("math.max", {"with":cf})
-				ndone+=1
-				#if ndone%10==0:
-				sys.stdout.write("\r{}/{} finished.".format(ndone, len(oris)))
-				sys.stdout.flush()
+		
+		def progress(ndone,ntot):
+			sys.stdout.write("\r{}/{} finished.".format(ndone, ntot))
+			sys.stdout.flush()
+		
+		# the maximum is accumulated as each CCF comes back, so only a few CCFs are held at once
+		ccc=None
+		with EMExecutor(options.threads, inflight=options.threads, progress=progress) as ex:
+			for cf in ex.imap(do_match, [(m,o,img) for o in oris], ordered=False):
+				if ccc is None: ccc=cf
+				else: ccc.process_inplace("math.max", {"with":cf})
 		print("")
 
 		cbin=ccc.process("math.maxshrink", {"n":2})
@@ -137,28 +125,9 @@ def main():
 		#cbin.write_image("tmp0.hdf")
 		#msk.write_image("tmp1.hdf")
 		cc=cbin.numpy().copy()
-		cshp=cc.shape
-		ccf=cc.flatten()
-		asrt= np.argsort(-ccf)
-		pts=[]
-		vthr=np.mean(ccf)+np.std(ccf)*options.vthr
+		vthr=np.mean(cc)+np.std(cc)*options.vthr
+		pts,scr=find_peaks(cc, options.dthr/4., vthr, options.nptcl)
 		
-		dthr=options.dthr/4.
-		scr=[]
-		#print vthr,cc.shape
-		for i in range(len(asrt)):
-			aid=asrt[i]
-			pt=np.unravel_index(aid, cshp)
-			if len(pts)>0:
-				dst=scidist.cdist(pts, [pt])
-				if np.min(dst)<dthr:
-					continue
-
-			pts.append(pt)
-			scr.append(float(ccf[aid]))
-			if cc[pt]<vthr or len(pts)>=options.nptcl:
-				break
-				
 		pts=np.array(pts)
 		print("Found {} particles".format(len(pts)))
 		js=js_open_dict(info_name(imgname))
@@ -203,12 +172,43 @@ def main():
 
 	E2end(logid)
 	
-def do_match(jsd, m, o, img):
+def do_match(m, o, img):
 	e=m.copy()
 	e.transform(o)
 	cf=img.calc_ccf(e)
 	cf.process_inplace("xform.phaseorigin.tocenter")
-	jsd.put(cf)
+	return cf
+
+def find_peaks(cc, dthr, vthr, nmax):
+	"""Non-maximum suppression on a 3D map. Returns up to nmax peak coordinates (z,y,x) with values >= vthr,
+	highest first, with no two peaks closer than dthr, along with the peak values. Each accepted peak marks
+	the voxels within dthr of it as suppressed, so checking a candidate is a single lookup."""
+	# only voxels above the threshold can be peaks, sort just those
+	cand=np.flatnonzero(cc>=vthr)
+	cand=cand[np.argsort(-cc.flat[cand], kind="mergesort")]
+	
+	# offsets of all voxels closer than dthr to the center
+	r=int(np.ceil(dthr))
+	zyx=np.indices((2*r+1,)*3).reshape(3,-1).T-r
+	zyx=zyx[np.sum(zyx**2, axis=1)<dthr*dthr]
+	
+	supp=np.zeros(cc.shape, dtype=bool)
+	shp=np.array(cc.shape)
+	pts=[]
+	scr=[]
+	for c in cand:
+		if len(pts)>=nmax: break
+		if supp.flat[c]: continue
+		
+		pt=np.array(np.unravel_index(c, cc.shape))
+		pts.append(pt)
+		scr.append(float(cc.flat[c]))
+		
+		nb=zyx+pt
+		nb=nb[np.all((nb>=0)&(nb<shp), axis=1)]
+		supp[nb[:,0],nb[:,1],nb[:,2]]=True
+	
+	return np.array(pts).reshape(-1,3),scr
 
 def run(cmd):
 	print(cmd)
@@ -226,11 +226,9 @@ def main():
 			
 			m.process_inplace('normalize.edgemean')
 			
-			pinfo=[]
 			if options.debug: nptcl=options.threads*8
 			else: nptcl=lst.n
-			for i in range(nptcl):
-				pinfo.append(lst.read(i))
+			pinfo=[[int(r["n"]),lst.filenames[r["file"]],r["comment"]] for r in lst.read_many(range(nptcl))]
 			lst=None
 			
 			etc=EMTaskCustomer(options.parallel)
@@ -76,6 +76,7 @@ def main():
 	parser.add_argument("--rmbeadthr", type=float, help="Density value threshold (of sigma) for removing beads. high contrast objects beyond this value will be removed. default is -1 for not removing. try 10 for removing fiducials", default=-1,guitype='floatbox',row=14, col=1, rowspan=1, colspan=1,mode="easy")
 	
 	parser.add_argument("--threads", type=int,help="Number of threads", default=12,guitype='intbox',row=12, col=1, rowspan=1, colspan=1,mode="easy")
+	parser.add_argument("--maxmem", type=float,help="Maximum memory (in GB) to use when making the tomogram by tiles. If the full tomogram does not fit, finished tiles are written directly to disk instead. default is -1 (no limit)", default=-1)
 	parser.add_argument("--tmppath", type=str,help="Temporary path", default=None)
 	parser.add_argument("--verbose","-v", type=int,help="Verbose", default=0)
 
@@ -415,27 +416,35 @@ def main():
 	if options.rmbeadthr>0:
 		remove_beads(imgs_500, imgout, ttparams, options)
 	
-	#### only clip z axis at the end..
-	if options.bytile:
-		threed=make_tomogram_tile(imgout, ttparams, options, errtlt=loss0, clipz=options.clipz)
-	else:
-		threed=make_tomogram(imgout, ttparams, options, errtlt=loss0, clipz=options.clipz)
-
-	if options.writetmp:
-		threed.write_image(os.path.join(path,"tomo_final.hdf"))
-		make_ali(imgout, ttparams, options, outname=os.path.join(path,"tiltseries_ali.hdf"))
-
-	#### write to the tomogram folder
+	#### output goes to the tomogram folder
 	try: os.mkdir("tomograms")
 	except: pass
 	sfx=""
 	bf=int(np.round(imgout[0]["apix_x"]/options.apix_init))
 	if bf>1:
 		sfx+="__bin{:d}".format(int(bf))
-		
-	threed["ytilt"]=yrot
 	tomoname=os.path.join("tomograms", options.basename+sfx+".hdf")
-	threed.write_image(tomoname)
+	
+	#### only clip z axis at the end..
+	if options.bytile:
+		threed=make_tomogram_tile(imgout, ttparams, options, outname=tomoname, errtlt=loss0, clipz=options.clipz)
+	else:
+		threed=make_tomogram(imgout, ttparams, options, errtlt=loss0, clipz=options.clipz)
+
+	if threed is None:
+		#### tomogram was streamed to disk tile by tile, only update the header
+		threed=EMData(tomoname, 0, True)
+		threed["ytilt"]=yrot
+		threed.write_image(tomoname, 0, IMAGE_UNKNOWN, True)
+		if options.writetmp:
+			make_ali(imgout, ttparams, options, outname=os.path.join(path,"tiltseries_ali.hdf"))
+	else:
+		if options.writetmp:
+			threed.write_image(os.path.join(path,"tomo_final.hdf"))
+			make_ali(imgout, ttparams, options, outname=os.path.join(path,"tiltseries_ali.hdf"))
+		
+		threed["ytilt"]=yrot
+		threed.write_image(tomoname)
 	print("Tomogram written to {}".format(tomoname))
 	
 	#### save alignemnt parameters to info file
@@ -745,8 +754,7 @@ def calc_tltax_rot(imgs, options):
 	return tltax
 
 #### subthread for making tomogram by tiles. similar to make_tomogram, just for small cubes
-def make_tile(args):
-	jsd, imgs, tpm, sz, pad, stepx, stepy, outz,options=args
+def make_tile(imgs, tpm, sz, pad, stepx, stepy, outz,options):
 	recon=Reconstructors.get("fourier", {"sym":'c1',"size":[pad,pad,pad], "mode":"gauss_2"})
 	recon.setup()
 
@@ -776,14 +784,13 @@ def make_tile(args):
 	threed.clip_inplace(Region((pad-sz)//2, (pad-sz)//2, (pad-outz)//2, sz, sz, outz))
 	threed.process_inplace("filter.lowpass.gauss",{"cutoff_abs":options.filterto})
 	#threed.process_inplace("filter.highpass.gauss",{"cutoff_pixels":2})
-	jsd.put( [stepx, stepy, threed])
-	
-	return
+	return [stepx, stepy, threed]
 
 
 #### make tomogram by tiles
 #### this is faster and has less artifacts. but takes a lot of memory (~4x the tomogram)
-def make_tomogram_tile(imgs, tltpm, options, errtlt=[], clipz=-1):
+#### when the tomogram does not fit in --maxmem, tiles are finished row by row and written to outname, and None is returned
+def make_tomogram_tile(imgs, tltpm, options, outname=None, errtlt=[], clipz=-1):
 	
 	num=len(imgs)
 	scale=imgs[0]["apix_x"]/options.apix_init
@@ -822,18 +829,33 @@ def make_tomogram_tile(imgs, tltpm, options, errtlt=[], clipz=-1):
 		outz=sz#good_boxsize(sz*1.2)
 
 	#### we make 2 tomograms with half a box shift and average them together to compensate for boundary artifacts.
-	mem=(outxy*outxy*outz*4+pad*pad*pad*options.threads*4)
-	print("This will take {}x{}x{}x4 + {}x{}x{}x{}x4 = {:.1f} GB of memory...".format(outxy, outxy, outz, pad, pad, pad,options.threads, mem/1024**3))
-	
+	nthreads=options.threads
+	mem=(outxy*outxy*outz*4+pad*pad*pad*nthreads*4)
+	stream=(outname!=None and options.maxmem>0 and mem>options.maxmem*1024**3)
+	if stream:
+		#### only keep one row of tiles in memory. each job also holds its clipped tilt series
+		bandh=sz+1
+		jobmem=pad*pad*pad*4+len(nrange)*pad*pad*4
+		bandmem=outxy*bandh*outz*4
+		nthreads=int(max(1, min(nthreads, (options.maxmem*1024**3-bandmem)//jobmem)))
+		if nthreads<options.threads:
+			print("Reducing number of threads to {} to fit in {:.1f} GB of memory".format(nthreads, options.maxmem))
+		mem=bandmem+jobmem*nthreads
+		print("Writing tomogram to {} by rows of tiles. This will take {}x{}x{}x4 + ({}x{}x{}+{}x{}x{})x{}x4 = {:.1f} GB of memory...".format(outname, outxy, bandh, outz, pad, pad, pad, len(nrange), pad, pad, nthreads, mem/1024**3))
+	else:
+		print("This will take {}x{}x{}x4 + {}x{}x{}x{}x4 = {:.1f} GB of memory...".format(outxy, outxy, outz, pad, pad, pad,nthreads, mem/1024**3))
 	
-	full3d=EMData(outxy, outxy, outz)
 	
-	jsd=queue.Queue(0)
-	jobs=[]
+	#### tiles are clipped from the tilt series as each job is submitted, so only a few jobs are held in memory
 	nstep=int(outxy/step/2)
-	for stepx in range(-nstep,nstep+1):
-		#### shift y by half a tile
-		for stepy in range(-nstep+stepx%2,nstep+1,2):
+	#### shift y by half a tile
+	steps=[(stepx, stepy) for stepx in range(-nstep,nstep+1) for stepy in range(-nstep+stepx%2,nstep+1,2)]
+	if stream:
+		#### finish the tiles row by row so everything above the current row can go to disk
+		steps.sort(key=lambda s:(s[1], s[0]))
+	
+	def tile_jobs():
+		for stepx, stepy in steps:
 			tiles=[]
 			for i in range(num):
 				if i in nrange:
@@ -845,12 +867,10 @@ def make_tomogram_tile(imgs, tltpm, options, errtlt=[], clipz=-1):
 				else:
 					tiles.append(EMData(1,1))
 
-			jobs.append((jsd, tiles, tpm, sz, pad, stepx, stepy, outz, options))
+			yield (tiles, tpm, sz, pad, stepx, stepy, outz, options)
 	
-	thrds=[threading.Thread(target=make_tile,args=([i])) for i in jobs]
+	njob=len(steps)
 	print("now start threads...")
-	thrtolaunch=0
-	tsleep=threading.active_count()
 	
 	#### non-round fall off. this is mathematically correct but seem to have grid artifacts
 	#f=np.zeros((sz,sz))
@@ -870,15 +890,13 @@ def make_tomogram_tile(imgs, tltpm, options, errtlt=[], clipz=-1):
 	#msk.process_inplace("mask.poly",{"2d":True, "k4":1/4, "k2":-1, "k0":1})
 	#msk.add(0.1)
 	#msk.write_image("tmp03_msk.hdf")
-	while thrtolaunch<len(thrds) or threading.active_count()>tsleep or jsd.empty()==False:
-		if thrtolaunch<len(thrds) :
-			while (threading.active_count()==options.threads ) : time.sleep(.1)
-			thrds[thrtolaunch].start()
-			thrtolaunch+=1
-		else: time.sleep(.1)
-		
-		if not jsd.empty():
-			stepx, stepy, threed=jsd.get()
+	apix=imgs[0]["apix_x"]
+	if stream:
+		return make_tomogram_stream(tile_jobs(), njob, msk, outname, outxy, outz, sz, step, apix, nthreads, options)
+	
+	full3d=EMData(outxy, outxy, outz)
+	with EMExecutor(nthreads, inflight=nthreads) as ex:
+		for stepx, stepy, threed in ex.imap(make_tile, tile_jobs(), ordered=False, total=njob):
 			threed.mult(msk)
 			#### insert the cubes to corresponding tomograms
 			#full3d[stepx%2].insert_clip(
@@ -892,9 +910,6 @@ def make_tomogram_tile(imgs, tltpm, options, errtlt=[], clipz=-1):
 				
 			
 			#wt.insert_scaled_sum(msk,(int(stepx*step+outxy//2),int(stepy*step+outxy//2), outz//2))
-				
-				
-	for t in thrds: t.join()
 	
 	#full3d[0].write_image("tmp00_full.hdf")
 	#full3d[1].write_image("tmp01_full.hdf")
@@ -909,13 +924,73 @@ def make_tomogram_tile(imgs, tltpm, options, errtlt=[], clipz=-1):
 	#### skip the tomogram positioning step because there is some contrast difference at the boundary that sometimes breaks the algorithm...
 	full3d["zshift"]=0
 	
-	apix=imgs[0]["apix_x"]
 	full3d["apix_x"]=full3d["apix_y"]=full3d["apix_z"]=apix
 	print("Done. Now writting tomogram to disk...")
 	if options.normslice:
 		full3d.process_inplace("normalize.rows")
 	return full3d
 
+#### blend tiles coming in row by row into a band of the tomogram, and write the finished rows to outname
+#### normalization is done afterwards by a second pass over the file
+def make_tomogram_stream(jobs, njob, msk, outname, outxy, outz, sz, step, apix, nthreads, options):
+	
+	#### create the full size file on disk without allocating the volume
+	hdr=EMData()
+	hdr.set_size(outxy, outxy, outz, True)
+	hdr["zshift"]=0
+	hdr["apix_x"]=hdr["apix_y"]=hdr["apix_z"]=apix
+	if os.path.isfile(outname): os.remove(outname)
+	hdr.write_image(outname, 0, IMAGE_UNKNOWN, False)
+	
+	bandh=sz+1
+	band=EMData(outxy, bandh, outz)
+	by0=None ### y of the first row in the band
+	stat=[0., 0.]
+	
+	def flush(ny):
+		#### write out the first ny rows of the band, except for the parts outside the tomogram
+		ya=max(by0, 0)
+		yb=min(by0+ny, outxy)
+		if yb<=ya: return
+		slab=band.get_clip(Region(0, ya-by0, 0, outxy, yb-ya, outz))
+		d=slab.numpy()
+		stat[0]+=np.sum(d, dtype=np.float64)
+		stat[1]+=np.sum(np.square(d, dtype=np.float64))
+		slab.write_image(outname, 0, IMAGE_UNKNOWN, False, Region(0, ya, 0, outxy, yb-ya, outz))
+	
+	with EMExecutor(nthreads, inflight=nthreads) as ex:
+		for stepx, stepy, threed in ex.imap(make_tile, jobs, ordered=True, total=njob):
+			threed.mult(msk)
+			y0=int(stepy*step+outxy//2)-sz//2
+			if by0==None:
+				by0=y0
+			elif y0>by0:
+				#### starting a new row. everything above it is final
+				flush(y0-by0)
+				band=band.get_clip(Region(0, y0-by0, 0, outxy, bandh, outz))
+				by0=y0
+			
+			band.insert_scaled_sum(
+				threed,(int(stepx*step+outxy//2), y0-by0+sz//2, outz//2))
+	
+	flush(bandh)
+	band=None
+	
+	print("Done. Now normalizing tomogram on disk...")
+	n=float(outxy)*outxy*outz
+	mean=stat[0]/n
+	sigma=np.sqrt(max(stat[1]/n-mean**2, 0))
+	for y in range(0, outxy, step):
+		rg=Region(0, y, 0, outxy, min(step, outxy-y), outz)
+		slab=EMData(outname, 0, False, rg)
+		slab.sub(mean)
+		if sigma>0: slab.mult(1./sigma)
+		if options.normslice:
+			slab.process_inplace("normalize.rows")
+		slab.write_image(outname, 0, IMAGE_UNKNOWN, False, rg)
+	
+	return None
+
 #### reconstruct tomogram...
 def make_tomogram(imgs, tltpm, options, outname=None, padr=1.2,  errtlt=[], clipz=-1):
 	num=len(imgs)
@@ -957,20 +1032,13 @@ def make_tomogram(imgs, tltpm, options, outname=None, padr=1.2,  errtlt=[], clip
 		tpm=ttparams[nid]
 		pxf=get_xf_pos(ttparams[nid], [0,0,0])
 		xform={"type":"xyz","ztilt":tpm[2],"ytilt":tpm[3], "xtilt":tpm[4], "tx":pxf[0], "ty":pxf[1]}
-		jobs.append([nid,imgs[nid],  recon, pad, xform, exclude, options])
+		jobs.append((nid,imgs[nid],  recon, pad, xform, exclude, options))
 			
 	#### starting threads
-	thrds=[threading.Thread(target=reconstruct,args=(i)) for i in jobs]
-	thrtolaunch=0
-	tsleep=threading.active_count()
-	while thrtolaunch<len(thrds) or threading.active_count()>tsleep:
-		if thrtolaunch<len(thrds) :
-			while (threading.active_count()==options.threads ) : time.sleep(.1)
-			if options.verbose : print("Inserting slice {}/{}".format(thrtolaunch,len(thrds)))
-			thrds[thrtolaunch].start()
-			thrtolaunch+=1
-		else: time.sleep(1)
-	for t in thrds: t.join()
+	def progress(ndone, ntot):
+		if options.verbose : print("Inserted slice {}/{}".format(ndone,ntot))
+	with EMExecutor(options.threads, progress=progress) as ex:
+		ex.map(reconstruct, jobs, ordered=False)
 
 	threed=recon.finish(True)
 	threed.process_inplace("normalize")
@@ -1096,7 +1096,81 @@ class TestImageIO(unittest.TestCase):
 		e.write_image(outfile)
 		e.write_image(outfile)
 		os.unlink(outfile)
-		
+
+	def make_write_images_list(self, n):
+		imgs = []
+		for i in range(n):
+			e = EMData()
+			e.set_size(16, 16, 1)
+			e.process_inplace('testimage.noise.uniform.rand')
+			e.set_attr('write_images_index', i)
+			imgs.append(e)
+		return imgs
+
+	def test_write_images_hdf(self):
+		"""test write_images to hdf ........................."""
+		imgs = self.make_write_images_list(3)
+		file1 = "test_write_images_1_" + str(os.getpid()) + ".hdf"
+		file2 = "test_write_images_2_" + str(os.getpid()) + ".hdf"
+		EMData.write_images(file1, imgs)
+		for e in imgs:
+			e.write_image(file2, -1)
+
+		# appending to an existing file
+		EMData.write_images(file1, imgs[:2], -1)
+		for e in imgs[:2]:
+			e.write_image(file2, -1)
+
+		self.assertEqual(EMUtil.get_image_count(file1), 5)
+		self.assertEqual(EMUtil.get_image_count(file1), EMUtil.get_image_count(file2))
+		for a, b in zip(EMData.read_images(file1), EMData.read_images(file2)):
+			self.assertEqual(a.equal(b), True)
+			self.assertEqual(a.get_attr('write_images_index'), b.get_attr('write_images_index'))
+
+		remove_file(file1)
+		remove_file(file2)
+
+	def test_write_images_existing_single(self):
+		"""test write_images to existing single image file ..."""
+		imgs = self.make_write_images_list(2)
+		file1 = "test_write_images_3_" + str(os.getpid()) + ".mrc"
+		file2 = "test_write_images_4_" + str(os.getpid()) + ".mrc"
+		imgs[0].write_image(file1)
+		imgs[0].write_image(file2)
+
+		# a single image file is overwritten, as with write_image
+		EMData.write_images(file1, imgs[1:])
+		imgs[1].write_image(file2)
+
+		self.assertEqual(EMUtil.get_image_count(file1), 1)
+		self.assertEqual(EMUtil.get_image_count(file2), 1)
+		a = EMData(file1, 0)
+		b = EMData(file2, 0)
+		self.assertEqual(a.equal(b), True)
+		self.assertEqual(a.equal(imgs[1]), True)
+
+		remove_file(file1)
+		remove_file(file2)
+
+	def test_write_images_new_single(self):
+		"""test write_images to new single image file ........"""
+		imgs = self.make_write_images_list(1)
+		file1 = "test_write_images_5_" + str(os.getpid()) + ".mrc"
+		file2 = "test_write_images_6_" + str(os.getpid()) + ".mrc"
+		remove_file(file1)
+		EMData.write_images(file1, imgs)
+		imgs[0].write_image(file2)
+
+		self.assertEqual(EMUtil.get_image_count(file1), 1)
+		a = EMData(file1, 0)
+		b = EMData(file2, 0)
+		self.assertEqual(a.equal(b), True)
+		self.assertEqual(a.equal(imgs[0]), True)
+		self.assertEqual(os.path.getsize(file1), os.path.getsize(file2))
+
+		remove_file(file1)
+		remove_file(file2)
+
 	def create_dummy_region(self,e):
 		"""test region creation ............................."""
 		nx = e.get_xsize()
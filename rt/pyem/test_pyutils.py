@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+from __future__ import print_function
+from __future__ import division
+
+#
+# Copyright (c) 2000-2006 Baylor College of Medicine
+#
+# This software is issued under a joint BSD/GNU license. You may use the
+# source code in this file under either license. However, note that the
+# complete EMAN2 and SPARX software packages have some GPL dependencies,
+# so you are responsible for compliance with the licenses of these packages
+# if you opt to use BSD licensing. The warranty disclaimer below holds
+# in either instance.
+#
+# This complete copyright notice must be included in any revised version of the
+# source code. Additional authorship citations may be added, but existing
+# author citations must be preserved.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  2111-1307 USA
+#
+#
+
+# tests of the pure python support modules: EMAN2star, EMExecutor and the JSON databases
+
+from builtins import range
+from EMAN2 import *
+from EMAN2star import StarFile
+import unittest,os,sys,json,time
+import testlib
+from optparse import OptionParser
+
+IS_TEST_EXCEPTION = False
+
+def executor_job(i,fail=-1):
+	"""job for the EMExecutor tests, at module level so the process backend can pickle it"""
+	if i==fail : raise ValueError("job {} failed on purpose".format(i))
+	return i*i
+
+class TestStarFile(unittest.TestCase):
+	"""EMAN2star tests"""
+
+	def test_round_trip(self):
+		"""test STAR file round trip ........................"""
+		fsp="test_pyutils.star"
+		n=1000
+		ints=list(range(n))
+		floats=[(i*0.1)/3.0+1.0e-9*i for i in range(n)]
+		strs=["img{:04d}@particles.mrcs".format(i) for i in range(n)]
+
+		sf=StarFile(fsp)
+		sf["rlnVersion"]=31
+		sf.add_loop([("rlnClassNumber",ints),("rlnDefocusU",floats),("rlnImageName",strs)])
+		sf.writefile()
+
+		sf2=StarFile(fsp)
+		self.assertEqual(sf2["rlnVersion"],31)
+		self.assertEqual(list(sf2["rlnClassNumber"]),ints)
+		self.assertEqual(list(sf2["rlnDefocusU"]),floats)		# floats are written losslessly
+		self.assertEqual(list(sf2["rlnImageName"]),strs)
+
+		# single values are python types, which can be stored in JSON files
+		self.assertTrue(type(sf2["rlnClassNumber"][5]) is int)
+		self.assertTrue(type(sf2["rlnDefocusU"][5]) is float)
+		self.assertTrue(isinstance(sf2["rlnImageName"][5],str))
+		json.dumps([sf2["rlnClassNumber"][5],sf2["rlnDefocusU"][5],sf2["rlnImageName"][5]])
+		json.dumps(list(sf2["rlnDefocusU"]))
+
+		# writing what was read gives the same file
+		sf2.writefile("test_pyutils2.star")
+		self.assertEqual(open(fsp).read(),open("test_pyutils2.star").read())
+
+		testlib.safe_unlink(fsp)
+		testlib.safe_unlink("test_pyutils2.star")
+
+class TestEMExecutor(unittest.TestCase):
+	"""EMExecutor tests"""
+
+	def test_results(self):
+		"""test EMExecutor results .........................."""
+		for backend in ("thread","process"):
+			with EMExecutor(3,backend) as ex:
+				self.assertEqual(ex.map(executor_job,range(50)),[i*i for i in range(50)])
+				self.assertEqual(sorted(ex.imap(executor_job,(i for i in range(50)),ordered=False)),[i*i for i in range(50)])
+
+	def test_job_error(self):
+		"""test EMExecutor job exception ...................."""
+		for backend in ("thread","process"):
+			ex=EMExecutor(2,backend)
+			try:
+				ex.map(executor_job,[(i,7) for i in range(20)])
+				self.fail("no exception raised")
+			except Exception as err:
+				self.assertTrue("job 7 failed" in str(err))
+				self.assertTrue("ValueError" in str(err))
+			ex.terminate()
+			ex.terminate()		# repeated shutdown is harmless
+			self.assertTrue(ex.closed)
+
+	def test_pool_error(self):
+		"""test EMExecutor unpicklable job .................."""
+		if sys.version_info[0]<3 : return		# pool level failures are only reported on python 3
+		ex=EMExecutor(2,"process")
+		try:
+			ex.map(lambda x:x,range(4))
+			self.fail("no exception raised")
+		except Exception as err:
+			self.assertTrue("failed" in str(err))
+		ex.terminate()
+
+	def test_idle(self):
+		"""test EMExecutor idle callback ...................."""
+		calls=[]
+		with EMExecutor(1,idle=lambda:calls.append(1),idletime=0.05) as ex:
+			ex.map(time.sleep,[0.3])
+		self.assertTrue(len(calls)>0)
+
+class TestJSDict(unittest.TestCase):
+	"""JSON database tests"""
+
+	def test_journal(self):
+		"""test journaled JSON database ....................."""
+		fsp="test_pyutils_journal.json"
+		js_remove_dict(fsp)
+		db=js_open_dict(fsp,journal=True)
+		for i in range(100): db["key{}".format(i)]=[i,i*0.5]
+		db["key0"]="changed"
+		del db["key1"]
+		self.assertEqual(len(db),99)
+		db.close()
+
+		# after close the .json file alone is complete, and the journal has been folded into it and removed
+		jsp=fsp[:-5]+"_journal.txt"
+		self.assertFalse(os.path.exists(jsp))
+		data=json.load(open(fsp))
+		self.assertEqual(len(data),99)
+		self.assertEqual(data["key0"],"changed")
+		self.assertEqual(data["key99"],[99,49.5])
+
+		# and the closed dictionary is reread when accessed again
+		self.assertEqual(len(db),99)
+		self.assertEqual(db["key2"],[2,1.0])
+
+		# the next journaled write creates a new journal
+		db["key2"]=2
+		self.assertTrue(os.path.exists(jsp))
+		db.close()
+		self.assertFalse(os.path.exists(jsp))
+		self.assertEqual(json.load(open(fsp))["key2"],2)
+		js_remove_dict(fsp)
+
+	def test_eviction(self):
+		"""test JSON database cache eviction ................"""
+		fsps=["test_pyutils_cache{}.json".format(i) for i in range(3)]
+		for fsp in fsps: js_remove_dict(fsp)
+		try:
+			JSDict.set_cache_policy(cachemax=1)		# anything not in use is evicted
+			dbs=[js_open_dict(fsp) for fsp in fsps]
+			for i,db in enumerate(dbs):
+				for j in range(10): db["k{}".format(j)]=i*100+j
+			evictions=JSDict.cache_info()["evictions"]
+			for i,db in enumerate(dbs):
+				self.assertEqual(len(db),10)
+				self.assertEqual(db["k3"],i*100+3)
+				self.assertEqual(sorted(db.keys()),sorted(["k{}".format(j) for j in range(10)]))
+			self.assertTrue(JSDict.cache_info()["evictions"]>evictions)
+		finally:
+			JSDict.set_cache_policy(cachemax=0)
+			for fsp in fsps: js_remove_dict(fsp)
+
+def test_main():
+	p = OptionParser()
+	p.add_option('--t', action='store_true', help='test exception', default=False )
+	global IS_TEST_EXCEPTION
+	opt, args = p.parse_args()
+	if opt.t:
+		IS_TEST_EXCEPTION = True
+	Log.logger().set_level(-1)
+	suite1 = unittest.TestLoader().loadTestsFromTestCase(TestStarFile)
+	suite2 = unittest.TestLoader().loadTestsFromTestCase(TestEMExecutor)
+	suite3 = unittest.TestLoader().loadTestsFromTestCase(TestJSDict)
+	unittest.TextTestRunner(verbosity=2).run(suite1)
+	unittest.TextTestRunner(verbosity=2).run(suite2)
+	unittest.TextTestRunner(verbosity=2).run(suite3)
+
+if __name__ == '__main__':
+	test_main()
@@ -119,6 +119,51 @@ class TestReconstructor(unittest.TestCase):
 		
 		testlib.safe_unlink('density.mrc')
 	
+	def test_FourierReconstructor_partial(self):
+		"""test FourierReconstructor partial volumes ........"""
+		n = 32
+		imgs = []
+		for i in range(4):
+			e = EMData()
+			e.set_size(n,n,1)
+			e.process_inplace('testimage.noise.uniform.rand')
+			imgs.append(e)
+		xfs = [Transform({'type':'eman', 'alt':1.56+i*20.0, 'az':2.56+i*30.0, 'phi':3.56}) for i in range(4)]
+		parms = {'size':(n,n,n), 'mode':'gauss_2', 'sym':'c1', 'quiet':True}
+
+		# a single reconstructor with all of the slices
+		r = Reconstructors.get('fourier', parms)
+		r.setup()
+		for e,xf in zip(imgs,xfs): r.insert_slice(e, xf)
+		result = r.finish(True)
+
+		# two reconstructors with half of the slices each, summed into a third
+		r1 = Reconstructors.get('fourier', parms)
+		r1.setup()
+		r2 = Reconstructors.get('fourier', parms)
+		r2.setup()
+		for e,xf in zip(imgs[:2],xfs[:2]): r1.insert_slice(e, xf)
+		for e,xf in zip(imgs[2:],xfs[2:]): r2.insert_slice(e, xf)
+		vol = r1.get_partial_volume()
+		wt = r1.get_partial_weights()
+		vol.add(r2.get_partial_volume())
+		wt.add(r2.get_partial_weights())
+		r3 = Reconstructors.get('fourier', parms)
+		r3.setup_seedandweights(vol, wt)
+		result2 = r3.finish(True)
+
+		self.assertTrue(numpy.allclose(to_numpy(result), to_numpy(result2), rtol=1.0e-4, atol=1.0e-5))
+
+	def test_partial_unsupported(self):
+		"""test partial volume from unsupported reconstructor"""
+		r = Reconstructors.get('back_projection', {'size':32, 'weight':0.8, 'sym':'c1'})
+		for f in (r.get_partial_volume, r.get_partial_weights):
+			try:
+				f()
+				self.fail("no exception raised")
+			except RuntimeError as runtime_err:
+				self.assertEqual(testlib.exception_type(runtime_err), "InvalidCallException")
+
 	def no_test_WienerFourierReconstructor(self):
 		"""test WienerFourierReconstructor .................."""
 		a = 1
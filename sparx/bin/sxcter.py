@@ -85,6 +85,12 @@ Stack Mode - Process a particle stack (Not supported by SPHIRE GUI))::
 
 	sxcter.py bdb:stack outdir_cter --apix=2.29 --Cs=2.0 --voltage=300 --ac=10.0 --stack_mode
 
+Local Parallel Processing - Without MPI, micrographs can be distributed over processes on this machine with --nproc.
+	Results are added to partres.txt as each micrograph finishes, and an interrupted run can be continued with --resume,
+	which skips the micrographs already in partres.txt (or rejected) in the existing output directory.
+
+	sxcter.py './mic*.hdf' outdir_cter --wn=512 --apix=2.29 --Cs=2.0 --voltage=300 --ac=10.0 --nproc=16
+
 """
 	parser = OptionParser(usage, version=SPARXVERSION)
 	parser.add_option("--selection_list",	type="string",        default=None,   help="Micrograph selecting list: Specify path of a micrograph selection list text file for Selected Micrographs Mode. The file extension must be \'.txt\'. Alternatively, the file name of a single micrograph can be specified for Single Micrograph Mode. (default none)")
@@ -111,6 +117,8 @@ Stack Mode - Process a particle stack (Not supported by SPHIRE GUI))::
 	parser.add_option("--phase_max",		type="float",         default=175.0,  help="Maximum phase search [degrees] (default 175.0)")
 	parser.add_option("--phase_step",		type="float",         default=5.0,    help="Step phase search [degrees] (default 5.0)")
 	parser.add_option("--pap",				action="store_true",  default=False,  help="Use power spectrum for fitting. (default False)")
+	parser.add_option("--nproc",			type="int",           default=1,      help="Number of local processes: Distribute micrographs over this many processes on this machine. Not used with MPI, in Stack Mode or with --check_consistency. (default 1)")
+	parser.add_option("--resume",			action="store_true",  default=False,  help="Resume a partially completed run: Skip micrographs already in partres.txt of the existing output directory. Not used with MPI, in Stack Mode or with --check_consistency. (default False)")
 
 	(options, args) = parser.parse_args(sys.argv[1:])
 
@@ -211,7 +219,21 @@ Stack Mode - Process a particle stack (Not supported by SPHIRE GUI))::
 		print("Shell line command:")
 		print(command_line)
 
-	if options.vpp:
+	if options.nproc > 1 or options.resume:
+		if RUNNING_UNDER_MPI:  ERROR("--nproc and --resume can not be used under MPI","sxcter",1,my_mpi_proc_id)
+		if options.stack_mode: ERROR("--nproc and --resume can not be used in Stack Mode","sxcter",1,my_mpi_proc_id)
+		if options.check_consistency: ERROR("--nproc and --resume can not be used with --check_consistency","sxcter",1,my_mpi_proc_id)
+		if   options.vpp:  cter_name = "cter_vpp"
+		elif options.pap:  cter_name = "cter_pap"
+		else:              cter_name = "cter_mrk"
+		kwargs = dict(wn = options.wn, pixel_size = options.apix, Cs = options.Cs, voltage = options.voltage, wgh = options.ac, \
+				f_start = freq_start, f_stop = freq_stop, kboot = options.kboot, overlap_x = options.overlap_x, overlap_y = options.overlap_y, \
+				edge_x = options.edge_x, edge_y = options.edge_y, debug_mode = options.debug_mode, program_name = program_name)
+		if options.vpp:
+			kwargs["vpp_options"] = [options.defocus_min,  options.defocus_max,  options.defocus_step,  options.phase_min,  options.phase_max,  options.phase_step]
+		from morphology import cter_parallel
+		result = cter_parallel(cter_name, max(1, options.nproc), input_image_path, output_directory, options.selection_list, options.resume, **kwargs)
+	elif options.vpp:
 		vpp_options = [options.defocus_min,  options.defocus_max,  options.defocus_step,  options.phase_min,  options.phase_max,  options.phase_step]
 		from morphology import cter_vpp
 		result = cter_vpp(input_image_path, output_directory, options.selection_list, options.wn, \
@@ -719,10 +719,19 @@ def find_assignments_of_refangles_to_angles(normals_set, ancor_angle, an):
 	return  [qtemp+u3 for qtemp in ltemp]
 
 def find_nearest_k_refangles_to_many_angles(normals_set, angles, delta, howmany):
-	assignments = [-1]*len(angles)
-	for i,ancor_angle in enumerate(angles):
-		assignments[i] = find_nearest_k_refangles_to_angles(normals_set, ancor_angle, delta, howmany)
-	return assignments
+	#  The index over normals_set is kept in Blockdata, keyed on delta, symmetry and the contents of normals_set,
+	#  and rebuilt whenever any of them changes
+	global  Blockdata
+	from utilities import angular_index
+	import numpy as np
+	import hashlib
+	refs = np.asarray(normals_set, dtype = np.float64)
+	key = (delta, Blockdata["symclass"].sym, refs.shape, hashlib.md5(refs.tobytes()).hexdigest())
+	index = Blockdata.get("angular_index", None)
+	if( index is None or index[0] != key ):
+		index = (key, angular_index(refs, Blockdata["symclass"].sym, mirror = False, normals = True))
+		Blockdata["angular_index"] = index
+	return  index[1].knn(angles, howmany).tolist()
 
 def find_nearest_k_refangles_to_angles(normals_set, ancor_angle, delta, howmany):
 	#  returns list of angles within normals_set that are within an angles from ancor_angle
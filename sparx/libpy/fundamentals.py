@@ -1286,12 +1286,84 @@ def sincinv(nx):
 			s[i+nxb] = (rrr*cdf)/sin(rrr*cdf)
 	return s
 
+def tile_periodograms(img, win_x, win_y, xs, ys, normalize=False, average=False):
+	"""
+		Periodograms of all win_x*win_y windows of img whose upper-left corners are at (x, y) for every y in ys
+		and x in xs (ys outer).  Each window has a 2D plane subtracted as by ramp, and if normalize is set is
+		scaled to zero mean and standard deviation win_x.  Windows reaching outside img are zero-filled as by window2d.
+		Windows are cut as a strided view of the image, and detrended and Fourier transformed in batches,
+		so the result is the same as calling periodogram(ramp(window2d(...))) on each of them.
+		Returns a list of periodograms, or their average if average is set.
+	"""
+	from EMAN2 import EMNumPy
+	import numpy as np
+	from numpy.lib.stride_tricks import as_strided
+
+	xs = [int(x) for x in xs]
+	ys = [int(y) for y in ys]
+	data = EMNumPy.em2numpy(img)
+	ly, lx = data.shape
+	if min(xs) < 0 or min(ys) < 0:  ERROR("Window outside of the image","tile_periodograms",1)
+	if max(xs)+win_x > lx or max(ys)+win_y > ly:
+		pad = np.zeros((max(ly, max(ys)+win_y), max(lx, max(xs)+win_x)), np.float32)
+		pad[:ly,:lx] = data
+		data = pad
+
+	# all windows as a strided view of the image if they are evenly spaced, otherwise they are cut one batch at a time
+	ntx = len(xs)
+	ntile = len(ys)*ntx
+	sx = np.diff(xs)
+	sy = np.diff(ys)
+	if (len(sx) == 0 or (sx == sx[0]).all()) and (len(sy) == 0 or (sy == sy[0]).all()):
+		sx = sx[0] if len(sx) > 0 else 1
+		sy = sy[0] if len(sy) > 0 else 1
+		s0, s1 = data.strides
+		tiles = as_strided(data[ys[0]:,xs[0]:], shape = (len(ys), ntx, win_y, win_x), strides = (sy*s0, sx*s1, s0, s1))
+		def cut(idx):  return tiles[idx//ntx, idx%ntx]
+	else:
+		xs = np.array(xs)
+		ys = np.array(ys)
+		def cut(idx):  return data[ys[idx//ntx,None,None]+np.arange(win_y)[None,:,None], xs[idx%ntx,None,None]+np.arange(win_x)[None,None,:]]
+
+	# ramp, coordinates relative to the center of the window
+	xc = np.arange(win_x) - (win_x-1)/2.0
+	yc = np.arange(win_y) - (win_y-1)/2.0
+	# periodogram, the centered full plane (-n/2 ... n/2+n%2-1) is filled from the half-plane rfft using Friedel symmetry
+	ky = (np.arange(win_y) - win_y//2)%win_y
+	kx = (np.arange(win_x) - win_x//2)%win_x
+	ky, kx = np.meshgrid(ky, kx, indexing = "ij")
+	hx = kx > win_x//2
+	ky[hx] = (-ky[hx])%win_y
+	kx[hx] = win_x - kx[hx]
+	scale = 4.0/float(win_x*win_x)/float(win_y*win_y)
+
+	nbatch = max(1, (1<<28)//(win_x*win_y*48))
+	pw2 = []
+	for i in range(0, ntile, nbatch):
+		wi = cut(np.arange(i, min(i+nbatch, ntile))).astype(np.float64)
+		if win_x > 1 and win_y > 1:
+			b1 = np.einsum("bij,j->b", wi, xc)/(win_y*np.dot(xc, xc))
+			b2 = np.einsum("bij,i->b", wi, yc)/(win_x*np.dot(yc, yc))
+			wi -= wi.mean(axis = (1,2))[:,None,None] + b1[:,None,None]*xc[None,None,:] + b2[:,None,None]*yc[None,:,None]
+		if normalize:
+			wi -= wi.mean(axis = (1,2))[:,None,None]
+			wi *= win_x/wi.reshape(len(wi), -1).std(axis = 1, ddof = 1)[:,None,None]
+		ft = np.fft.rfft2(wi)
+		pw = (ft.real**2 + ft.imag**2)[:,ky,kx]
+		if average:
+			if i == 0:  pw2 = pw.sum(axis = 0)
+			else:       pw2 += pw.sum(axis = 0)
+		else:
+			pw2.extend([EMNumPy.numpy2em(np.ascontiguousarray(p*scale, np.float32)) for p in pw])
+
+	if average:  return EMNumPy.numpy2em(np.ascontiguousarray(pw2*(scale/ntile), np.float32))
+	return pw2
+
 def welch_pw2(img, win_size=512, overlp_x=50, overlp_y=50, edge_x=0, edge_y=0):
 	""" 
 		Calculate the power spectrum using Welch periodograms (overlapped periodogram)
 	"""
-	from fundamentals import window2d, ramp
-	from EMAN2 import periodogram
+	from fundamentals import window2d
 	nx = img.get_xsize()
 	ny = img.get_ysize()
 	nx_fft = smallprime(nx)
@@ -1303,17 +1375,9 @@ def welch_pw2(img, win_size=512, overlp_x=50, overlp_y=50, edge_x=0, edge_y=0):
 	x39 = 100/(100-overlp_y) # normalization of % of the overlap in y
 	x26 = int(x38*((nx-2*edge_x)/win_size-1)+1)  # number of pieces horizontal dim.(X)
 	x29 = int(x39*((ny-2*edge_y)/win_size-1)+1)  # number of pieces vertical dim.(Y)
-	iz = 0	
-	pw2 = EMData()
-	for iy in range(1, x29+1):	
-		x21 = (win_size/x39)*(iy-1) + edge_y  #  y-direction it should start from 0 if edge_y=0	      
-		for ix in  range(1, x26+1):			 
-			x22 = (win_size/x38)*(ix-1) + edge_x  # x-direction it should start from 0 if edge_x =0
-			wi  = window2d(e_fil, win_size, win_size, "l", x22, x21)
-			iz  = iz+1
-			if (iz == 1): pw2  = periodogram(ramp(wi))
-			else:         pw2 += periodogram(ramp(wi))
-	return  pw2/float(iz)
+	x21 = [(win_size/x39)*(iy-1) + edge_y for iy in range(1, x29+1)]  #  y-direction it should start from 0 if edge_y=0
+	x22 = [(win_size/x38)*(ix-1) + edge_x for ix in range(1, x26+1)]  # x-direction it should start from 0 if edge_x =0
+	return  tile_periodograms(e_fil, win_size, win_size, x22, x21, average=True)
 
 def welch_pw2_tilt_band(img,theta,num_bnd=-1,overlp_y=50,edge_x=0,edge_y=0,win_s=256):
 	""" 
@@ -1321,7 +1385,6 @@ def welch_pw2_tilt_band(img,theta,num_bnd=-1,overlp_y=50,edge_x=0,edge_y=0,win_s
 		2. The tilt micrograph is rotated such that the tilt axis is vertical (along Y axis)
 		3. edge_x and edge_y are removed from the micrograph
 	""" 
-	from EMAN2 import periodogram
 	nx = img.get_xsize()
 	ny = img.get_ysize()
 	num1 = int(nx-2*edge_x)
@@ -1347,18 +1410,11 @@ def welch_pw2_tilt_band(img,theta,num_bnd=-1,overlp_y=50,edge_x=0,edge_y=0,win_s
 	del img2
 	x39 = 100/(100-overlp_y) # normalization of % of the overlap in y
 	x29 = int(x39*((ny)/win_y-1)+1)  # number of pieces vertical dim.(Y)
-	pw2 = EMData()
+	x21 = [(win_y/x39)*(iy-1) for iy in range(1, x29+1)]  #  y-direction it should start from 0 if edge_y=0
 	pw2_band = []
 	for ix in  range(1, num_bnd+1):
 		x22 = (win_x)*(ix-1)# x-direction it should start from 0 if edge_x =0
-		iz=0
-		for iy in range(1, x29+1):	
-			x21 = (win_y/x39)*(iy-1) #  y-direction it should start from 0 if edge_y=0	      			 
-			wi = window2d(e_fil,win_x, win_y,"l",x22, x21)
-			iz = iz+1
-			if (iz == 1): pw2  = periodogram(ramp(wi))
-			else:         pw2 += periodogram(ramp(wi))
-		pw2/=float(iz)
+		pw2 = tile_periodograms(e_fil, win_x, win_y, [x22], x21, average=True)
 		# drop_image(pw2,"band%03d"%(ix))
 		pw2_band.append(pw2)	
 	return 	pw2_band
@@ -1368,8 +1424,7 @@ def tilemic(img, win_size=512, overlp_x=50, overlp_y=50, edge_x=0, edge_y=0):
 	""" 
 		Calculate set of periodograms for tiles.  Returns a list.
 	"""
-	from fundamentals import window2d, ramp
-	from EMAN2 import periodogram
+	from fundamentals import window2d
 	nx = img.get_xsize()
 	ny = img.get_ysize()
 	nx_fft = smallprime(nx)
@@ -1381,16 +1436,9 @@ def tilemic(img, win_size=512, overlp_x=50, overlp_y=50, edge_x=0, edge_y=0):
 	x39 = 100/(100-overlp_y) # normalization of % of the overlap in y
 	x26 = int(x38*((nx-2*edge_x)/win_size-1)+1)  # number of pieces horizontal dim.(X)
 	x29 = int(x39*((ny-2*edge_y)/win_size-1)+1)  # number of pieces vertical dim.(Y)
-	pw2 = []
-	for iy in range(1, x29+1):	
-		x21 = (win_size/x39)*(iy-1) + edge_y  #  y-direction it should start from 0 if edge_y=0	      
-		for ix in  range(1, x26+1):			 
-			x22 = (win_size/x38)*(ix-1) + edge_x  # x-direction it should start from 0 if edge_x =0
-			wi  = ramp( window2d(e_fil, win_size, win_size, "l", x22, x21) )
-			st = Util.infomask(wi, None, True)
-			wi = (wi - st[0])/st[1]*win_size
-			pw2.append(periodogram(wi))
-	return  pw2
+	x21 = [(win_size/x39)*(iy-1) + edge_y for iy in range(1, x29+1)]  #  y-direction it should start from 0 if edge_y=0
+	x22 = [(win_size/x38)*(ix-1) + edge_x for ix in range(1, x26+1)]  # x-direction it should start from 0 if edge_x =0
+	return  tile_periodograms(e_fil, win_size, win_size, x22, x21, normalize=True)
 
 
 def window2d(img, isize_x, isize_y, opt="c", ix=0, iy=0):
@@ -6371,6 +6371,137 @@ def cter_vpp(input_image_path, output_directory, selection_list = None, wn = 512
 	if cter_mode_idx == idx_cter_mode_stack:
 		return totresi[0][1], totresi[0][7], totresi[0][8], totresi[0][9], totresi[0][10], totresi[0][11]
 	
+################
+#
+#  Local process-pool driver for cter_mrk, cter_pap and cter_vpp
+#
+################
+def cter_one_micrograph(cter_name, mic_path, input_image_path, output_directory, work_directory, kwargs):
+	"""
+		Run cter_name (cter_mrk, cter_pap or cter_vpp) on a single micrograph in Single Micrograph Mode,
+		with its output and printout in work_directory, then move its pwrot, micthumb and ravg files to output_directory.
+		Used by cter_parallel, which collects the partres lines.
+		Returns (mic_path, status, partres lines, log file) where status is "done", "rejected", "missing" or "failed".
+	"""
+	import os
+	import sys
+	import shutil
+	import traceback
+	import morphology
+
+	root = os.path.splitext(os.path.basename(mic_path))[0]
+	outdir = os.path.join(work_directory, root)
+	if os.path.exists(outdir):  shutil.rmtree(outdir) # left over by an interrupted run
+	log = outdir + ".log"
+
+	stdout = sys.stdout
+	sys.stdout = open(log, "w")
+	try:
+		getattr(morphology, cter_name)(input_image_path, outdir, os.path.basename(mic_path), **kwargs)
+		status = "done"
+	except BaseException:  # ERROR() exits
+		traceback.print_exc(file = sys.stdout)
+		status = "failed"
+	finally:
+		sys.stdout.close()
+		sys.stdout = stdout
+	if status == "failed":  return (mic_path, status, [], log)
+
+	lines = []
+	if os.path.exists(os.path.join(outdir, "partres.txt")):
+		lines = [line for line in open(os.path.join(outdir, "partres.txt")).read().splitlines() if line.strip()]
+	if   os.path.exists(os.path.join(outdir, "rejected_micrograph_list.txt")):  status = "rejected"
+	elif os.path.exists(os.path.join(outdir, "missing_micrograph_list.txt")):   status = "missing"
+
+	for subdir in ["pwrot", "micthumb", "ravg"]:
+		src = os.path.join(outdir, subdir)
+		if os.path.isdir(src):
+			for fnam in os.listdir(src):  shutil.move(os.path.join(src, fnam), os.path.join(output_directory, subdir, fnam))
+	shutil.rmtree(outdir)
+	os.remove(log)
+	return (mic_path, status, lines, None)
+
+def cter_parallel(cter_name, nproc, input_image_path, output_directory, selection_list = None, resume = False, **kwargs):
+	"""
+		Run cter_mrk, cter_pap or cter_vpp (cter_name) on many micrographs using nproc local processes instead of MPI.
+		Each micrograph is processed in Single Micrograph Mode by cter_one_micrograph, and its line is appended
+		to output_directory/partres.txt as soon as it finishes, as are the rejected and missing micrograph lists.
+		If resume is set and output_directory exists, micrographs already in partres.txt or in the rejected list are skipped.
+		kwargs are passed on to cter_name (wn, pixel_size, Cs, voltage, wgh, ...). Stack Mode is not supported.
+	"""
+	from   EMAN2 import EMExecutor
+	from   utilities import read_text_file
+	from   global_def import ERROR
+	import os
+	import glob
+
+	if input_image_path.find("*") == -1:
+		ERROR("Input image file path (%s) must be a path pattern containing wild card (*)."%(input_image_path), "cter_parallel", 1)
+	if os.path.exists(output_directory) and not resume:
+		ERROR("Output directory (%s) exists already. Please check output_directory argument, or resume the run."%(output_directory), "cter_parallel", 1)
+
+	# Micrographs to process, as cter_mrk would find them
+	mic_dir = os.path.dirname(input_image_path)
+	if selection_list == None:
+		namics = glob.glob(input_image_path)
+	elif os.path.splitext(selection_list)[1] == ".txt":
+		namics = [os.path.join(mic_dir, os.path.basename(mic)) for mic in read_text_file(selection_list)]
+	else:
+		namics = [os.path.join(mic_dir, os.path.basename(selection_list))]
+	namics.sort(key = str.lower)
+
+	partres_path  = os.path.join(output_directory, "partres.txt")
+	rejected_path = os.path.join(output_directory, "rejected_micrograph_list.txt")
+	missing_path  = os.path.join(output_directory, "missing_micrograph_list.txt")
+	work_directory = os.path.join(output_directory, "cter_work")
+	for subdir in [output_directory, os.path.join(output_directory, "pwrot"), os.path.join(output_directory, "micthumb"), work_directory]:
+		if not os.path.exists(subdir):  os.mkdir(subdir)
+	if kwargs.get("debug_mode", False) and not os.path.exists(os.path.join(output_directory, "ravg")):
+		os.mkdir(os.path.join(output_directory, "ravg"))
+
+	# partres.txt ends with the micrograph path, the rejected list has one per line
+	finished = set()
+	for fnam in [partres_path, rejected_path]:
+		if os.path.exists(fnam):
+			finished.update([line.split()[-1] for line in open(fnam).read().splitlines() if line.strip()])
+	todo = [mic for mic in namics if mic not in finished]
+
+	print(" ")
+	print("Estimating CTF parameters of %d micrographs using %d processes (%d already done)..."%(len(todo), nproc, len(namics) - len(todo)))
+
+	ndone = 0
+	nrejected = 0
+	nmissing = 0
+	failed = []
+	jobs = ((cter_name, mic, input_image_path, output_directory, work_directory, kwargs) for mic in todo)
+	with EMExecutor(nproc, backend = "process") as ex:
+		for mic, status, lines, log in ex.imap(cter_one_micrograph, jobs, ordered = False, total = len(todo)):
+			if status == "failed":
+				failed.append(mic)
+				print("    %s failed, see %s"%(mic, log))
+				continue
+			if lines:
+				outf = open(partres_path, "a")
+				for line in lines:  outf.write(line + "\n")
+				outf.close()
+			if status in ["rejected", "missing"]:
+				outf = open(rejected_path if status == "rejected" else missing_path, "a")
+				outf.write("%s\n"%mic)
+				outf.close()
+				if status == "rejected":  nrejected += 1
+				else:                     nmissing  += 1
+			ndone += 1
+			print("    Processed %s (%s) ---> %6.2f%%"%(mic, status, 100.0*(ndone + len(failed))/len(todo)))
+
+	if not failed:  os.rmdir(work_directory)
+
+	print(" ")
+	print("Summary of micrograph processing...")
+	print("  Missing  : %d"%(nmissing))
+	print("  Rejected : %d"%(nrejected))
+	print("  Failed   : %d"%(len(failed)))
+	return len(todo) - len(failed)
+
 ########################################
 # functions used by cter_vpp
 ########################################
@@ -1760,7 +1760,163 @@ def chooseformat(t, form_float = "  %12.5f"):
 	if(abs(t-df1) <= abs(t-df2)):  return form_float
 	else: return e_form
 
-def read_text_row(fnam, format="", skip=";"):
+def _text_value(word):
+	"""Convert a single token the way the text readers always have: int, else float, else string."""
+	try:  return int(word)
+	except:
+		try:  	return float(word)
+		except:	return word
+
+def _text_column(tokens):
+	"""
+		Convert a numpy array of string tokens (one column) to a typed array:
+		int64 if every token is an int, float64 if every token is a float written with a decimal point or exponent,
+		otherwise an object array holding int/float/string per value, as _text_value would return them.
+	"""
+	import numpy as np
+	try:  return tokens.astype(np.int64)
+	except (ValueError, OverflowError, TypeError):  pass
+	try:
+		col = tokens.astype(np.float64)
+		if not np.char.isdigit(np.char.lstrip(tokens, "+-")).any():  return col
+	except (ValueError, TypeError):  pass
+	return np.array([_text_value(w) for w in tokens.tolist()], dtype = object)
+
+def _text_cache_name(fnam, skip):
+	"""Name of the binary sidecar cache of a text file, it depends on the comment marker used to read it."""
+	import os
+	dnam, bnam = os.path.split(fnam)
+	if skip:  return os.path.join(dnam, ".%s.%02x.npy"%(bnam, ord(skip)))
+	else:     return os.path.join(dnam, ".%s.npy"%bnam)
+
+def read_text_columns(fnam, skip = ";", cache = False):
+	"""
+		Read a column-listed txt file in a single pass into a list of numpy arrays, one per column.
+		Lines containing the skip character are ignored (skip = None keeps all lines).
+		Columns of ints are int64, columns of floats are float64, anything else is an object array.
+		Returns None if the rows do not all have the same number of columns (an empty line has none).
+
+		If cache is True, files with only int/float columns are also stored in a binary sidecar file
+		(.<fnam>.xx.npy in the same directory) which is memory-mapped on later reads,
+		as long as it is newer than the text file.
+	"""
+	import numpy as np
+	import os
+
+	if cache:
+		cnam = _text_cache_name(fnam, skip)
+		try:
+			if os.path.getmtime(cnam) > os.path.getmtime(fnam):
+				arr = np.load(cnam, mmap_mode = "r")
+				return [arr[k] for k in arr.dtype.names]
+		except (OSError, IOError, ValueError):  pass
+
+	inf = open(fnam, "r")
+	lines = inf.read().splitlines()
+	inf.close()
+	if skip:  rows = [line.split() for line in lines if skip not in line]
+	else:     rows = [line.split() for line in lines]
+	if len(rows) == 0:  return []
+	ncol = len(rows[0])
+	for row in rows:
+		if len(row) != ncol:  return None
+
+	tokens = np.array(rows)
+	cols = [_text_column(tokens[:,i]) for i in range(ncol)]
+
+	if cache and all([col.dtype != object for col in cols]):
+		arr = np.empty(len(rows), dtype = [("c%d"%i, col.dtype) for i, col in enumerate(cols)])
+		for i, col in enumerate(cols):  arr["c%d"%i] = col
+		try:  np.save(cnam, arr)
+		except (OSError, IOError):  pass
+
+	return cols
+
+def _text_format_value(tpt, form_float, form_int):
+	qtp = type(tpt)
+	if   qtp == int:	return form_int%tpt
+	elif qtp == float:	return chooseformat(tpt, form_float)%tpt
+	else:				return "  %s"%tpt
+
+def _text_float_exp(col, form_float):
+	"""
+		Boolean array, True where chooseformat would choose the exponential format for the value.
+		For 1 <= |t| the fixed format is never less accurate than the exponential one,
+		so the choice only has to be made for small values and values which may be too wide.
+	"""
+	import numpy as np
+	exp = np.zeros(len(col), dtype = bool)
+	try:
+		form_f = form_float.strip()
+		form_e = form_f.replace("f", "e")
+		width  = int(form_f.split(".")[0][1:])
+		prec   = int(form_f.split(".")[1][:-1])
+	except ValueError:
+		for i, t in enumerate(col.tolist()):  exp[i] = chooseformat(t, form_float) != form_float
+		return exp
+
+	a = np.abs(col)
+	cand = np.nonzero(((a > 0) & (a < 1)) | (a >= 10.0**(width - prec - 3)))[0]
+	if len(cand) == 0:  return exp
+	t  = col[cand]
+	sf = [form_f%x for x in t.tolist()]
+	df1 = np.array([float(x) for x in sf])
+	df2 = np.array([float(form_e%x) for x in t.tolist()])
+	with np.errstate(invalid = "ignore"):
+		exp[cand] = (np.array([len(x) for x in sf]) > width) | (np.abs(t - df1) > np.abs(t - df2))
+	return exp
+
+def _text_format_column(col, form_float = "  %14.6f", form_int = "  %12d"):
+	"""
+		Prepare one column (a list or numpy array) for writing. Returns the values as a list and either a single
+		format for the whole column, or a list with the format of each value. Columns of only ints or only floats
+		keep their values, anything else is formatted value by value into strings.
+	"""
+	import numpy as np
+	if isinstance(col, np.ndarray) and col.dtype != object and col.ndim == 1:
+		if   col.dtype.kind in "iu":	kind = int
+		elif col.dtype.kind == "f":		kind = float
+		else:							kind = None
+	else:
+		kinds = set(map(type, col))
+		kind  = kinds.pop() if len(kinds) == 1 else None
+		if kind in (int, float):
+			try:  col = np.array(col, dtype = np.int64 if kind == int else np.float64)
+			except OverflowError:  kind = None
+
+	if kind == int:
+		return col.tolist(), form_int
+	if kind == float:
+		exp = _text_float_exp(col, form_float)
+		if not exp.any():  return col.tolist(), form_float
+		return col.tolist(), np.where(exp, form_float.replace("f", "e"), form_float).tolist()
+	return [_text_format_value(tpt, form_float, form_int) for tpt in col], "%s"
+
+def write_text_columns(cols, file_name, form_float = "  %14.6f", form_int = "  %12d"):
+	"""
+		Write a list of columns (lists or numpy arrays of the same length) to an ASCII file,
+		one row per line, using the same formats as write_text_row/write_text_file.
+	"""
+	from itertools import repeat
+
+	outf = open(file_name, "w")
+	if len(cols) > 0:
+		nrow = len(cols[0])
+		chunk = 100000
+		for i in range(0, nrow, chunk):
+			values, forms = list(zip(*[_text_format_column(col[i:i+chunk], form_float, form_int) for col in cols]))
+			if all([type(frm) == str for frm in forms]):
+				frm = "".join(forms)
+				lines = [frm%row for row in zip(*values)]
+			else:
+				forms = [repeat(frm) if type(frm) == str else frm for frm in forms]
+				lines = ["".join(frm)%row for frm, row in zip(zip(*forms), zip(*values))]
+			outf.write("\n".join(lines))
+			outf.write("\n")
+	outf.flush()
+	outf.close()
+
+def read_text_row(fnam, format="", skip=";", cache=False):
 	"""
 	 	Read a column-listed txt file.
 		INPUT: filename: name of the Doc file
@@ -1768,19 +1924,23 @@ def read_text_row(fnam, format="", skip=";"):
 	    	nc : number of entries in each lines (number of columns)
 	    	len(data)/nc : number of lines (rows)
 	    	data: List of numbers from the doc file
+		Files with the same number of columns on every line are read by read_text_columns
+		(see there for cache), anything else line by line.
  	"""
-	from string import split
+
+	if format != "s":
+		cols = read_text_columns(fnam, skip, cache)
+		if cols is not None:
+			if len(cols) == 0:  return []
+			return [list(row) for row in zip(*[col.tolist() for col in cols])]
 
 	inf  = open(fnam, "r")
 	strg = inf.readline()
 	x    = []
 	data = []
 	while (len(strg) > 0):
-		com_line = False
-		for j in range(len(strg)):
-			if(strg[j] == skip):	com_line = True
-		if com_line == False:
-			word=split(strg)
+		if not skip or skip not in strg:
+			word=strg.split()
 			if format == "s" :
 				key = int(word[1])
 				if key != len(word) - 2:
@@ -1792,15 +1952,9 @@ def read_text_row(fnam, format="", skip=";"):
 						k_start = 7       + k*13
 						k_stop  = k_start + 13
 						word.append(strg[k_start : k_stop])
-			line=[]
-			for i in range(len(word)):
-				try:  line.append(int(word[i]))
-				except:
-					try:  	line.append(float(word[i]))
-					except:	line.append(word[i])
-			data.append(line)
+			data.append([_text_value(w) for w in word])
 		strg=inf.readline()
-	inf.close
+	inf.close()
 	return data
 
 
@@ -1813,69 +1967,51 @@ def write_text_row(data, file_name, form_float = "  %14.6f", form_int = "  %12d"
 	         First list will be written as a first line, second as a second, and so on...
 		 If only one list is given, the file will contain one line
 	"""
-	import types
-	from string import find
 
-	outf = open(file_name, "w")
 	if (type(data[0]) == list):
 		# It is a list of lists
-		for i in range(len(data)):
-			for j in range(len(data[i])):
-				tpt = data[i][j]
-				qtp = type(tpt)
-				if qtp == int:		outf.write(form_int%tpt)
-				elif qtp == float:
-					frmt = chooseformat(tpt, form_float)
-					if( find(frmt,"e") < 0 ):	outf.write(frmt%tpt)
-					else:						outf.write(frmt%tpt)
-				else:                   		outf.write("  %s"%tpt)
+		ncol = len(data[0])
+		if all([len(row) == ncol for row in data]):
+			write_text_columns(list(zip(*data)), file_name, form_float, form_int)
+			return
+		outf = open(file_name, "w")
+		for row in data:
+			outf.write("".join([_text_format_value(tpt, form_float, form_int) for tpt in row]))
 			outf.write("\n")
+		outf.flush()
+		outf.close()
 	else:
 		# Single list
-		for j in range(len(data)):
-			tpt = data[j]
-			qtp = type(tpt)
-			if qtp == int :			outf.write(form_int%tpt+"\n")
-			elif qtp == float:
-				frmt = chooseformat(tpt, form_float)
-				if( find(frmt,"e") < 0 ):		outf.write(frmt%tpt+"\n")
-				else:							outf.write(frmt%tpt+"\n")
-			else:								outf.write("  %s\n"%tpt)
-	outf.flush()
-	outf.close()
+		write_text_columns([list(data)], file_name, form_float, form_int)
 
 
-def read_text_file(file_name, ncol = 0):
+def read_text_file(file_name, ncol = 0, cache = False):
 	"""
 		Read data from text file, if ncol = -1, read all columns
 		if ncol >= 0, just read the (ncol)-th column.
 	"""
 
-	from string import split
+	cols = read_text_columns(file_name, None, cache)
+	if cols is not None:
+		if ncol == -1:  return [col.tolist() for col in cols]
+		if len(cols) == 0:  return []
+		return cols[ncol].tolist()
+
 	inf = open(file_name, "r")
 	line = inf.readline()
 	data = []
 	while len(line) > 0:
 		if ncol == -1:
-			vdata = split(line)
+			vdata = line.split()
 			if data == []:
 				for i in range(len(vdata)):
-					try:     data.append([int(vdata[i])])
-					except:
-						try:  	 data.append([float(vdata[i])])
-						except:  data.append([vdata[i]])
+					data.append([_text_value(vdata[i])])
 			else:
 				for i in range(len(vdata)):
-					try:  data[i].append(int(vdata[i]))
-					except:
-						try:  data[i].append(float(vdata[i]))
-						except:  data[i].append(vdata[i])
+					data[i].append(_text_value(vdata[i]))
 		else:
-			vdata = split(line)[ncol]
-			try:     data.append(int(vdata))
-			except:
-				try:  	data.append(float(vdata))
-				except:  data.append(vdata)
+			vdata = line.split()[ncol]
+			data.append(_text_value(vdata))
 		line = inf.readline()
 	return data
 
@@ -1888,40 +2024,18 @@ def write_text_file(data, file_name, form_float = "  %14.6f", form_int = "  %12d
 	         First list will be written as a first column, second as a second, and so on...
 		 If only one list is given, the file will contain one column
 	"""
-	from string import find
 
 	if data == []:
 		outf = open(file_name, "w")
 		outf.close()
 		return
 
-	import types
-	outf = open(file_name, "w")
 	if (type(data[0]) == list):
 		# It is a list of lists
-		for i in range(len(data[0])):
-			for j in range(len(data)):
-				tpt = data[j][i]
-				qtp = type(tpt)
-				if qtp == int:			outf.write(form_int%tpt)
-				elif qtp == float:
-					frmt = chooseformat(tpt, form_float)
-					if( find(frmt,"e") < 0 ):	outf.write(frmt%tpt)
-					else:						outf.write(frmt%tpt)
-				else:                   		outf.write("  %s"%tpt)
-			outf.write("\n")
+		write_text_columns([list(col[:len(data[0])]) for col in data], file_name, form_float, form_int)
 	else:
 		# Single list
-		for j in range(len(data)):
-			tpt = data[j]
-			qtp = type(tpt)
-			if qtp == int :			outf.write(form_int%tpt+"\n")
-			elif qtp == float:
-				frmt = chooseformat(tpt, form_float)
-				if( find(frmt,"e") < 0 ):		outf.write(frmt%tpt+"\n")
-				else:							outf.write(frmt%tpt+"\n")
-			else:                   			outf.write("  %s\n"%tpt)
-	outf.close()
+		write_text_columns([list(data)], file_name, form_float, form_int)
 
 def reconstitute_mask(image_mask_applied_file, new_mask_file, save_file_on_disk = True, saved_file_name = "image_in_reconstituted_mask.hdf"):
 	import types
@@ -3582,15 +3696,110 @@ def closest_ang( vecs, vec) :
 
 	return best_i
 """
-# This is in python, it is very slow, we keep it just for comparison, use Util.assign_projangles instead
+class angular_index(object):
+	"""
+	  Index of projection directions built once for repeated nearest-neighbour queries.
+	  angles: list of [phi, theta, ...], for example the output of even_angles,
+	          or a list of unit normals [[x0,y0,z0],[x1,y1,z1],...] (flat list also accepted) if normals=True
+	  sym:    point-group symmetry, a query is compared with all symmetry related copies of each direction
+	  mirror: True  - a direction and its antipode are the same (as in nearest_ang)
+	          False - signed distance (as in nearest_fang)
+	  Queries return NumPy arrays of indexes on the input list.  If scipy is available, a kd-tree
+	    over all symmetry (and mirror) copies is used, otherwise queries are answered by blocks of
+	    matrix products.
+	"""
+	def __init__(self, angles, sym = "c1", mirror = True, normals = False):
+		import numpy as np
+		vecs = self.vectors(angles, normals)
+		self.n = len(vecs)
+		self.sym = sym.lower()
+		self.mirror = mirror
+		if( self.sym == "c1" ):  mats = np.eye(3).reshape(1,3,3)
+		else:
+			from fundamentals import symclass
+			mats = np.array(symclass(self.sym).symatrix, dtype = np.float64)
+		#  row vector times symmetry matrix, as in recmat(mulmat(rotmatrix(phi,theta,psi), symatrix))
+		self.copies = np.einsum("nj,sjk->snk", vecs, mats)
+		self.ncopies = len(mats)*(2 if mirror else 1)
+		self.tree = None
+		try:
+			from scipy.spatial import cKDTree
+			pts = self.copies.reshape(-1,3)
+			if mirror:  pts = np.vstack((pts, -pts))
+			self.tree = cKDTree(pts)
+		except ImportError:  pass
+
+	@staticmethod
+	def vectors(angles, normals = False):
+		import numpy as np
+		if normals:  return np.asarray(angles, dtype = np.float64).reshape(-1,3)
+		ang = np.radians(np.array([[q[0],q[1]] for q in angles], dtype = np.float64).reshape(-1,2))
+		st = np.sin(ang[:,1])
+		return np.column_stack((st*np.cos(ang[:,0]), st*np.sin(ang[:,0]), np.cos(ang[:,1])))
+
+	def scores(self, angles, normals = False):
+		"""
+		  Cosines of angular distances between queries and all directions, an array (number of queries, n)
+		"""
+		import numpy as np
+		q = self.vectors(angles, normals)
+		s = np.einsum("qk,snk->sqn", q, self.copies)
+		if self.mirror:  s = np.abs(s)
+		return s.max(axis = 0)
+
+	def knn(self, angles, howmany = 1, exclude = None, normals = False):
+		"""
+		  Returns an array (number of queries, howmany) with indexes of the nearest directions, closest first.
+		  exclude: optional list, one index per query that should not be returned (for example the query itself)
+		"""
+		import numpy as np
+		q = self.vectors(angles, normals)
+		nq = len(q)
+		k = howmany + (exclude is not None)
+		if( k > self.n ):  ERROR("number of neighbors cannot be larger than number of reference directions", "angular_index.knn", 1)
+		out = np.empty((nq, howmany), dtype = np.int64)
+		if( nq == 0 or howmany == 0 ):  return out
+		if self.tree is not None:
+			#  Each direction has at most ncopies points in the tree, so this many hold k distinct directions
+			m = min(k*self.ncopies, self.n*self.ncopies)
+			idx = self.tree.query(q, m)[1].reshape(nq, m)%self.n
+			for i in range(nq):
+				first = np.sort(np.unique(idx[i], return_index = True)[1])
+				l = idx[i][first]
+				if exclude is not None:  l = l[l != exclude[i]]
+				out[i] = l[:howmany]
+		else:
+			chunk = max(1, (1<<22)//(self.n*len(self.copies)))
+			for i in range(0, nq, chunk):
+				s = self.scores(q[i:i+chunk], True)
+				if exclude is not None:  s[np.arange(len(s)), exclude[i:i+chunk]] = -2.0
+				part = np.argpartition(-s, howmany-1, axis = 1)[:,:howmany]
+				rows = np.arange(len(s))[:,None]
+				order = np.argsort(-s[rows, part], axis = 1, kind = "mergesort")
+				out[i:i+chunk] = part[rows, order]
+		return out
+
+	def within(self, angles, delta, normals = False):
+		"""
+		  Returns a list with, for each query, an array of indexes of directions within delta degrees
+		"""
+		import numpy as np
+		from math import radians, sin, cos
+		q = self.vectors(angles, normals)
+		if self.tree is not None:
+			#  chord length corresponding to angle delta on the unit sphere
+			l = self.tree.query_ball_point(q, 2.0*sin(radians(min(delta,180.0))/2.0)+1.0e-7)
+			return [np.unique(np.array(p, dtype = np.int64)%self.n) for p in l]
+		cd = cos(radians(delta))-1.0e-7
+		return [np.nonzero(s >= cd)[0] for s in self.scores(q, True)]
+
+
+# Python version of Util.assign_projangles, we keep it for comparison
 def assign_projangles_slow(projangles, refangles):
-	refnormal = [None]*len(refangles)
-	for i in range(len(refangles)):
-		refnormal[i] = getvec(refangles[i][0], refangles[i][1])
+	asg = angular_index(refangles).knn(projangles)[:,0]
 	assignments = [[] for i in range(len(refangles))]
 	for i in range(len(projangles)):
-		best_i = nearest_ang(refnormal, projangles[i][0], projangles[i][1])
-		assignments[best_i].append(i)
+		assignments[asg[i]].append(i)
 	return assignments
 
 
@@ -3613,103 +3822,7 @@ def nearest_many_full_k_projangles(reference_normals, angles, howmany = 1, sym_c
 
 def nearestk_projangles(projangles, whichone = 0, howmany = 1, sym="c1"):
 	# In both cases mirrored should be treated the same way as straight as they carry the same structural information
-	from utilities import getfvec, getvec
-	lookup = list(range(len(projangles)))
-	if( sym == "c1"):
-		from utilities import getvec
-		refnormal = [None]*(len(projangles)*3)
-		for i in range(len(projangles)):
-			ref = getvec(projangles[i][0], projangles[i][1])
-			for k in range(3):
-				refnormal[3*i+k] = ref[k]
-		# remove the reference projection from the list
-		ref = [0.0,0.0,0.0]
-		for k in range(3):
-			ref[k] = refnormal[3*whichone+k]
-		for k in range(3): del refnormal[3*whichone+2-k]
-		del lookup[whichone]
-		assignments = [-1]*howmany
-		for i in range(howmany):
-			k = Util.nearest_ang(refnormal, ref[0],ref[1],ref[2])
-			assignments[i] = lookup[k]
-			for l in range(3): del refnormal[3*k+2-l]
-			del lookup[k]
-
-	elif( sym[:1] == "d" ):
-		from utilities import get_symt, getvec
-		from EMAN2 import Transform
-		t = get_symt(sym)
-		phir = 360.0/int(sym[1:])
-		for i in range(len(t)):  t[i] = t[i].inverse()
-		a = Transform({"type":"spider","phi":projangles[whichone][0], "theta":projangles[whichone][1]})
-		for l in range(len(t)):
-			q = a*t[l]
-			q = q.get_params("spider")
-			if(q["phi"]<phir and q["theta"] <= 90.0): break
-		refvec = getfvec(q["phi"], q["theta"])
-		#print  "refvec   ",q["phi"], q["theta"]
-
-		tempan = projangles[:]
-		del tempan[whichone], lookup[whichone]
-		assignments = [-1]*howmany
-
-		for i in range(howmany):
-			best = -1
-			for j in range(len(tempan)):
-				nearest = -1.
-				a = Transform({"type":"spider","phi":tempan[j][0], "theta":tempan[j][1]})
-				for l in range(len(t)):
-					q = a*t[l]
-					q = q.get_params("spider")
-					vecs = getfvec(q["phi"], q["theta"])
-					s = abs(vecs[0]*refvec[0] + vecs[1]*refvec[1] + vecs[2]*refvec[2])
-					if( s > nearest ):
-						nearest = s
-						#ttt = (q["phi"], q["theta"])
-				if( nearest > best ):
-					best = nearest
-					best_j = j
-					#print  j,tempan[j][0], tempan[j][1],best,lookup[j],ttt
-			assignments[i] = lookup[best_j]
-			del tempan[best_j], lookup[best_j]
-
-	elif( sym[:1] == "c" ):
-		from utilities import get_symt, getvec
-		from EMAN2 import Transform
-		t = get_symt(sym)
-		#phir = 360.0/int(sym[1:])
-
-		tempan =  projangles[:]
-		del tempan[whichone], lookup[whichone]
-		assignments = [-1]*howmany
-		refvec = getvec(projangles[whichone][0], projangles[whichone][1])
-
-		for i in range(howmany):
-			best = -1
-			for j in range(len(tempan)):
-				nearest = -1.
-				a = Transform({"type":"spider","phi":tempan[j][0], "theta":tempan[j][1]})
-				for l in range(len(t)):
-					q = a*t[l]
-					q = q.get_params("spider")
-					vecs = getfvec(q["phi"], q["theta"])
-					s = abs(vecs[0]*refvec[0] + vecs[1]*refvec[1] + vecs[2]*refvec[2])
-					if( s > nearest ):
-						nearest = s
-						#ttt = (q["phi"], q["theta"])
-				if( nearest > best ):
-					best = nearest
-					best_j = j
-					#print  j,tempan[j][0], tempan[j][1],best,lookup[j],ttt
-			assignments[i] = lookup[best_j]
-			del tempan[best_j], lookup[best_j]
-
-	else:
-		print("  ERROR:  symmetry not supported  ",sym)
-		assignments = []
-
-
-	return assignments
+	return angular_index(projangles, sym).knn([projangles[whichone]], howmany, exclude = [whichone])[0].tolist()
 
 
 def nearest_full_k_projangles(reference_ang, angles, howmany = 1, sym_class=None):
@@ -3727,25 +3840,23 @@ def nearest_full_k_projangles(reference_ang, angles, howmany = 1, sym_class=None
 	return assignments
 
 def nearestk_to_refdir(refnormal, refdir, howmany = 1):
-	lookup = list(range(len(refnormal)))
-	assignments = [-1]*howmany
-	for i in range(howmany):
-		k = Util.nearest_ang(refnormal, refdir[0],refdir[1],refdir[2])
-		assignments[i] = lookup[k]
-		del refnormal[3*k+2], refnormal[3*k+1], refnormal[3*k+0], lookup[k]
-	return assignments
+	#  refnormal is a flat list of normals [x0,y0,z0,x1,y1,z1,...]
+	return angular_index(refnormal, normals = True).knn([refdir], howmany, normals = True)[0].tolist()
 
 
 def nearestk_to_refdirs(refnormal, refdir, howmany = 1):
-	lookup = list(range(len(refnormal)))
+	#  Each refdir in turn takes its howmany nearest normals that were not taken by previous refdirs
+	import numpy as np
+	index = angular_index(refnormal, normals = True)
+	if( howmany*len(refdir) > index.n ):  ERROR("number of neighbors cannot be larger than number of reference directions", "nearestk_to_refdirs", 1)
+	taken = np.zeros(index.n, dtype = bool)
 	assignments = []
 	for j in range(len(refdir)):
-		assignment = [-1]*howmany
-		for i in range(howmany):
-			k = Util.nearest_ang(refnormal, refdir[j][0],refdir[j][1],refdir[j][2])
-			assignment[i] = lookup[k]
-			del refnormal[3*k+2], refnormal[3*k+1], refnormal[3*k+0], lookup[k]
-		assignments.append(assignment)
+		s = index.scores([refdir[j]], normals = True)[0]
+		s[taken] = -2.0
+		assignment = np.argsort(-s, kind = "mergesort")[:howmany]
+		taken[assignment] = True
+		assignments.append(assignment.tolist())
 	return assignments
 
 
@@ -4484,14 +4595,10 @@ def group_proj_by_phitheta_slow(proj_ang, symmetry = "c1", img_per_grp = 100, ve
 		density.sort(reverse=True)
 
 		t3 = time()
-		dang = [[0.0, 0] for i in range(Nn)]
 		most_dense_point = density[0][1]
-		for i in range(Nn):
-			diff = ang_diff(v[i], v[most_dense_point])
-			dang[i][0] = diff[0]
-			dang[i][1] = i
-		dang[most_dense_point][0] = -1.
-		dang.sort()
+		# only the img_per_grp closest to the most dense point are needed, the point itself goes first
+		near = angular_index(v, normals = True).knn([v[most_dense_point]], img_per_grp-1, exclude = [most_dense_point])[0]
+		dang = [[-1., most_dense_point]] + [[ang_diff(v[i], v[most_dense_point])[0], i] for i in near]
 
 		t4 = time()
 		members = [0]*img_per_grp
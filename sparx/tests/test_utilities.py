@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+from __future__ import print_function
+from __future__ import division
+
+#
+# Copyright (c) 2000-2006 The University of Texas - Houston Medical School
+#
+# This software is issued under a joint BSD/GNU license. You may use the
+# source code in this file under either license. However, note that the
+# complete EMAN2 and SPARX software packages have some GPL dependencies,
+# so you are responsible for compliance with the licenses of these packages
+# if you opt to use BSD licensing. The warranty disclaimer below holds
+# in either instance.
+#
+# This complete copyright notice must be included in any revised version of the
+# source code. Additional authorship citations may be added, but existing
+# author citations must be preserved.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  2111-1307 USA
+#
+#
+
+from builtins import range
+import unittest
+import os
+import random
+from optparse import OptionParser
+
+IS_TEST_EXCEPTION = False
+
+# ====================================================================================================================
+class TestTextColumns(unittest.TestCase):
+	"""this is unit test for read_text_columns(...) and write_text_columns(...) from utilities.py"""
+
+	def reference_format(self, t, form_float):
+		# chooseformat as it was before the column writers, independent of the library version
+		e_form = form_float.replace("f","e")
+		ee = form_float.strip()%t
+		if(len(ee)>int(form_float.strip().split(".")[0][1:])):  return e_form
+		df1 = float(ee)
+		df2 = float(e_form.strip()%t)
+		if(abs(t-df1) <= abs(t-df2)):  return form_float
+		else: return e_form
+
+	def reference_write(self, data, file_name, form_float = "  %14.6f", form_int = "  %12d"):
+		# the row by row writer write_text_row used before the column writers
+		outf = open(file_name, "w")
+		for row in data:
+			for tpt in row:
+				if type(tpt) == int:		outf.write(form_int%tpt)
+				elif type(tpt) == float:	outf.write(self.reference_format(tpt, form_float)%tpt)
+				else:						outf.write("  %s"%tpt)
+			outf.write("\n")
+		outf.close()
+
+	def make_rows(self, n):
+		rnd = random.Random(12345)
+		words = ["abc", "x1", "1e", "-", "nan_", "Q"]
+		rows = []
+		for i in range(n):
+			row = [i, rnd.randint(-10**9, 10**9), rnd.uniform(-360.0, 360.0), rnd.uniform(-1.0, 1.0)*10.0**rnd.randint(-12, 12),
+				rnd.choice([0.0, -0.0, 1.0e-7, -3.0e-6, 5.0e-7, 123456789.123, 0.5]), rnd.choice(words)]
+			# a column with ints, floats and strings mixed
+			k = i%3
+			if   k == 0:  row.append(rnd.randint(-100, 100))
+			elif k == 1:  row.append(rnd.uniform(-1.0, 1.0))
+			else:         row.append(rnd.choice(words))
+			rows.append(row)
+		return rows
+
+	def read_file(self, file_name):
+		inf = open(file_name, "r")
+		ret = inf.read()
+		inf.close()
+		return ret
+
+	def test_write_parity(self):
+		"""test write_text_row/write_text_columns match the row writer .."""
+		from utilities import write_text_row, write_text_columns
+		import numpy as np
+		rows = self.make_rows(3000)
+		self.reference_write(rows, "test_text_columns_ref.txt")
+		ref = self.read_file("test_text_columns_ref.txt")
+
+		write_text_row(rows, "test_text_columns_row.txt")
+		self.assertEqual(self.read_file("test_text_columns_row.txt"), ref)
+
+		cols = [list(col) for col in zip(*rows)]
+		write_text_columns(cols, "test_text_columns_col.txt")
+		self.assertEqual(self.read_file("test_text_columns_col.txt"), ref)
+
+		# numeric columns as numpy arrays
+		cols = [np.array(col) if type(col[0]) in (int, float) and len(set(map(type, col))) == 1 else col for col in cols]
+		write_text_columns(cols, "test_text_columns_np.txt")
+		self.assertEqual(self.read_file("test_text_columns_np.txt"), ref)
+
+		# other formats
+		self.reference_write(rows, "test_text_columns_ref.txt", "  %10.3f", "  %6d")
+		write_text_row(rows, "test_text_columns_row.txt", "  %10.3f", "  %6d")
+		self.assertEqual(self.read_file("test_text_columns_row.txt"), self.read_file("test_text_columns_ref.txt"))
+
+		for f in ("ref", "row", "col", "np"):  os.unlink("test_text_columns_%s.txt"%f)
+
+	def test_read_round_trip(self):
+		"""test read_text_row/read_text_columns round trip ........"""
+		from utilities import write_text_row, read_text_row, read_text_columns
+		rows = self.make_rows(500)
+		write_text_row(rows, "test_text_columns_rt.txt")
+		back = read_text_row("test_text_columns_rt.txt")
+		self.assertEqual(len(back), len(rows))
+		for r, b in zip(rows, back):
+			self.assertEqual(r[0], b[0])
+			self.assertEqual(r[1], b[1])
+			self.assertAlmostEqual(r[2], b[2], 5)
+			self.assertEqual(r[5], b[5])
+
+		cols = read_text_columns("test_text_columns_rt.txt")
+		self.assertEqual(len(cols), len(rows[0]))
+		self.assertEqual(cols[0].dtype.kind, "i")
+		self.assertEqual(cols[2].dtype.kind, "f")
+		self.assertEqual(cols[0].tolist(), [r[0] for r in rows])
+
+		# the binary cache gives the same values
+		os.unlink("test_text_columns_rt.txt")
+		write_text_row([r[:5] for r in rows], "test_text_columns_rt.txt")
+		first  = read_text_columns("test_text_columns_rt.txt", cache = True)
+		second = read_text_columns("test_text_columns_rt.txt", cache = True)
+		for a, b in zip(first, second):  self.assertEqual(a.tolist(), b.tolist())
+
+		from utilities import _text_cache_name
+		os.unlink(_text_cache_name("test_text_columns_rt.txt", ";"))
+		os.unlink("test_text_columns_rt.txt")
+
+class TestAngularIndex(unittest.TestCase):
+	"""this is unit test for angular_index from utilities.py"""
+
+	def directions(self, n, seed):
+		rnd = random.Random(seed)
+		return [[rnd.uniform(0.0, 360.0), rnd.uniform(0.0, 180.0), 0.0] for i in range(n)]
+
+	def brute_scores(self, query, refs, nsym, mirror):
+		# cosine of the angular distance to the closest cn symmetry copy of each reference, rotating phi
+		from math import radians, sin, cos
+		def vec(phi, theta):
+			return (sin(radians(theta))*cos(radians(phi)), sin(radians(theta))*sin(radians(phi)), cos(radians(theta)))
+		q = vec(query[0], query[1])
+		ret = []
+		for r in refs:
+			best = -2.0
+			for k in range(nsym):
+				v = vec(r[0]+k*360.0/nsym, r[1])
+				d = q[0]*v[0]+q[1]*v[1]+q[2]*v[2]
+				if mirror:  d = abs(d)
+				best = max(best, d)
+			ret.append(best)
+		return ret
+
+	def check_knn(self, index, refs, queries, nsym, mirror, howmany):
+		nn = index.knn(queries, howmany)
+		for q, l in zip(queries, nn):
+			s = self.brute_scores(q, refs, nsym, mirror)
+			best = sorted(s, reverse = True)[:howmany]
+			for j in range(howmany):  self.assertAlmostEqual(s[l[j]], best[j], 9)
+
+	def check_within(self, index, refs, queries, nsym, mirror, delta):
+		from math import radians, cos
+		for q, l in zip(queries, index.within(queries, delta)):
+			s = self.brute_scores(q, refs, nsym, mirror)
+			expected = set([i for i in range(len(refs)) if s[i] >= cos(radians(delta))+1.0e-6])
+			found = set(l.tolist())
+			self.assertTrue(expected <= found)
+			for i in found - expected:  self.assertTrue(s[i] >= cos(radians(delta))-1.0e-6)
+
+	def test_knn_brute_force(self):
+		"""test angular_index.knn against brute force .............."""
+		from utilities import angular_index
+		refs = self.directions(300, 1)
+		queries = self.directions(40, 2)
+		for sym, nsym in (("c1", 1), ("c4", 4)):
+			for mirror in (True, False):
+				index = angular_index(refs, sym, mirror = mirror)
+				self.check_knn(index, refs, queries, nsym, mirror, 5)
+				self.check_within(index, refs, queries, nsym, mirror, 15.0)
+				# the matrix product path used without scipy
+				index.tree = None
+				self.check_knn(index, refs, queries, nsym, mirror, 5)
+				self.check_within(index, refs, queries, nsym, mirror, 15.0)
+
+	def test_knn_exclude(self):
+		"""test angular_index.knn with exclude ....................."""
+		from utilities import angular_index
+		refs = self.directions(100, 3)
+		index = angular_index(refs)
+		for i in range(0, 100, 7):
+			nn = index.knn([refs[i]], 3, exclude = [i])[0].tolist()
+			self.assertTrue(i not in nn)
+			s = self.brute_scores(refs[i], refs, 1, True)
+			s[i] = -2.0
+			best = sorted(s, reverse = True)[:3]
+			for j in range(3):  self.assertAlmostEqual(s[nn[j]], best[j], 9)
+
+def test_main():
+	from EMAN2 import Log
+	p = OptionParser()
+	p.add_option('--t', action='store_true', help='test exception', default=False )
+	global IS_TEST_EXCEPTION
+	opt, args = p.parse_args()
+	if opt.t:
+		IS_TEST_EXCEPTION = True
+	Log.logger().set_level(-1)  #perfect solution for quenching the Log error information, thank Liwei
+	suite1 = unittest.TestLoader().loadTestsFromTestCase(TestTextColumns)
+	suite2 = unittest.TestLoader().loadTestsFromTestCase(TestAngularIndex)
+	unittest.TextTestRunner(verbosity=2).run(suite1)
+	unittest.TextTestRunner(verbosity=2).run(suite2)
+
+if __name__ == '__main__':
+	test_main()